@@ -7,16 +7,46 @@ Usage:
     python logview.py com.hooked.hooked --level ERROR
     python logview.py com.hooked.hooked --tag CatchApiService,AuthApiService
     python logview.py com.hooked.hooked --clear
+    python logview.py --input logcat.txt.gz --level WARNING
 """
 
 import argparse
+import asyncio
+import bisect
+import concurrent.futures
+import cProfile
+import gzip
+import heapq
+import itertools
 import json
+import math
+import mmap
+import operator
 import os
+import pstats
+import queue
 import re
+import select
+import shlex
+import shutil
+import signal
+import socket
+import stat
+import struct
 import subprocess
 import sys
+import threading
 import time
-from typing import Optional, Dict, Any, List
+import tracemalloc
+import zlib
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Callable
+
+try:
+    import curses
+except ImportError:
+    # Only --tui needs it (on Windows: pip install windows-curses)
+    curses = None
 
 # ============================================================================
 # ADB Path Detection
@@ -25,12 +55,9 @@ from typing import Optional, Dict, Any, List
 def find_adb() -> Optional[str]:
     """Find the adb executable."""
     # Check if adb is in PATH
-    try:
-        result = subprocess.run(['which', 'adb'], capture_output=True, text=True)
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
-    except:
-        pass
+    path = shutil.which('adb')
+    if path:
+        return path
     
     # Common locations
     home = os.path.expanduser('~')
@@ -87,12 +114,17 @@ class Colors:
     BG_YELLOW = '\033[43m'
     BG_BLUE = '\033[44m'
     
+    # Styles the colorize helpers memoize per level; cleared when the colors change
+    _memos: List[dict] = []
+    
     @classmethod
     def disable(cls):
         """Disable all colors (for --no-color mode)."""
         for attr in dir(cls):
             if not attr.startswith('_') and attr.isupper():
                 setattr(cls, attr, '')
+        for memo in cls._memos:
+            memo.clear()
 
 
 # ============================================================================
@@ -117,16 +149,27 @@ class LogLevel:
         'F': FATAL, 'FATAL': FATAL, 'A': FATAL, 'ASSERT': FATAL,
     }
     
+    _colored: Dict[str, str] = {}
+    Colors._memos.append(_colored)
+    
     @classmethod
     def from_string(cls, level_str: str) -> int:
         """Convert level string to int."""
-        return cls._names.get(level_str.upper().strip(), cls.DEBUG)
+        level = cls._names.get(level_str)
+        if level is None:
+            level = cls._names.get(level_str.upper().strip(), cls.DEBUG)
+        return level
     
     @classmethod
     def colorize(cls, level_str: str) -> str:
         """Return colorized level string."""
-        level = level_str.upper().strip()
-        
+        colored = cls._colored.get(level_str)
+        if colored is None:
+            colored = cls._colored[level_str] = cls._colorize(level_str.upper().strip())
+        return colored
+    
+    @staticmethod
+    def _colorize(level: str) -> str:
         if level in ('E', 'ERROR'):
             return f"{Colors.BOLD}{Colors.BRIGHT_RED}{level}{Colors.RESET}"
         elif level in ('F', 'FATAL', 'A', 'ASSERT'):
@@ -152,22 +195,31 @@ def colorize_timestamp(timestamp: str) -> str:
     return f"{Colors.CYAN}{timestamp}{Colors.RESET}"
 
 
+_TAG_COLORS: Dict[str, str] = {}
+Colors._memos.append(_TAG_COLORS)
+
+
 def colorize_tag(tag: str, level: str, max_len: int = 5) -> str:
     """Colorize tag based on log level."""
     display = tag[:max_len].ljust(max_len)
-    level = level.upper().strip()
-    
+    color = _TAG_COLORS.get(level)
+    if color is None:
+        color = _TAG_COLORS[level] = _tag_color(level.upper().strip())
+    return f"{color}{display}{Colors.RESET}"
+
+
+def _tag_color(level: str) -> str:
     # Color tag based on level for better visibility
     if level in ('E', 'ERROR', 'F', 'FATAL', 'A'):
-        return f"{Colors.BRIGHT_RED}{display}{Colors.RESET}"
+        return Colors.BRIGHT_RED
     elif level in ('W', 'WARN', 'WARNING'):
-        return f"{Colors.YELLOW}{display}{Colors.RESET}"
+        return Colors.YELLOW
     elif level in ('I', 'INFO'):
-        return f"{Colors.GREEN}{display}{Colors.RESET}"
+        return Colors.GREEN
     elif level in ('D', 'DEBUG'):
-        return f"{Colors.BLUE}{display}{Colors.RESET}"
+        return Colors.BLUE
     else:
-        return f"{Colors.MAGENTA}{display}{Colors.RESET}"
+        return Colors.MAGENTA
 
 
 def colorize_http_method(method: str) -> str:
@@ -208,327 +260,848 @@ def colorize_arrow(arrow: str) -> str:
     return arrow
 
 
-def colorize_json_value(value: Any, indent: int = 0) -> str:
-    """Recursively colorize a JSON value."""
-    indent_str = '  ' * indent
+# ============================================================================
+# JSON Bodies
+# ============================================================================
+
+class JsonLimits:
+    """How much of a JSON body is rendered; 0 means no limit."""
+    __slots__ = ('depth', 'items', 'output', 'drop_over')
+    
+    def __init__(self, depth: int = 8, items: int = 50, output: int = 64 * 1024, drop_over: int = 0):
+        self.depth = depth or sys.maxsize
+        self.items = items or sys.maxsize
+        self.output = output or sys.maxsize
+        self.drop_over = drop_over
+
+
+# Set by main() from the --json-* options
+JSON_LIMITS = JsonLimits()
+
+
+class JsonPayload:
+    """The JSON object ending a message: where it starts, its size and its parsed value."""
+    __slots__ = ('start', 'size', 'value')
+    
+    def __init__(self, start: int, size: int, value: Any):
+        self.start = start
+        self.size = size
+        # None if the body was over JsonLimits.drop_over and never parsed
+        self.value = value
+
+
+# Everything that matters for brace matching: escapes, braces and quotes
+_JSON_SCAN_RE = re.compile(r'\\.|[{}"]', re.DOTALL)
+
+
+def _json_start(message: str, end: int) -> int:
+    """
+    Start of the balanced {...} that ends at message[end - 1], or -1.
+    
+    One pass over the braces and quotes; quotes only open strings inside
+    an object, so an apostrophe or stray quote in the prose before the
+    body doesn't throw the count off.
+    """
+    depth = 0
+    in_string = False
+    start = closed = -1
+    for match in _JSON_SCAN_RE.finditer(message, 0, end):
+        token = match.group()
+        if in_string:
+            if token == '"':
+                in_string = False
+        elif token == '"':
+            in_string = depth > 0
+        elif token == '{':
+            if not depth:
+                start = match.start()
+            depth += 1
+        elif token == '}' and depth:
+            depth -= 1
+            if not depth:
+                closed = match.start()
+    return start if not depth and closed == end - 1 else -1
+
+
+def find_json_payload(message: str, drop_over: int = 0) -> Optional[JsonPayload]:
+    """
+    The JSON object ending a message, parsed once, or None if there isn't one.
+    
+    The body almost always starts at the first brace, so that is parsed
+    first; only if it fails is the message scanned for where the final
+    balanced object starts. Bodies larger than drop_over bytes (if set)
+    are taken from the first brace and not parsed at all.
+    """
+    end = len(message.rstrip())
+    if not end or message[end - 1] != '}':
+        return None
+    start = message.find('{', 0, end)
+    if end - start < 3:
+        return None
+    if drop_over and end - start > drop_over:
+        return JsonPayload(start, end - start, None)
+    try:
+        return JsonPayload(start, end - start, json.loads(message[start:end]))
+    except RecursionError:
+        return None
+    except ValueError:
+        pass
     
+    # Braces in the text before the body, e.g. "Map {a=1} body: {...}"
+    start = _json_start(message, end)
+    if start <= message.find('{', 0, end) or end - start < 3:
+        return None
+    try:
+        return JsonPayload(start, end - start, json.loads(message[start:end]))
+    except (ValueError, RecursionError):
+        return None
+
+
+def _json_count(n: int, more: str = '') -> str:
+    """Dim "… N items" / "… N more items" marker text."""
+    return f"{Colors.BRIGHT_BLACK}… {n:,} {more}item{'' if n == 1 else 's'}{Colors.RESET}"
+
+
+def _json_line(value: Any, prefix: str, depth: int, tail: str, stack: List[list], limits: JsonLimits) -> str:
+    """Render one scalar, or open a container by pushing a frame onto stack."""
+    cls = value.__class__
     if value is None:
-        return f"{Colors.BRIGHT_RED}null{Colors.RESET}"
-    elif isinstance(value, bool):
+        text = f"{Colors.BRIGHT_RED}null{Colors.RESET}"
+    elif cls is bool:
         color = Colors.BRIGHT_GREEN if value else Colors.BRIGHT_RED
-        return f"{color}{str(value).lower()}{Colors.RESET}"
-    elif isinstance(value, (int, float)):
-        return f"{Colors.BRIGHT_YELLOW}{value}{Colors.RESET}"
-    elif isinstance(value, str):
-        escaped = json.dumps(value)
-        return f"{Colors.BRIGHT_GREEN}{escaped}{Colors.RESET}"
-    elif isinstance(value, list):
-        if not value:
-            return f"{Colors.WHITE}[]{Colors.RESET}"
-        items = []
-        for item in value:
-            items.append(f"{indent_str}  {colorize_json_value(item, indent + 1)}")
-        return f"{Colors.WHITE}[{Colors.RESET}\n" + ",\n".join(items) + f"\n{indent_str}{Colors.WHITE}]{Colors.RESET}"
-    elif isinstance(value, dict):
+        text = f"{color}{str(value).lower()}{Colors.RESET}"
+    elif cls is int or cls is float:
+        text = f"{Colors.BRIGHT_YELLOW}{value}{Colors.RESET}"
+    elif cls is str:
+        text = f"{Colors.BRIGHT_GREEN}{json.dumps(value)}{Colors.RESET}"
+    elif cls is list or cls is dict:
+        opening, close = ('[', ']') if cls is list else ('{', '}')
         if not value:
-            return f"{Colors.WHITE}{{}}{Colors.RESET}"
-        items = []
-        for k, v in value.items():
-            key_colored = f"{Colors.BRIGHT_CYAN}\"{k}\"{Colors.RESET}"
-            val_colored = colorize_json_value(v, indent + 1)
-            items.append(f"{indent_str}  {key_colored}: {val_colored}")
-        return f"{Colors.WHITE}{{{Colors.RESET}\n" + ",\n".join(items) + f"\n{indent_str}{Colors.WHITE}}}{Colors.RESET}"
+            text = f"{Colors.WHITE}{opening}{close}{Colors.RESET}"
+        elif depth >= limits.depth:
+            text = f"{Colors.WHITE}{opening}{Colors.RESET}{_json_count(len(value))}{Colors.WHITE}{close}{Colors.RESET}"
+        else:
+            pairs = value.items() if cls is dict else zip(itertools.repeat(None), value)
+            entries = list(itertools.islice(pairs, limits.items))
+            # [entries, next index, depth, entries not shown, closing bracket, tail]
+            stack.append([entries, 0, depth, len(value) - len(entries), close, tail])
+            return f"{prefix}{Colors.WHITE}{opening}{Colors.RESET}"
     else:
-        return str(value)
+        text = str(value)
+    return f"{prefix}{text}{tail}"
+
+
+def render_json(value: Any, base_indent: str = "", limits: Optional[JsonLimits] = None) -> str:
+    """
+    Colorize a parsed JSON value, one element per line, without recursion.
+    
+    Containers nested deeper than limits.depth collapse to "[… N items]",
+    containers longer than limits.items end in a "… N more items" marker,
+    and once about limits.output bytes are rendered the open containers
+    are closed with a marker counting what was left out.
+    """
+    limits = limits or JSON_LIMITS
+    stack = []
+    lines = [_json_line(value, '', 0, '', stack, limits)]
+    budget = limits.output - len(lines[0])
+    while stack:
+        frame = stack[-1]
+        entries, index, depth, hidden, close, tail = frame
+        if budget < 0:
+            hidden += len(entries) - index
+            index = len(entries)
+        if index < len(entries):
+            frame[1] = index + 1
+            key, item = entries[index]
+            prefix = '  ' * (depth + 1)
+            if key is not None:
+                prefix = f"{prefix}{Colors.BRIGHT_CYAN}\"{key}\"{Colors.RESET}: "
+            comma = ',' if index + 1 < len(entries) or hidden else ''
+            line = _json_line(item, prefix, depth + 1, comma, stack, limits)
+        else:
+            stack.pop()
+            if hidden:
+                lines.append(f"{'  ' * (depth + 1)}{_json_count(hidden, 'more ')}")
+            line = f"{'  ' * depth}{Colors.WHITE}{close}{Colors.RESET}{tail}"
+        lines.append(line)
+        budget -= len(line)
+    return '\n'.join(base_indent + line for line in lines)
+
+
+def render_json_payload(payload: JsonPayload, base_indent: str = "") -> str:
+    """Render a payload from find_json_payload(), or a placeholder if it was dropped."""
+    if payload.value is None:
+        size = payload.size / 1024
+        size = f"{size / 1024:,.1f} MB" if size >= 1024 else f"{size:,.1f} KB"
+        return f"{base_indent}{Colors.WHITE}{{{Colors.RESET}{Colors.BRIGHT_BLACK}… {size} body omitted{Colors.RESET}{Colors.WHITE}}}{Colors.RESET}"
+    return render_json(payload.value, base_indent)
 
 
 def pretty_print_json(json_str: str, base_indent: str = "") -> str:
     """Parse and pretty-print JSON with colors."""
     try:
         data = json.loads(json_str)
-        lines = colorize_json_value(data).split('\n')
-        return '\n'.join(base_indent + line for line in lines)
     except json.JSONDecodeError:
         return f"{base_indent}{Colors.WHITE}{json_str}{Colors.RESET}"
+    return render_json(data, base_indent)
+
+
+# ============================================================================
+# Highlighting Engine
+# ============================================================================
+
+class HighlightRule:
+    """A named regex plus the function that renders its matched text."""
+    __slots__ = ('name', 'pattern', 'render')
+    
+    def __init__(self, name: str, pattern: str, render: Callable[[str], str]):
+        self.name = name
+        self.pattern = pattern
+        self.render = render
+
+
+class Highlighter:
+    """
+    Single-pass highlighter.
+    
+    All rules are compiled into one alternation and the text is scanned once.
+    Overlaps resolve by priority: the leftmost match wins, and at the same
+    position the rule listed first wins. Output is assembled from the
+    original text, so escape codes emitted for one match are never rescanned.
+    
+    Rules must only use non-capturing groups, so the outermost group index
+    of a match identifies the rule that produced it.
+    """
+    
+    def __init__(self, rules: List[HighlightRule]):
+        self.rules = list(rules)
+        parts = []
+        for rule in self.rules:
+            if re.compile(rule.pattern).groups:
+                raise ValueError(f"Highlight rule '{rule.name}' must not use capturing groups")
+            parts.append(f"({rule.pattern})")
+        self._regex = re.compile('|'.join(parts))
+        self._renderers = [None] + [rule.render for rule in self.rules]
+    
+    def highlight(self, text: str) -> str:
+        """Return text with every rule match rendered."""
+        renderers = self._renderers
+        out = []
+        pos = 0
+        for match in self._regex.finditer(text):
+            start = match.start()
+            if start > pos:
+                out.append(text[pos:start])
+            out.append(renderers[match.lastindex](match.group()))
+            pos = match.end()
+        if not out:
+            return text
+        out.append(text[pos:])
+        return ''.join(out)
+    
+    def scan(self, text: str) -> List[tuple]:
+        """Return (start, end, render) for every rule match, without rendering."""
+        renderers = self._renderers
+        return [(m.start(), m.end(), renderers[m.lastindex]) for m in self._regex.finditer(text)]
+
+
+def _style(*names: str) -> Callable[[str], str]:
+    """Build a renderer wrapping text in the named Colors attributes."""
+    def render(text: str) -> str:
+        prefix = ''.join(getattr(Colors, name) for name in names)
+        return f"{prefix}{text}{Colors.RESET}"
+    return render
+
+
+def _render_kotlin_ref(text: str) -> str:
+    """Render "CatchApiService.kt:35"."""
+    name, _, line_no = text.rpartition(':')
+    return f"{Colors.BRIGHT_CYAN}{name}{Colors.RESET}:{Colors.BRIGHT_YELLOW}{line_no}{Colors.RESET}"
+
+
+def _render_source_ref(text: str) -> str:
+    """Render "(CatchApiService.kt:35)" from a stack frame."""
+    name, _, line_no = text[1:-1].rpartition(':')
+    return f"({Colors.CYAN}{name}{Colors.RESET}:{Colors.BRIGHT_YELLOW}{line_no}{Colors.RESET})"
+
+
+def _render_status_bracket(text: str) -> str:
+    """Render "[200 OK]" or "[404 Not Found]"."""
+    code, _, reason = text[1:-1].partition(' ')
+    return f"[{colorize_http_status(int(code))} {reason.lstrip()}]"
+
+
+def _render_response_status(text: str) -> str:
+    """Render "← 200"."""
+    return f"{colorize_arrow('←')}{text[1:-3]}{colorize_http_status(int(text[-3:]))}"
+
+
+def _render_number_unit(text: str) -> str:
+    """Render "250ms" / "12 items", normalizing the gap to one space."""
+    i = 0
+    while text[i].isdigit():
+        i += 1
+    return f"{Colors.BRIGHT_YELLOW}{text[:i]}{Colors.RESET} {text[i:].lstrip()}"
+
+
+def _keywords(words: List[str]) -> str:
+    """Case-insensitive whole-word alternation for a keyword list."""
+    return r'(?i:\b(?:' + '|'.join(words) + r')\b)'
+
+
+ERROR_KEYWORDS = ['error', 'failed', 'failure', 'exception', 'crash', 'fatal', 'null', 'invalid', 'illegal']
+SUCCESS_KEYWORDS = ['success', 'successful', 'ok', 'created', 'deleted', 'loaded', 'complete', 'done', 'ready', 'connected']
+WARNING_KEYWORDS = ['warning', 'warn', 'retry', 'retrying', 'slow', 'deprecated', 'timeout', 'unavailable']
+INFO_KEYWORDS = ['loading', 'fetching', 'starting', 'initializing', 'processing', 'saving', 'reading', 'writing']
+
+# Rules for log messages, highest priority first
+MESSAGE_RULES = [
+    # URLs (bright blue, underlined) - before paths so the path part stays in the URL
+    HighlightRule('url', r'https?://[^\s]+', _style('UNDERLINE', 'BRIGHT_BLUE')),
+    # Class names with line numbers (e.g., "CatchApiService.kt:35")
+    HighlightRule('kotlin_ref', r'\b[A-Z][a-zA-Z0-9_]*\.kt:\d+\b', _render_kotlin_ref),
+    # File paths
+    HighlightRule('path', r'/[a-zA-Z0-9_/\-\.]+\.[a-zA-Z]+', _style('BRIGHT_WHITE')),
+    # Java/Kotlin class references (e.g., "com.hooked.CatchApiService")
+    HighlightRule('package', r'\bcom\.[a-zA-Z0-9_.]+\b', _style('CYAN')),
+    # HTTP status codes in brackets [200 OK] or [404 Not Found]
+    HighlightRule('status_bracket', r'\[\d{3}\s+[^\]]+\]', _render_status_bracket),
+    # Response arrow followed by a status code
+    HighlightRule('response_status', r'←\s\d{3}(?=\s)', _render_response_status),
+    # Request/response arrows
+    HighlightRule('arrow', r'[→←]', colorize_arrow),
+    # HTTP methods (bright)
+    HighlightRule('http_method', r'\b(?:GET|POST|PUT|PATCH|DELETE)\b', colorize_http_method),
+    # Exception class names (ending in Exception or Error) - bright red
+    HighlightRule('exception', r'\b[A-Z][a-zA-Z]*(?:Exception|Error|Throwable)\b', _style('BOLD', 'BRIGHT_RED')),
+    HighlightRule('caused_by', r'Caused by:', _style('BOLD', 'BRIGHT_RED')),
+    # "at " stack trace prefix
+    HighlightRule('stack_at', r'^\s*at\s+', _style('BRIGHT_BLACK')),
+    # Quoted strings - green
+    HighlightRule('double_quoted', r'"[^"]*"', _style('BRIGHT_GREEN')),
+    HighlightRule('single_quoted', r"'[^']*'", _style('BRIGHT_GREEN')),
+    # UUIDs - magenta
+    HighlightRule('uuid', r'\b[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}\b', _style('BRIGHT_MAGENTA')),
+    # Memory addresses and hex values - dim magenta
+    HighlightRule('hex', r'\b0x[a-fA-F0-9]+\b', _style('MAGENTA')),
+    # Numbers with units - yellow
+    HighlightRule('number_unit', r'\b\d+\s*(?i:ms|MB|KB|GB|bytes|items|catches|records|rows|s|seconds|minutes|min)\b', _render_number_unit),
+    # Keywords based on meaning
+    HighlightRule('error_keyword', _keywords(ERROR_KEYWORDS), _style('BRIGHT_RED')),
+    HighlightRule('success_keyword', _keywords(SUCCESS_KEYWORDS), _style('BRIGHT_GREEN')),
+    HighlightRule('warning_keyword', _keywords(WARNING_KEYWORDS), _style('BRIGHT_YELLOW')),
+    HighlightRule('info_keyword', _keywords(INFO_KEYWORDS), _style('BRIGHT_CYAN')),
+    # Boolean values
+    HighlightRule('true', r'(?i:\btrue\b)', _style('BRIGHT_GREEN')),
+    HighlightRule('false', r'(?i:\bfalse\b)', _style('BRIGHT_RED')),
+    # Standalone numbers - yellow
+    HighlightRule('number', r'\b\d+\b', _style('YELLOW')),
+]
+
+# Rules for unparseable continuation lines following an error (stack traces)
+STACK_TRACE_RULES = [
+    HighlightRule('stack_at', r'^\s*at\s+', _style('BRIGHT_BLACK')),
+    HighlightRule('caused_by', r'Caused by:', _style('BOLD', 'BRIGHT_RED')),
+    # class.method before the argument list
+    HighlightRule('method', r'[a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*(?=\()', _style('BRIGHT_RED')),
+    # (File.kt:123)
+    HighlightRule('source_ref', r'\([^:()]+:\d+\)', _render_source_ref),
+    HighlightRule('exception', r'\b[A-Z][a-zA-Z]*(?:Exception|Error)\b', _style('BOLD', 'BRIGHT_RED')),
+]
+
+MESSAGE_HIGHLIGHTER = Highlighter(MESSAGE_RULES)
+STACK_TRACE_HIGHLIGHTER = Highlighter(STACK_TRACE_RULES)
 
 
 def colorize_message(message: str, level: str) -> tuple:
     """
     Colorize the message content based on log level and content.
-    Returns (colorized_main_message, colorized_json_block or None)
+    Returns (colorized_main_message, JsonPayload or None)
     """
     result = message
-    json_block = None
-    level = level.upper().strip()
+    stats = RUN_STATS
+    if stats is not None:
+        started = time.perf_counter()
     
-    # Extract JSON from message if present
-    json_match = re.search(r'(\{.+\})\s*$', message, re.DOTALL)
-    if json_match:
-        json_str = json_match.group(1)
-        message_without_json = message[:json_match.start()].rstrip()
-        
-        try:
-            json.loads(json_str)
-            result = message_without_json
-            json_block = json_str
-        except json.JSONDecodeError:
-            pass
+    # Split off a trailing JSON body if present
+    json_block = find_json_payload(message, JSON_LIMITS.drop_over)
+    if json_block is not None:
+        result = message[:json_block.start].rstrip()
+    if stats is not None:
+        found = time.perf_counter()
+        stats.seconds['json'] += found - started
     
-    # Colorize arrows
-    result = re.sub(r'→', colorize_arrow('→'), result)
-    result = re.sub(r'←', colorize_arrow('←'), result)
+    # Highlight everything else in a single pass
+    if RENDER_CACHE is not None and RENDER_CACHE.templates is not None:
+        result = RENDER_CACHE.templates.highlight(result)
+    else:
+        result = MESSAGE_HIGHLIGHTER.highlight(result)
+    if stats is not None:
+        stats.seconds['colorize'] += time.perf_counter() - found
     
-    # Colorize HTTP methods (bright)
-    result = re.sub(
-        r'\b(GET|POST|PUT|PATCH|DELETE)\b',
-        lambda m: colorize_http_method(m.group(1)),
-        result
-    )
+    # Apply overall color tint based on log level
+    if level in ('E', 'ERROR', 'F', 'FATAL', 'A'):
+        # Keep error message vibrant - don't dim it
+        pass
+    elif level in ('W', 'WARNING'):
+        pass
+    elif level in ('I', 'INFO'):
+        pass
+    elif level in ('D', 'DEBUG'):
+        pass
     
-    # Colorize HTTP status codes in brackets [200 OK] or [404 Not Found]
-    def colorize_status_bracket(match):
-        code = int(match.group(1))
-        text = match.group(2)
-        colored_code = colorize_http_status(code)
-        return f"[{colored_code} {text}]"
+    return result, json_block
+
+
+# ============================================================================
+# Render Cache
+# ============================================================================
+
+class LRUCache:
+    """Bounded, thread-safe mapping that evicts the least recently used entry."""
     
-    result = re.sub(
-        r'\[(\d{3})\s+([^\]]+)\]',
-        colorize_status_bracket,
-        result
-    )
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
     
-    # Colorize standalone status codes
-    def colorize_status_standalone(match):
-        prefix = match.group(1)
-        code = int(match.group(2))
-        suffix = match.group(3)
-        colored_code = colorize_http_status(code)
-        return f"{prefix}{colored_code}{suffix}"
+    def __len__(self) -> int:
+        return len(self._data)
     
-    result = re.sub(
-        r'(← )(\d{3})(\s)',
-        colorize_status_standalone,
-        result
-    )
+    def get(self, key, default=None):
+        """Return the cached value for key, counting the hit or miss."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
     
-    # Colorize URLs (bright blue, underlined)
-    result = re.sub(
-        r'(https?://[^\s]+)',
-        f"{Colors.UNDERLINE}{Colors.BRIGHT_BLUE}\\1{Colors.RESET}",
-        result
-    )
+    def put(self, key, value):
+        """Store value, evicting the oldest entry if over capacity."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
     
-    # Colorize file paths
-    result = re.sub(
-        r'(/[a-zA-Z0-9_/\-\.]+\.[a-zA-Z]+)',
-        f"{Colors.BRIGHT_WHITE}\\1{Colors.RESET}",
-        result
-    )
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were hits."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TemplateCache:
+    """
+    Caches the highlighted skeleton of messages with numbers and UUIDs masked.
     
-    # Colorize class names with line numbers (e.g., "CatchApiService.kt:35")
-    result = re.sub(
-        r'\b([A-Z][a-zA-Z0-9_]*\.kt):(\d+)\b',
-        f"{Colors.BRIGHT_CYAN}\\1{Colors.RESET}:{Colors.BRIGHT_YELLOW}\\2{Colors.RESET}",
-        result
-    )
+    UUIDs are masked to zeros and digit runs to at most four zeros, which
+    keeps every distinction the highlight rules make (e.g. three-digit status
+    codes), so a masked message scans to the same spans as the original.
+    Spans that don't touch a masked token are stored pre-rendered; the rest
+    are re-rendered from the original text, so values like status codes keep
+    their own colors.
+    """
     
-    # Colorize Java/Kotlin class references (e.g., "com.hooked.CatchApiService")
-    result = re.sub(
-        r'\b(com\.[a-zA-Z0-9_.]+)\b',
-        f"{Colors.CYAN}\\1{Colors.RESET}",
-        result
-    )
+    _MASK = re.compile(r'\b[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}\b|\b\d+(?![\dx])')
+    _ZERO = str.maketrans('123456789abcdefABCDEF', '0' * 21)
     
-    # Colorize exception class names (ending in Exception or Error) - BRIGHT RED
-    result = re.sub(
-        r'\b([A-Z][a-zA-Z]*(?:Exception|Error|Throwable))\b',
-        f"{Colors.BOLD}{Colors.BRIGHT_RED}\\1{Colors.RESET}",
-        result
-    )
+    def __init__(self, highlighter: Highlighter, maxsize: int):
+        self.highlighter = highlighter
+        self.cache = LRUCache(maxsize)
     
-    # Colorize "at " stack trace lines
-    result = re.sub(
-        r'^(\s*at\s+)',
-        f"{Colors.BRIGHT_BLACK}\\1{Colors.RESET}",
-        result
-    )
+    def highlight(self, text: str) -> str:
+        """Highlight text, reusing the skeleton of a previously seen template."""
+        parts = []
+        # deltas[k]: how far the original text is shifted after k masked tokens
+        deltas = [0]
+        pos = 0
+        for match in self._MASK.finditer(text):
+            start, end = match.span()
+            token = match.group()
+            masked = token.translate(self._ZERO) if len(token) == 36 else '0' * min(len(token), 4)
+            parts.append(text[pos:start])
+            parts.append(masked)
+            deltas.append(deltas[-1] + len(token) - len(masked))
+            pos = end
+        if len(deltas) == 1:
+            key = text
+        else:
+            parts.append(text[pos:])
+            key = ''.join(parts)
+        
+        pieces = self.cache.get(key)
+        if pieces is None:
+            pieces = self._compile(key)
+            self.cache.put(key, pieces)
+            if pieces is False:
+                return self.highlighter.highlight(text)
+        elif pieces is False:
+            return self.highlighter.highlight(text)
+        
+        out = []
+        for piece in pieces:
+            if piece.__class__ is str:
+                out.append(piece)
+            else:
+                start, end, render, k_start, k_end = piece
+                out.append(render(text[start + deltas[k_start]:end + deltas[k_end]]))
+        return ''.join(out)
     
-    # Colorize "Caused by:" 
-    result = re.sub(
-        r'(Caused by:)',
-        f"{Colors.BOLD}{Colors.BRIGHT_RED}\\1{Colors.RESET}",
-        result
-    )
+    def _compile(self, masked: str) -> Any:
+        """
+        Split a masked message into pre-rendered strings and value-dependent
+        spans, or return False if a span cuts through a masked token.
+        """
+        regions = [m.span() for m in self._MASK.finditer(masked)]
+        spans = []
+        pos = 0
+        for start, end, render in self.highlighter.scan(masked):
+            if start > pos:
+                spans.append((pos, start, str))
+            spans.append((start, end, render))
+            pos = end
+        if pos < len(masked):
+            spans.append((pos, len(masked), str))
+        
+        pieces = []
+        k = 0
+        for start, end, render in spans:
+            while k < len(regions) and regions[k][1] <= start:
+                k += 1
+            k_end = k
+            while k_end < len(regions) and regions[k_end][1] <= end:
+                k_end += 1
+            if k < len(regions) and regions[k][0] < start:
+                return False
+            if k_end < len(regions) and regions[k_end][0] < end:
+                return False
+            if k_end > k:
+                pieces.append((start, end, render, k, k_end))
+            else:
+                pieces.append(render(masked[start:end]))
+        return pieces
+
+
+class RenderCache:
+    """Caches formatted lines by (level, tag, message), plus optional templates."""
     
-    # Colorize keywords based on meaning
-    # Error keywords - bright red
-    error_keywords = ['error', 'failed', 'failure', 'exception', 'crash', 'fatal', 'null', 'invalid', 'illegal']
-    for kw in error_keywords:
-        result = re.sub(
-            rf'\b({kw})\b',
-            f"{Colors.BRIGHT_RED}\\1{Colors.RESET}",
-            result,
-            flags=re.IGNORECASE
-        )
+    def __init__(self, maxsize: int = 4096, templates: bool = False):
+        self.lines = LRUCache(maxsize)
+        self.templates = TemplateCache(MESSAGE_HIGHLIGHTER, maxsize) if templates else None
     
-    # Success keywords - bright green
-    success_keywords = ['success', 'successful', 'ok', 'created', 'deleted', 'loaded', 'complete', 'done', 'ready', 'connected']
-    for kw in success_keywords:
-        result = re.sub(
-            rf'\b({kw})\b',
-            f"{Colors.BRIGHT_GREEN}\\1{Colors.RESET}",
-            result,
-            flags=re.IGNORECASE
-        )
+    def stats_lines(self) -> List[str]:
+        """Human-readable hit/miss summary."""
+        caches = [('lines', self.lines)]
+        if self.templates is not None:
+            caches.append(('templates', self.templates.cache))
+        return [
+            f"{name}: {cache.hits} hits, {cache.misses} misses "
+            f"({cache.hit_rate():.1%} hit rate), {len(cache)}/{cache.maxsize} entries, "
+            f"{cache.evictions} evictions"
+            for name, cache in caches
+        ]
+
+
+# Set by main() from --cache-size / --cache-templates; None disables caching
+RENDER_CACHE: Optional[RenderCache] = None
+
+
+# ============================================================================
+# Log Parsing
+# ============================================================================
+
+# Returned by LogcatParser.parse() for lines consumed into a record that isn't complete yet
+PENDING = object()
+
+_LEVEL_CHARS = frozenset('VDIWEFA')
+_LEVEL_NUMBERS = LogLevel._names
+
+# Regex fallbacks for lines that don't fit the fixed-width fast paths
+_TIME_RE = re.compile(
+    r'(\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})\s+'  # timestamp
+    r'([VDIWEFA])/([^\(]+)\(\s*(\d+)\):\s*'         # level/tag(pid):
+    r'(.*)'                                          # message
+)
+_THREADTIME_RE = re.compile(
+    r'(\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})\s+'  # timestamp
+    r'(\d+)\s+(\d+)\s+'                              # PID TID
+    r'([VDIWEFA])\s+'                                # level
+    r'([^:]+):\s*'                                   # tag
+    r'(.*)'                                          # message
+)
+_LONG_HEADER_RE = re.compile(
+    r'\[\s+(.+?)\s+(\d+):\s*(\d+)\s+([VDIWEFA])/(.+?)\s*\]$'
+)
+
+
+class LogRecord:
+    """
+    One parsed logcat record.
     
-    # Warning keywords - bright yellow
-    warning_keywords = ['warning', 'warn', 'retry', 'retrying', 'slow', 'deprecated', 'timeout', 'unavailable']
-    for kw in warning_keywords:
-        result = re.sub(
-            rf'\b({kw})\b',
-            f"{Colors.BRIGHT_YELLOW}\\1{Colors.RESET}",
-            result,
-            flags=re.IGNORECASE
-        )
+    Slots rather than a dict per line: the tag is interned, the level is
+    kept as its letter and as a LogLevel number (levelno), pid and tid are
+    ints shared between records, and the raw line is only kept for parsers
+    asked to (keep_raw). Everything that holds records (the archive, the
+    interactive view's scrollback, reassembly) holds these.
+    """
+    __slots__ = ('timestamp', 'level', 'levelno', 'tag', 'pid', 'tid', 'message', 'raw')
     
-    # Info keywords - bright cyan
-    info_keywords = ['loading', 'fetching', 'starting', 'initializing', 'processing', 'saving', 'reading', 'writing']
-    for kw in info_keywords:
-        result = re.sub(
-            rf'\b({kw})\b',
-            f"{Colors.BRIGHT_CYAN}\\1{Colors.RESET}",
-            result,
-            flags=re.IGNORECASE
-        )
+    def __init__(self, timestamp: str, level: str, tag: str, pid: int, tid: int, message: str,
+                 raw: Optional[str] = None):
+        self.timestamp = timestamp
+        self.level = level
+        self.levelno = _LEVEL_NUMBERS[level]
+        self.tag = sys.intern(tag)
+        self.pid = pid
+        self.tid = tid
+        self.message = message
+        self.raw = raw
     
-    # Colorize UUIDs - magenta
-    result = re.sub(
-        r'\b([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})\b',
-        f"{Colors.BRIGHT_MAGENTA}\\1{Colors.RESET}",
-        result,
-        flags=re.IGNORECASE
-    )
+    def copy(self, cls: Optional[type] = None) -> 'LogRecord':
+        """A shallow copy, as cls (a LogRecord subclass) if given."""
+        record = object.__new__(cls or self.__class__)
+        for name in LogRecord.__slots__:
+            setattr(record, name, getattr(self, name))
+        return record
     
-    # Colorize numbers with units - yellow
-    result = re.sub(
-        r'\b(\d+)\s*(ms|MB|KB|GB|bytes|items|catches|records|rows|s|seconds|minutes|min)\b',
-        f"{Colors.BRIGHT_YELLOW}\\1{Colors.RESET} \\2",
-        result,
-        flags=re.IGNORECASE
-    )
+    def __reduce__(self):
+        # For --jobs workers; unpickling goes through __init__ so the tag is interned again
+        return (self.__class__, (self.timestamp, self.level, self.tag, self.pid, self.tid, self.message, self.raw))
     
-    # Colorize standalone numbers - yellow
-    result = re.sub(
-        r'\b(\d+)\b',
-        f"{Colors.YELLOW}\\1{Colors.RESET}",
-        result
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}({self.timestamp!r}, {self.level!r}, {self.tag!r}, "
+                f"{self.pid}, {self.tid}, {self.message!r})")
+
+
+# pid/tid text -> int, so the records of a thread share one int; parsers
+# try "_IDS.get(text) or" first to save the call
+_IDS: Dict[str, int] = {}
+
+
+def _id_number(text: str) -> int:
+    number = _IDS.get(text)
+    if number is None:
+        if len(_IDS) >= 65536:
+            _IDS.clear()
+        number = _IDS[text] = int(text)
+    return number
+
+
+def _has_date_prefix(line: str) -> bool:
+    """Cheap check for a "MM-DD HH:MM:SS.mmm " prefix at fixed offsets."""
+    return (
+        len(line) > 19
+        and line[2] == '-' and line[5] == ' ' and line[8] == ':'
+        and line[11] == ':' and line[14] == '.' and line[18] == ' '
+        and line[0].isdigit()
     )
+
+
+def parse_time_line(line: str) -> Optional[LogRecord]:
+    """
+    Parse a "-v time" line.
     
-    # Colorize memory addresses and hex values - dim magenta
-    result = re.sub(
-        r'\b(0x[a-fA-F0-9]+)\b',
-        f"{Colors.MAGENTA}\\1{Colors.RESET}",
-        result
-    )
+    Format: "MM-DD HH:MM:SS.mmm LEVEL/TAG(PID): message"
+    Example: "01-19 17:54:16.950 D/AsyncImage( 6192): Loading image..."
+    """
+    if _has_date_prefix(line) and line[20] == '/' and line[19] in _LEVEL_CHARS:
+        open_paren = line.find('(', 21)
+        close = line.find('):', open_paren)
+        if open_paren > 21 and close > 0:
+            pid = line[open_paren + 1:close].strip()
+            if pid.isdigit():
+                pid = _IDS.get(pid) or _id_number(pid)
+                # TID is the PID in this format
+                return LogRecord(line[:18], line[19], line[21:open_paren].strip(), pid, pid,
+                                 line[close + 2:].lstrip())
     
-    # Colorize quoted strings - green
-    result = re.sub(
-        r'"([^"]*)"',
-        f'{Colors.BRIGHT_GREEN}"\\1"{Colors.RESET}',
-        result
-    )
+    match = _TIME_RE.match(line)
+    if match:
+        pid = _id_number(match.group(4))
+        return LogRecord(match.group(1), match.group(2), match.group(3).strip(), pid, pid, match.group(5))
+    return None
+
+
+def parse_threadtime_line(line: str) -> Optional[LogRecord]:
+    """
+    Parse a "-v threadtime" line.
     
-    # Colorize single-quoted strings - green
-    result = re.sub(
-        r"'([^']*)'",
-        f"{Colors.BRIGHT_GREEN}'\\1'{Colors.RESET}",
-        result
-    )
+    Format: "MM-DD HH:MM:SS.mmm  PID  TID LEVEL TAG: message"
+    Example: "01-19 17:54:16.950  6192  6192 D AsyncImage: Loading image..."
+    """
+    if _has_date_prefix(line):
+        fields = line[18:].split(None, 3)
+        if len(fields) == 4:
+            pid, tid, level, rest = fields
+            tag, sep, message = rest.partition(':')
+            if sep and tag and level in _LEVEL_CHARS and pid.isdigit() and tid.isdigit():
+                return LogRecord(line[:18], level, tag.strip(), _IDS.get(pid) or _id_number(pid),
+                                 _IDS.get(tid) or _id_number(tid), message.lstrip())
     
-    # Colorize boolean values
-    result = re.sub(
-        r'\b(true)\b',
-        f"{Colors.BRIGHT_GREEN}\\1{Colors.RESET}",
-        result,
-        flags=re.IGNORECASE
-    )
-    result = re.sub(
-        r'\b(false)\b',
-        f"{Colors.BRIGHT_RED}\\1{Colors.RESET}",
-        result,
-        flags=re.IGNORECASE
-    )
+    match = _THREADTIME_RE.match(line)
+    if match:
+        return LogRecord(match.group(1), match.group(4), match.group(5).strip(), _id_number(match.group(2)),
+                         _id_number(match.group(3)), match.group(6))
+    return None
+
+
+def parse_seconds_line(line: str) -> Optional[LogRecord]:
+    """
+    Parse a "-v epoch" or "-v monotonic" line (threadtime layout, seconds timestamp).
     
-    # Apply overall color tint based on log level
-    if level in ('E', 'ERROR', 'F', 'FATAL', 'A'):
-        # Keep error message vibrant - don't dim it
-        pass
-    elif level in ('W', 'WARNING'):
-        pass
-    elif level in ('I', 'INFO'):
-        pass
-    elif level in ('D', 'DEBUG'):
-        pass
+    Format: "SECONDS.mmm  PID  TID LEVEL TAG: message"
+    Example: "1705686856.950  6192  6192 D AsyncImage: Loading image..."
+    """
+    fields = line.split(None, 4)
+    if len(fields) != 5:
+        return None
+    timestamp, pid, tid, level, rest = fields
+    seconds, dot, millis = timestamp.partition('.')
+    if not (dot and seconds.isdigit() and millis.isdigit()):
+        return None
+    tag, sep, message = rest.partition(':')
+    if not (sep and tag and level in _LEVEL_CHARS and pid.isdigit() and tid.isdigit()):
+        return None
+    return LogRecord(timestamp, level, tag.strip(), _IDS.get(pid) or _id_number(pid),
+                     _IDS.get(tid) or _id_number(tid), message.lstrip())
+
+
+def parse_long_header(line: str) -> Optional[LogRecord]:
+    """
+    Parse the header of a "-v long" record; the message follows on later lines.
     
-    return result, json_block
+    Format: "[ MM-DD HH:MM:SS.mmm  PID: TID LEVEL/TAG ]"
+    """
+    if not line.startswith('[ '):
+        return None
+    match = _LONG_HEADER_RE.match(line)
+    if not match:
+        return None
+    return LogRecord(match.group(1), match.group(4), match.group(5).strip(), _id_number(match.group(2)),
+                     _id_number(match.group(3)), '')
 
 
-# ============================================================================
-# Log Parsing
-# ============================================================================
+class LogcatParser:
+    """
+    Per-stream logcat parser.
+    
+    Given a format, the parser is locked to it from the start. Without one,
+    it tries each format until a line parses, then locks to that format for
+    the rest of the stream. "long" records span several lines: header and
+    message lines return PENDING and the record is returned on the blank
+    line that ends it.
+    """
+    
+    LINE_PARSERS = {
+        'time': parse_time_line,
+        'threadtime': parse_threadtime_line,
+        'epoch': parse_seconds_line,
+        'monotonic': parse_seconds_line,
+    }
+    FORMATS = ('time', 'threadtime', 'epoch', 'monotonic', 'long')
+    
+    def __init__(self, fmt: Optional[str] = None, keep_raw: bool = False):
+        if fmt is not None and fmt not in self.FORMATS:
+            raise ValueError(f"Unknown logcat format: {fmt}")
+        self.format = None
+        self.keep_raw = keep_raw
+        self._parse_line = None
+        self._pending = None
+        self._pending_lines = []
+        if fmt is not None:
+            self._lock(fmt)
+    
+    def _lock(self, fmt: str):
+        self.format = fmt
+        if fmt == 'long':
+            self._parse_line = self._parse_long
+        elif self.keep_raw:
+            self._parse_line = self._with_raw(self.LINE_PARSERS[fmt])
+        else:
+            self._parse_line = self.LINE_PARSERS[fmt]
+    
+    @staticmethod
+    def _with_raw(parse_line: Callable[[str], Optional[LogRecord]]) -> Callable[[str], Optional[LogRecord]]:
+        def parse(line: str) -> Optional[LogRecord]:
+            parsed = parse_line(line)
+            if parsed is not None:
+                parsed.raw = line
+            return parsed
+        return parse
+    
+    def parse(self, line: str) -> Any:
+        """Parse one line; returns a LogRecord, None if unparseable, or PENDING."""
+        if self._parse_line is not None:
+            return self._parse_line(line)
+        return self._detect(line)
+    
+    def _detect(self, line: str) -> Any:
+        if parse_long_header(line) is not None:
+            self._lock('long')
+            return self._parse_line(line)
+        if parse_time_line(line) is not None:
+            self._lock('time')
+        elif parse_threadtime_line(line) is not None:
+            self._lock('threadtime')
+        elif parse_seconds_line(line) is not None:
+            # Wall-clock epoch seconds are 10 digits; uptime seconds are far fewer
+            self._lock('epoch' if len(line.split('.', 1)[0].strip()) >= 9 else 'monotonic')
+        else:
+            return None
+        return self._parse_line(line)
+    
+    def _parse_long(self, line: str) -> Any:
+        if self._pending is None:
+            header = parse_long_header(line)
+            if header is None:
+                return PENDING if not line else None
+            if self.keep_raw:
+                header.raw = line
+            self._pending = header
+            return PENDING
+        
+        if line:
+            self._pending_lines.append(line)
+            return PENDING
+        return self.flush()
+    
+    def flush(self) -> Optional[LogRecord]:
+        """Return a "long" record still waiting for its terminating blank line."""
+        record = self._pending
+        if record is None:
+            return None
+        record.message = '\n'.join(self._pending_lines)
+        if self.keep_raw and self._pending_lines:
+            record.raw += '\n' + record.message
+        self._pending = None
+        self._pending_lines = []
+        return record
 
-def parse_logcat_line(line: str) -> Optional[Dict[str, str]]:
+
+def parse_logcat_line(line: str, keep_raw: bool = False) -> Optional[LogRecord]:
     """
-    Parse a standard logcat line.
+    Parse a single "time" or "threadtime" logcat line.
     
     Format 1 (time): "MM-DD HH:MM:SS.mmm LEVEL/TAG(PID): message"
     Example: "01-19 17:54:16.950 D/AsyncImage(6192): Loading image..."
     
     Format 2 (threadtime): "MM-DD HH:MM:SS.mmm  PID  TID LEVEL TAG: message"
     Example: "01-19 17:54:16.950  6192  6192 D AsyncImage: Loading image..."
-    """
-    # Try format 1: "MM-DD HH:MM:SS.mmm LEVEL/TAG(PID): message"
-    match = re.match(
-        r'(\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})\s+'  # timestamp
-        r'([VDIWEFA])/([^\(]+)\(\s*(\d+)\):\s*'         # level/tag(pid):
-        r'(.*)',                                         # message
-        line
-    )
-    
-    if match:
-        return {
-            'timestamp': match.group(1),
-            'level': match.group(2),
-            'tag': match.group(3).strip(),
-            'pid': match.group(4),
-            'tid': match.group(4),  # Same as PID for this format
-            'message': match.group(5),
-            'raw': line,
-        }
-    
-    # Try format 2: "MM-DD HH:MM:SS.mmm  PID  TID LEVEL TAG: message"
-    match = re.match(
-        r'(\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})\s+'  # timestamp
-        r'(\d+)\s+(\d+)\s+'                              # PID TID
-        r'([VDIWEFA])\s+'                                # level
-        r'([^:]+):\s*'                                   # tag
-        r'(.*)',                                         # message
-        line
-    )
-    
-    if match:
-        return {
-            'timestamp': match.group(1),
-            'pid': match.group(2),
-            'tid': match.group(3),
-            'level': match.group(4),
-            'tag': match.group(5).strip(),
-            'message': match.group(6),
-            'raw': line,
-        }
     
-    return None
+    Streams should use a LogcatParser, which locks to one format.
+    """
+    parsed = parse_time_line(line) or parse_threadtime_line(line)
+    if parsed is not None and keep_raw:
+        parsed.raw = line
+    return parsed
 
 
 def is_stack_trace_line(message: str) -> bool:
@@ -546,12 +1119,25 @@ def is_stack_trace_line(message: str) -> bool:
     return False
 
 
-def format_log_line(parsed: Dict[str, str], show_json: bool = True) -> str:
+def format_log_line(parsed: LogRecord, show_json: bool = True) -> str:
     """Format a parsed log line with full colorization."""
-    level = parsed['level']
-    msg = parsed['message']
+    if RENDER_CACHE is None:
+        return _format_log_line(parsed, show_json)
+    
+    key = (parsed.level, parsed.tag, parsed.message, show_json)
+    line = RENDER_CACHE.lines.get(key)
+    if line is None:
+        line = _format_log_line(parsed, show_json)
+        RENDER_CACHE.lines.put(key, line)
+    return line
+
+
+def _format_log_line(parsed: LogRecord, show_json: bool) -> str:
+    """Uncached body of format_log_line."""
+    level = parsed.level
+    msg = parsed.message
     
-    timestamp = colorize_timestamp(parsed['timestamp'])
+    timestamp = colorize_timestamp(parsed.timestamp)
     level_colored = LogLevel.colorize(level)
     message, json_block = colorize_message(msg, level)
     
@@ -560,23 +1146,37 @@ def format_log_line(parsed: Dict[str, str], show_json: bool = True) -> str:
         indent = "    "  # 4 spaces
         main_line = f"{level_colored} {indent}{message}"
     else:
-        tag = colorize_tag(parsed['tag'], level)
+        tag = colorize_tag(parsed.tag, level)
         main_line = f"{level_colored} {tag} {message}"
     
     # Add JSON block if present
-    if json_block and show_json:
+    if json_block is not None and show_json:
         indent = " " * 50
-        json_formatted = pretty_print_json(json_block, indent)
+        if RUN_STATS is None:
+            json_formatted = render_json_payload(json_block, indent)
+        else:
+            started = time.perf_counter()
+            json_formatted = render_json_payload(json_block, indent)
+            RUN_STATS.seconds['json'] += time.perf_counter() - started
         return f"{main_line}\n{json_formatted}"
     
     return main_line
 
 
+_SEPARATORS: Dict[str, str] = {}
+Colors._memos.append(_SEPARATORS)
+
+
 def format_separator(level: str) -> str:
     """Return a separator line based on level."""
+    separator = _SEPARATORS.get(level)
+    if separator is None:
+        separator = _SEPARATORS[level] = _format_separator(level.upper().strip())
+    return separator
+
+
+def _format_separator(level: str) -> str:
     width = 60
-    level = level.upper().strip()
-    
     if level in ('E', 'ERROR', 'F', 'FATAL', 'A'):
         return f"{Colors.BRIGHT_RED}{'━' * width}{Colors.RESET}"
     elif level in ('W', 'WARNING'):
@@ -585,24 +1185,475 @@ def format_separator(level: str) -> str:
 
 
 # ============================================================================
-# Banner & UI
+# Record Filtering
 # ============================================================================
 
-def print_banner(package: str, level: str, tags: Optional[str]):
-    """Print a startup banner."""
-    fish = "🎣"
-    
-    # Build info lines
-    info_lines = [
-        f"  Package: {Colors.BRIGHT_CYAN}{package}{Colors.RESET}",
-        f"  Level:   {Colors.BRIGHT_GREEN}{level}+{Colors.RESET}",
-    ]
-    if tags:
-        info_lines.append(f"  Tags:    {Colors.BRIGHT_YELLOW}{tags}{Colors.RESET}")
-    info_lines.append(f"  {Colors.BRIGHT_BLACK}Press Ctrl+C to exit{Colors.RESET}")
-    
-    # Calculate box width
-    max_len = max(len(re.sub(r'\033\[[0-9;]*m', '', line)) for line in info_lines)
+def parse_json_payload(message: str) -> Any:
+    """The trailing JSON object of a message, parsed, or None if there isn't one."""
+    payload = find_json_payload(message)
+    return payload.value if payload is not None else None
+
+
+def _time_key(timestamp: str, bound: Any) -> Any:
+    """Timestamp key comparable to a bound; None if they can't be compared."""
+    key = timestamp_key(timestamp)
+    if isinstance(bound, str) != isinstance(key, str):
+        return None
+    # A bound without a date matches that time on any day
+    if isinstance(bound, str) and '-' not in bound and key[2:3] == '-':
+        key = key[6:]
+    return key
+
+
+def _compare_time(timestamp: str, op: str, bound: Any) -> bool:
+    """
+    Compare a timestamp with a bound. String bounds cover everything they
+    are a prefix of, so "<= 14:05" includes 14:05:59 and "== 14:05" all of
+    that minute.
+    """
+    key = _time_key(timestamp, bound)
+    if key is None:
+        return False
+    if isinstance(bound, str) and op in ('<=', '>', '==', '!='):
+        key = key[:len(bound)]
+    return _COMPARE[op](key, bound)
+
+
+class TimeWindow:
+    """A since/until range over record timestamps (see _compare_time)."""
+    
+    def __init__(self, since: Optional[str], until: Optional[str]):
+        self.since = timestamp_key(since) if since else None
+        self.until = timestamp_key(until) if until else None
+    
+    def contains(self, timestamp: str) -> bool:
+        return ((self.since is None or _compare_time(timestamp, '>=', self.since)) and
+                (self.until is None or _compare_time(timestamp, '<=', self.until)))
+    
+    def overlaps(self, first: str, last: str) -> bool:
+        """Whether records between the first and last timestamp can be in the window."""
+        # Dateless bounds repeat every day, so a range spanning midnight always may
+        if first[:5] != last[:5] and first[2:3] == '-':
+            return True
+        return ((self.since is None or _compare_time(last, '>=', self.since)) and
+                (self.until is None or _compare_time(first, '<=', self.until)))
+
+
+_COMPARE = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+_FILTER_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<regex>/(?:[^/\\]|\\.)*/i?)
+      | (?P<op>==|!=|>=|<=|!~|[<>~(){},])
+      | (?P<word>[^\s"'/(){},=!<>~]+)
+    )''', re.VERBOSE)
+
+_FILTER_FIELDS = ('level', 'tag', 'pid', 'tid', 'message', 'time')
+
+# Relative cost of checking each field, to run cheap checks first
+_FILTER_COST = {'level': 1, 'pid': 2, 'tid': 2, 'tag': 2, 'time': 3, 'message': 6, 'json': 10}
+
+# Fields whose checks are cached per distinct value (a level check is one int comparison)
+_CACHED_FIELDS = ('tag',)
+
+# Fields held as ints on a LogRecord
+_ID_FIELDS = ('pid', 'tid')
+
+
+class FilterParser:
+    """
+    Parser for --filter expressions into a tree of tuples:
+    ('and', [nodes]), ('or', [nodes]), ('not', node) and
+    ('cmp', field, op, value), where field is a record field or
+    ('json', path).
+    
+        expr       := or
+        or         := and ('or' and)*
+        and        := not ('and' not)*
+        not        := 'not' not | '(' expr ')' | comparison
+        comparison := field op value | field ['not'] 'in' set
+        op         := == != < <= > >= ~ !~ contains
+        value      := number | word | "string" | /regex/[i]
+        set        := '{' value (',' value)* '}'
+    """
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+    
+    def _tokenize(self, text: str) -> List[tuple]:
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = _FILTER_TOKEN_RE.match(text, pos)
+            if not match or match.end() == pos:
+                # Point at the character itself, not the spaces before it
+                pos = len(text) - len(text[pos:].lstrip())
+                raise ValueError(f"filter: unexpected character at position {pos}: {text[pos:pos + 10]!r}")
+            tokens.append((match.lastgroup, match.group(match.lastgroup), match.start(match.lastgroup)))
+            pos = match.end()
+        return tokens
+    
+    def _peek(self, *values: str) -> bool:
+        if self.pos >= len(self.tokens):
+            return False
+        kind, value, _ = self.tokens[self.pos]
+        return kind in ('op', 'word') and value.lower() in values
+    
+    def _next(self, what: str) -> tuple:
+        if self.pos >= len(self.tokens):
+            raise ValueError(f"filter: expected {what} at end of expression")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+    
+    def _error(self, message: str, token: tuple):
+        raise ValueError(f"filter: {message} at position {token[2]}: {token[1]!r}")
+    
+    def parse(self) -> tuple:
+        node = self._or()
+        if self.pos < len(self.tokens):
+            self._error('unexpected', self.tokens[self.pos])
+        return node
+    
+    def _or(self) -> tuple:
+        nodes = [self._and()]
+        while self._peek('or'):
+            self.pos += 1
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+    
+    def _and(self) -> tuple:
+        nodes = [self._not()]
+        while self._peek('and'):
+            self.pos += 1
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+    
+    def _not(self) -> tuple:
+        if self._peek('not'):
+            self.pos += 1
+            return ('not', self._not())
+        if self._peek('('):
+            self.pos += 1
+            node = self._or()
+            if not self._peek(')'):
+                self._error('expected ")"', self._next('")"'))
+            self.pos += 1
+            return node
+        return self._comparison()
+    
+    def _comparison(self) -> tuple:
+        token = self._next('a field')
+        name = token[1].lower()
+        if token[0] != 'word':
+            self._error('expected a field', token)
+        if name.startswith('json.') and len(name) > 5:
+            field = ('json', tuple(token[1][5:].split('.')))
+        elif name in _FILTER_FIELDS:
+            field = name
+        else:
+            self._error(f"unknown field (expected one of {', '.join(_FILTER_FIELDS)} or json.<path>)", token)
+        
+        negate = False
+        if self._peek('not'):
+            self.pos += 1
+            negate = True
+            if not self._peek('in'):
+                self._error('expected "in" after "not"', self._next('"in"'))
+        op_token = self._next('an operator')
+        op = op_token[1].lower()
+        if op == 'in':
+            node = ('cmp', field, 'in', self._set())
+            return ('not', node) if negate else node
+        if op not in _COMPARE and op not in ('~', '!~', 'contains'):
+            self._error('expected an operator', op_token)
+        if op == 'contains' and self._peek('{'):
+            return ('cmp', field, op, self._set())
+        return ('cmp', field, op, self._value())
+    
+    def _set(self) -> frozenset:
+        if not self._peek('{'):
+            self._error('expected "{"', self._next('"{"'))
+        self.pos += 1
+        values = [self._value()]
+        while self._peek(','):
+            self.pos += 1
+            values.append(self._value())
+        if not self._peek('}'):
+            self._error('expected "}"', self._next('"}"'))
+        self.pos += 1
+        return frozenset(values)
+    
+    def _value(self) -> Any:
+        kind, value, _ = token = self._next('a value')
+        if kind == 'string':
+            return value[1:-1].encode('latin-1', 'backslashreplace').decode('unicode_escape')
+        if kind == 'regex':
+            body, flags = (value[1:-2], re.IGNORECASE) if value.endswith('i') else (value[1:-1], 0)
+            try:
+                return re.compile(body.replace('\\/', '/'), flags)
+            except re.error as e:
+                self._error(f"invalid regex ({e})", token)
+        if kind != 'word':
+            self._error('expected a value', token)
+        for convert in (int, float):
+            try:
+                return convert(value)
+            except ValueError:
+                pass
+        return {'true': True, 'false': False, 'null': None}.get(value, value)
+
+
+def _json_lookup(payload: Any, path: tuple) -> Any:
+    """Follow a json.a.b.0 path; raises LookupError/TypeError if it isn't there."""
+    for key in path:
+        payload = payload[int(key)] if isinstance(payload, list) else payload[key]
+    return payload
+
+
+def _compile_leaf(field: Any, op: str, value: Any) -> Callable[[LogRecord], bool]:
+    """Compile one comparison into a predicate over a parsed record."""
+    if field == 'level':
+        def level_value(name: Any) -> int:
+            if isinstance(name, int) and LogLevel.VERBOSE <= name <= LogLevel.FATAL:
+                return name
+            level = LogLevel._names.get(str(name).upper())
+            if level is None:
+                raise ValueError(f"filter: unknown level {name!r}")
+            return level
+        if op == 'in':
+            levels = {level_value(v) for v in value}
+            return lambda r: r.levelno in levels
+        if op not in _COMPARE:
+            raise ValueError(f"filter: level does not support {op}")
+        compare, bound = _COMPARE[op], level_value(value)
+        return lambda r: compare(r.levelno, bound)
+    
+    if field == 'time':
+        if op == 'in' or op not in _COMPARE:
+            raise ValueError(f"filter: time does not support {op}")
+        bound = timestamp_key(str(value))
+        return lambda r: _compare_time(r.timestamp, op, bound)
+    
+    if isinstance(field, tuple):
+        path = field[1]
+        memo = [None, None]
+        
+        def get(record: LogRecord) -> Any:
+            # Several json.* checks on one record parse its payload once
+            message = record.message
+            if memo[0] is not message:
+                memo[0], memo[1] = message, parse_json_payload(message)
+            return _json_lookup(memo[1], path)
+    else:
+        get = operator.attrgetter(field)
+    
+    if op == 'in':
+        strings = {str(v) for v in value}
+        if field in _ID_FIELDS:
+            numbers = {int(v) for v in strings if v.isdigit()}
+            return lambda r: get(r) in numbers
+        return _missing_is_false(lambda r: _as_text(get(r)) in strings)
+    if op == 'contains' and isinstance(value, re.Pattern):
+        op = '~'
+    if op == 'contains':
+        terms = [str(v).lower() for v in (value if isinstance(value, frozenset) else [value])]
+        return _missing_is_false(lambda r: any(t in _as_text(get(r)).lower() for t in terms))
+    if op in ('~', '!~'):
+        regex = value if isinstance(value, re.Pattern) else re.compile(str(value))
+        want = op == '~'
+        return _missing_is_false(lambda r: (regex.search(_as_text(get(r))) is not None) == want)
+    
+    compare = _COMPARE[op]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        def numeric(record: LogRecord) -> bool:
+            actual = get(record)
+            if isinstance(actual, bool):
+                return False
+            return compare(actual if isinstance(actual, (int, float)) else float(actual), value)
+        return _missing_is_false(numeric)
+    if isinstance(value, str) and op not in ('==', '!='):
+        return _missing_is_false(lambda r: compare(_as_text(get(r)), value))
+    if isinstance(field, tuple):
+        return _missing_is_false(lambda r: compare(get(r), value))
+    if field in _ID_FIELDS:
+        text = str(value)
+        if text.isdigit():
+            number = int(text)
+            return lambda r: compare(get(r), number)
+        return lambda r: compare(str(get(r)), text)
+    return lambda r: compare(get(r), str(value))
+
+
+def _as_text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _missing_is_false(check: Callable[[LogRecord], bool]) -> Callable[[LogRecord], bool]:
+    """Missing JSON fields and values that don't convert never match."""
+    def safe(record: LogRecord) -> bool:
+        try:
+            return check(record)
+        except (LookupError, TypeError, ValueError):
+            return False
+    return safe
+
+
+def _cached(check: Callable[[LogRecord], bool], field: str,
+            maxsize: int = 4096) -> Callable[[LogRecord], bool]:
+    """Remember a check that only reads one field, per distinct value of it."""
+    cache = {}
+    get = operator.attrgetter(field)
+    
+    def cached(record: LogRecord) -> bool:
+        key = get(record)
+        try:
+            return cache[key]
+        except KeyError:
+            if len(cache) >= maxsize:
+                cache.clear()
+            result = cache[key] = check(record)
+            return result
+    return cached
+
+
+def _node_fields(node: tuple) -> frozenset:
+    if node[0] == 'cmp':
+        return frozenset(['json' if isinstance(node[1], tuple) else node[1]])
+    if node[0] == 'not':
+        return _node_fields(node[1])
+    return frozenset().union(*(_node_fields(child) for child in node[1]))
+
+
+def _node_cost(node: tuple) -> int:
+    if node[0] == 'not':
+        return _node_cost(node[1])
+    if node[0] == 'cmp':
+        field = node[1]
+        return _FILTER_COST['json' if isinstance(field, tuple) else field] + (3 if node[2] in ('~', '!~') else 0)
+    return sum(_node_cost(child) for child in node[1])
+
+
+def compile_filter(node: tuple) -> Callable[[LogRecord], bool]:
+    """
+    Compile a filter tree into one predicate. Operands of and/or run
+    cheapest first and stop as soon as the result is known, and any part
+    that only reads the tag is cached per tag, so repeated tags cost one
+    dict lookup.
+    """
+    fields = _node_fields(node)
+    check = _compile_node(node)
+    if len(fields) == 1 and next(iter(fields)) in _CACHED_FIELDS:
+        return _cached(check, next(iter(fields)))
+    return check
+
+
+def _compile_node(node: tuple) -> Callable[[LogRecord], bool]:
+    kind = node[0]
+    if kind == 'cmp':
+        return _compile_leaf(node[1], node[2], node[3])
+    if kind == 'not':
+        inner = compile_filter(node[1])
+        return lambda r: not inner(r)
+    
+    children = sorted(node[1], key=_node_cost)
+    checks = [compile_filter(child) for child in children]
+    combined = checks[-1]
+    for check in reversed(checks[:-1]):
+        if kind == 'and':
+            combined = (lambda a, b: lambda r: a(r) and b(r))(check, combined)
+        else:
+            combined = (lambda a, b: lambda r: a(r) or b(r))(check, combined)
+    return combined
+
+
+def _match_all(parsed: LogRecord) -> bool:
+    return True
+
+
+class LogFilter:
+    """
+    The record filter for a session, compiled once from the options:
+    --level, --tag (substrings, or names with --exact-tags), --grep, --pid,
+    --since/--until and a --filter expression, all of which must match.
+    min_level, tags and exact_tags are also read by the byte prefilter and
+    the device filterspecs; matches() is the full check.
+    """
+    
+    def __init__(self, min_level: int = LogLevel.VERBOSE, tags: Optional[List[str]] = None,
+                 exact_tags: bool = False, message_regex: Optional[str] = None,
+                 pids: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None,
+                 expression: Optional[str] = None):
+        self.min_level = min_level
+        self.tags = tags or None
+        self.exact_tags = exact_tags
+        self.message_regex = message_regex
+        self.pids = pids or None
+        self.window = TimeWindow(since, until) if since or until else None
+        self.expression = expression
+        self._spec = (min_level, tags, exact_tags, message_regex, pids, since, until, expression)
+        
+        nodes = []
+        if min_level > LogLevel.VERBOSE:
+            nodes.append(('cmp', 'level', '>=', min_level))
+        if self.tags:
+            nodes.append(('cmp', 'tag', 'in' if exact_tags else 'contains', frozenset(self.tags)))
+        if message_regex:
+            nodes.append(('cmp', 'message', '~', re.compile(message_regex)))
+        if self.pids:
+            nodes.append(('cmp', 'pid', 'in', frozenset(self.pids)))
+        if since:
+            nodes.append(('cmp', 'time', '>=', since))
+        if until:
+            nodes.append(('cmp', 'time', '<=', until))
+        if expression:
+            nodes.append(FilterParser(expression).parse())
+        
+        if not nodes:
+            self.matches = _match_all
+        else:
+            self.matches = compile_filter(nodes[0] if len(nodes) == 1 else ('and', nodes))
+    
+    def __reduce__(self):
+        # Compiled checks can't be pickled; --jobs workers recompile from the options
+        return (LogFilter, self._spec)
+
+
+# ============================================================================
+# Banner & UI
+# ============================================================================
+
+def print_banner(package: Optional[str], level: str, tags: Optional[str], devices: Optional[List[str]] = None,
+                 source: Optional[str] = None):
+    """Print a startup banner."""
+    fish = "🎣"
+    
+    # Build info lines
+    info_lines = []
+    if source:
+        info_lines.append(f"  Input:   {Colors.BRIGHT_MAGENTA}{'stdin' if source == '-' else source}{Colors.RESET}")
+    if package or not source:
+        info_lines.append(f"  Package: {Colors.BRIGHT_CYAN}{package}{Colors.RESET}")
+    info_lines.append(f"  Level:   {Colors.BRIGHT_GREEN}{level}+{Colors.RESET}")
+    if tags:
+        info_lines.append(f"  Tags:    {Colors.BRIGHT_YELLOW}{tags}{Colors.RESET}")
+    if devices:
+        info_lines.append(f"  Devices: {Colors.BRIGHT_MAGENTA}{', '.join(devices)}{Colors.RESET}")
+    info_lines.append(f"  {Colors.BRIGHT_BLACK}Press Ctrl+C to exit{Colors.RESET}")
+    
+    # Calculate box width
+    max_len = max(len(re.sub(r'\033\[[0-9;]*m', '', line)) for line in info_lines)
     box_width = max(max_len + 4, 40)
     
     # Print box
@@ -618,10 +1669,10 @@ def print_banner(package: str, level: str, tags: Optional[str]):
     print()
 
 
-def print_reconnect_message(package: str):
+def print_reconnect_message(package: str, reason: str = 'App restarted'):
     """Print a message when reconnecting."""
     print()
-    print(f"  {Colors.BRIGHT_YELLOW}⟳ App restarted, reconnecting to {package}...{Colors.RESET}")
+    print(f"  {Colors.BRIGHT_YELLOW}⟳ {reason}, reconnecting to {package}...{Colors.RESET}")
     print()
 
 
@@ -630,191 +1681,3795 @@ def print_waiting_message(package: str):
     print(f"  {Colors.BRIGHT_BLACK}Waiting for {package} to start...{Colors.RESET}", end='\r')
 
 
-def print_exit_message():
-    """Print exit message."""
-    print()
-    print(f"  {Colors.BRIGHT_BLACK}Goodbye! 👋{Colors.RESET}")
-    print()
+def print_exit_message():
+    """Print exit message."""
+    print()
+    print(f"  {Colors.BRIGHT_BLACK}Goodbye! 👋{Colors.RESET}")
+    print()
+
+
+def print_pipeline_stats(pipeline: 'RenderPipeline'):
+    """Print reader/render/writer queue depths."""
+    print(f"  {Colors.BOLD}Pipeline ({pipeline.workers} render workers){Colors.RESET}")
+    for line in pipeline.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+def print_filter_stats(stats: 'TrafficStats'):
+    """Print what reached the host and how much host-side filters dropped."""
+    print(f"  {Colors.BOLD}Filtering{Colors.RESET}")
+    for line in stats.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+def print_crash_summary(table: Optional['CrashTable']):
+    """Print the exceptions seen, most frequent first."""
+    if table is None or not table.groups:
+        return
+    total = sum(group.count for group in list(table.groups.values()))
+    print(f"  {Colors.BOLD}Exceptions ({total:,} seen, {len(table.groups):,} distinct){Colors.RESET}")
+    for line in table.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+def print_http_report(stats: Optional['HttpStats']):
+    """Print latency percentiles and error rates per endpoint."""
+    if stats is None or not stats.endpoints:
+        return
+    overall = stats.overall
+    print(f"  {Colors.BOLD}HTTP ({overall.count:,} responses, {overall.error_rate():.1%} errors){Colors.RESET}")
+    for line in stats.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+def print_run_stats(stats: 'RunStats'):
+    """Print throughput, stage costs, backlog, drops and exceptions."""
+    print(f"  {Colors.BOLD}Viewer ({time.monotonic() - stats.started:,.1f} s){Colors.RESET}")
+    for line in stats.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+def print_profile(profiler: 'SessionProfiler'):
+    """Print the top cost centers and memory growth of a --profile run."""
+    print(f"  {Colors.BOLD}Profile ({profiler.mode}, {profiler.elapsed:,.1f} s){Colors.RESET}")
+    for line in profiler.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+def print_cache_stats(cache: Optional[RenderCache]):
+    """Print render cache hit/miss counters."""
+    if cache is None:
+        return
+    print(f"  {Colors.BOLD}Render cache{Colors.RESET}")
+    for line in cache.stats_lines():
+        print(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    print()
+
+
+# ============================================================================
+# Output Writer
+# ============================================================================
+
+class OutputWriter:
+    """
+    Coalescing writer for rendered lines.
+    
+    Lines are encoded once and collected in a buffer that is written to the
+    underlying binary stream when it reaches max_bytes or when the oldest
+    buffered line is flush_interval seconds old. Urgent lines (errors and
+    crashes) flush immediately. A flush_interval of 0 writes every line
+    straight through. On a terminal, set_status() keeps one line of text
+    below the output, cleared and redrawn around every flush; each part of
+    the program sets its own slot of it.
+    """
+    
+    def __init__(self, stream=None, flush_interval: float = 0.016, max_bytes: int = 64 * 1024):
+        self.stream = stream if stream is not None else sys.stdout
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.encoding = getattr(self.stream, 'encoding', None) or 'utf-8'
+        self._out = getattr(self.stream, 'buffer', None)
+        self._chunks = []
+        self._size = 0
+        self._first_write = 0.0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = None
+        self._tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self._status = None
+        self._slots: Dict[str, str] = {}
+        self._status_dirty = False
+        self._status_shown = False
+        # Totals for --stats
+        self.lines = 0
+        self.bytes = 0
+        self.write_seconds = 0.0
+        self.max_buffered = 0
+        if flush_interval > 0:
+            self._timer = threading.Thread(target=self._flush_loop, name='logview-flush', daemon=True)
+            self._timer.start()
+    
+    def write_line(self, text: str, urgent: bool = False):
+        """Queue one line (newline added) for output."""
+        data = (text + '\n').encode(self.encoding, 'replace')
+        with self._lock:
+            if not self._chunks:
+                self._first_write = time.monotonic()
+            self._chunks.append(data)
+            self._size += len(data)
+            if urgent or self.flush_interval <= 0 or self._size >= self.max_bytes:
+                self._flush_locked()
+    
+    def set_status(self, slot: str, text: Optional[str]):
+        """Show text in a slot of the status line (terminals only); None removes it."""
+        if not self._tty:
+            return
+        with self._lock:
+            if text is None:
+                self._slots.pop(slot, None)
+            else:
+                self._slots[slot] = text
+            status = f" {Colors.BRIGHT_BLACK}│{Colors.RESET} ".join(self._slots.values()) or None
+            if status == self._status:
+                return
+            self._status = status
+            self._status_dirty = True
+            if self.flush_interval <= 0:
+                self._flush_locked()
+    
+    def flush(self):
+        """Write out everything buffered so far."""
+        with self._lock:
+            self._flush_locked()
+    
+    def close(self):
+        """Flush, remove the status line and stop the deadline thread."""
+        self._closed.set()
+        for slot in list(self._slots):
+            self.set_status(slot, None)
+        self.flush()
+    
+    def _flush_locked(self):
+        # Anything print()ed directly has to reach the terminal first
+        self.stream.flush()
+        if self._chunks or self._status_dirty:
+            started = time.perf_counter()
+            self.lines += len(self._chunks)
+            self.max_buffered = max(self.max_buffered, self._size)
+            data = b''.join(self._chunks)
+            self.bytes += len(data)
+            self._chunks = []
+            self._size = 0
+            if self._status_shown:
+                data = b'\r\033[K' + data
+            self._status_shown = self._status is not None
+            self._status_dirty = False
+            if self._status is not None:
+                width = shutil.get_terminal_size().columns - 1
+                data += ('\r' + fit_visible(self._status, width)).encode(self.encoding, 'replace')
+            if self._out is not None:
+                self._out.write(data)
+                self._out.flush()
+            else:
+                self.stream.write(data.decode(self.encoding, 'replace'))
+                self.stream.flush()
+            self.write_seconds += time.perf_counter() - started
+    
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if self._status_dirty or (self._chunks and
+                                          time.monotonic() - self._first_write >= self.flush_interval):
+                    self._flush_locked()
+
+
+# ============================================================================
+# ADB Server Protocol
+# ============================================================================
+
+class AdbError(OSError):
+    """The adb server refused a request (its FAIL reply)."""
+
+
+class AdbClient:
+    """
+    Speaks the adb host protocol to the adb server, so device queries and
+    logcat streams need no adb process of their own.
+    
+    The server listens on 127.0.0.1:5037 unless ANDROID_ADB_SERVER_ADDRESS
+    or ANDROID_ADB_SERVER_PORT say otherwise (adb's own variables, which
+    also point it at a fake server). Each request is "%04x" of its length
+    and the text; the server answers OKAY or FAIL and a length-prefixed
+    reason. It closes the connection after a host query (host:devices);
+    host:transport hands the connection to a device, whose service
+    (shell:...) then streams over it until either side closes it.
+    """
+    
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, timeout: float = 5.0):
+        self.host = host or os.environ.get('ANDROID_ADB_SERVER_ADDRESS') or '127.0.0.1'
+        self.port = port or int(os.environ.get('ANDROID_ADB_SERVER_PORT') or 5037)
+        self.timeout = timeout
+    
+    @staticmethod
+    def _encode(request: str) -> bytes:
+        data = request.encode('utf-8')
+        return b'%04x' % len(data) + data
+    
+    @staticmethod
+    def _transport(serial: Optional[str]) -> str:
+        # Without a serial, adb uses $ANDROID_SERIAL or else the only device
+        serial = serial or os.environ.get('ANDROID_SERIAL')
+        return f"host:transport:{serial}" if serial else 'host:transport-any'
+    
+    @staticmethod
+    def _read(sock: socket.socket, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("adb server closed the connection")
+            data += chunk
+        return data
+    
+    def _length(self, sock: socket.socket) -> int:
+        try:
+            return int(self._read(sock, 4), 16)
+        except ValueError:
+            raise AdbError("malformed reply from the adb server") from None
+    
+    def _request(self, sock: socket.socket, request: str):
+        sock.sendall(self._encode(request))
+        status = self._read(sock, 4)
+        if status == b'FAIL':
+            raise AdbError(self._read(sock, self._length(sock)).decode('utf-8', 'replace'))
+        if status != b'OKAY':
+            raise AdbError(f"unexpected reply from the adb server: {status!r}")
+    
+    def query(self, request: str, timeout: Optional[float] = None) -> str:
+        """The answer to a host query such as host:devices or host:version."""
+        with socket.create_connection((self.host, self.port), timeout or self.timeout) as sock:
+            self._request(sock, request)
+            return self._read(sock, self._length(sock)).decode('utf-8', 'replace')
+    
+    def version(self) -> Optional[int]:
+        """The server's protocol version, or None if no server answers."""
+        try:
+            return int(self.query('host:version'), 16)
+        except (OSError, ValueError):
+            return None
+    
+    def devices(self) -> List[tuple]:
+        """(serial, state) of every device the server knows of."""
+        return [tuple(line.split('\t', 1)) for line in self.query('host:devices').splitlines() if '\t' in line]
+    
+    def open(self, serial: Optional[str], service: str, timeout: Optional[float] = None) -> socket.socket:
+        """
+        A connection streaming a device service, e.g. "shell:logcat -v time".
+        Reads on it time out after timeout seconds; None blocks.
+        """
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        try:
+            self._request(sock, self._transport(serial))
+            self._request(sock, service)
+        except BaseException:
+            sock.close()
+            raise
+        sock.settimeout(timeout)
+        return sock
+    
+    def run(self, serial: Optional[str], service: str, timeout: Optional[float] = None) -> bytes:
+        """Everything a device service writes until it ends."""
+        with self.open(serial, service, timeout or self.timeout) as sock:
+            chunks = []
+            while True:
+                chunk = sock.recv(READ_CHUNK_SIZE)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+    
+    async def open_async(self, serial: Optional[str], service: str) -> tuple:
+        """open() for asyncio: a (StreamReader, StreamWriter) pair."""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            for request in (self._transport(serial), service):
+                writer.write(self._encode(request))
+                status = await asyncio.wait_for(reader.readexactly(4), self.timeout)
+                if status != b'OKAY':
+                    length = int(await reader.readexactly(4), 16) if status == b'FAIL' else 0
+                    message = (await reader.readexactly(length)).decode('utf-8', 'replace')
+                    raise AdbError(message or f"unexpected reply from the adb server: {status!r}")
+        except asyncio.IncompleteReadError:
+            writer.close()
+            raise ConnectionError("adb server closed the connection") from None
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+
+class AdbService:
+    """
+    A device service streaming over an adb server connection, with the
+    part of the Popen interface stream_logs() uses.
+    """
+    
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self.stdout = sock.makefile('rb', buffering=0)
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = 0
+            self.stdout.close()
+            self._sock.close()
+    
+    kill = terminate
+    
+    def wait(self, timeout: Optional[float] = None) -> int:
+        return self.returncode
+
+
+class AsyncAdbService:
+    """AdbService for asyncio, with the part of the asyncio Process interface follow_device() uses."""
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stdout = reader
+        self._writer = writer
+        self.returncode = None
+    
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = 0
+            self._writer.close()
+    
+    async def wait(self) -> int:
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+        return self.returncode
+
+
+def adb_service(args: List[str]) -> Optional[tuple]:
+    """
+    The (serial, service) an adb command line runs on a device: "shell"
+    and "logcat" commands, after an optional "-s SERIAL". None for
+    anything else, which is left to the adb command.
+    """
+    serial = None
+    if args[:1] == ['-s'] and len(args) > 1:
+        serial, args = args[1], args[2:]
+    if args[:1] == ['shell'] and len(args) > 1:
+        # As adb does, shell hands its arguments to the device's sh as one line
+        return serial, 'shell:' + ' '.join(args[1:])
+    if args[:1] == ['logcat']:
+        return serial, 'shell:' + ' '.join(shlex.quote(arg) for arg in args)
+    return None
+
+
+def connect_adb_server() -> Optional[AdbClient]:
+    """
+    An AdbClient for the adb server, starting the server with the adb
+    command if none is running; None if there is still none to talk to.
+    """
+    client = AdbClient()
+    if client.version() is None:
+        if not ADB_PATH:
+            return None
+        try:
+            subprocess.run([ADB_PATH, 'start-server'], capture_output=True, timeout=10)
+        except (subprocess.SubprocessError, OSError):
+            return None
+        if client.version() is None:
+            return None
+    return client
+
+
+# Set by main() from --adb-transport; None runs the adb command for everything
+ADB_CLIENT: Optional[AdbClient] = None
+
+
+# ============================================================================
+# ADB Functions
+# ============================================================================
+
+def run_adb(args: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    Run an ADB command. With ADB_CLIENT, "shell" and "logcat" commands go
+    over the adb server socket instead; if that fails (the server went
+    away, the device refused), the adb command runs after all.
+    """
+    service = adb_service(args) if ADB_CLIENT is not None else None
+    if service is not None:
+        timeout = kwargs.get('timeout')
+        try:
+            output = ADB_CLIENT.run(*service, timeout)
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(args, timeout) from None
+        except OSError:
+            pass
+        else:
+            if not kwargs.get('capture_output') and kwargs.get('stdout') is None:
+                output = None
+            elif kwargs.get('text'):
+                output = output.decode('utf-8', 'replace')
+            return subprocess.CompletedProcess(args, 0, output, '' if kwargs.get('text') else b'')
+    if not ADB_PATH:
+        raise FileNotFoundError("adb not found")
+    return subprocess.run([ADB_PATH] + args, **kwargs)
+
+
+def run_adb_popen(args: List[str], **kwargs) -> Any:
+    """Run an ADB command with Popen; with ADB_CLIENT, an AdbService streams it over the server socket if it can."""
+    service = adb_service(args) if ADB_CLIENT is not None else None
+    if service is not None:
+        try:
+            return AdbService(ADB_CLIENT.open(*service))
+        except OSError:
+            pass
+    if not ADB_PATH:
+        raise FileNotFoundError("adb not found")
+    return subprocess.Popen([ADB_PATH] + args, **kwargs)
+
+
+def get_pid(package: str) -> Optional[str]:
+    """Get the PID for a package, or None if not running."""
+    try:
+        result = run_adb(
+            ['shell', 'pidof', '-s', package],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        pid = result.stdout.strip()
+        return pid if pid else None
+    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
+        return None
+
+
+def clear_logcat(serial: Optional[str] = None):
+    """Clear the logcat buffer (of one device if a serial is given)."""
+    try:
+        run_adb((['-s', serial] if serial else []) + ['logcat', '-c'], timeout=5)
+    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
+        pass
+
+
+def list_devices() -> List[str]:
+    """Return the serials of connected devices that are ready ("device" state)."""
+    if ADB_CLIENT is not None:
+        try:
+            return [serial for serial, state in ADB_CLIENT.devices() if state == 'device']
+        except OSError:
+            pass
+    if not ADB_PATH:
+        return []
+    try:
+        result = run_adb(
+            ['devices'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+    except (subprocess.TimeoutExpired, subprocess.SubprocessError, FileNotFoundError):
+        return []
+    serials = []
+    for line in result.stdout.strip().split('\n')[1:]:
+        fields = line.split()
+        if len(fields) >= 2 and fields[1] == 'device':
+            serials.append(fields[0])
+    return serials
+
+
+def check_adb() -> bool:
+    """Check if ADB is available and a device is connected."""
+    return len(list_devices()) > 0
+
+
+# ============================================================================
+# Process Tracking
+# ============================================================================
+
+class Notice(str):
+    """A viewer message (not a log line) printed in stream order."""
+
+
+def _is_package_process(name: str, package: str) -> bool:
+    """True for the package's main process and its ":suffix" processes."""
+    return name == package or name.startswith(package + ':')
+
+
+def parse_ps_output(output: str, package: str) -> Dict[str, str]:
+    """Map pid -> process name for the package's processes in "ps -A -o PID,NAME" output."""
+    processes = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[0].isdigit() and _is_package_process(fields[-1], package):
+            processes[fields[0]] = fields[-1]
+    return processes
+
+
+def snapshot_processes(package: str) -> Dict[str, str]:
+    """Current pid -> process name for all of the package's processes."""
+    try:
+        result = run_adb(
+            ['shell', 'ps', '-A', '-o', 'PID,NAME'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        processes = parse_ps_output(result.stdout, package)
+    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
+        processes = {}
+    if not processes:
+        # Older devices without "ps -A -o": fall back to the main process
+        pid = get_pid(package)
+        if pid:
+            processes[pid] = package
+    return processes
+
+
+# logcat --uid was added in Android 10; ActivityManager logs as system_server's uid
+LOGCAT_UID_SDK = 29
+SYSTEM_UID = 1000
+
+
+def parse_package_uid(output: str, package: str) -> Optional[int]:
+    """The package's uid in "pm list packages -U" output ("package:com.hooked.hooked uid:10245")."""
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] == 'package:' + package and fields[1].startswith('uid:'):
+            # With several users it is "uid:10245,1010245"; the first is the current user's
+            uid = fields[1][4:].split(',')[0]
+            return int(uid) if uid.isdigit() else None
+    return None
+
+
+def get_package_uid(package: str, serial: Optional[str] = None) -> Optional[int]:
+    """The package's uid, or None if it isn't installed or logcat can't filter by uid."""
+    if get_sdk_level(serial) < LOGCAT_UID_SDK:
+        return None
+    try:
+        result = run_adb(
+            (['-s', serial] if serial else []) + ['shell', 'pm', 'list', 'packages', '-U', package],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
+        return None
+    return parse_package_uid(result.stdout, package)
+
+
+def uid_logcat_args(uid: Optional[int]) -> List[str]:
+    """
+    logcat arguments limiting the stream to the app's uid (all of its
+    processes, across restarts) and system_server's, whose ActivityManager
+    events the ProcessTracker follows; none without a uid.
+    """
+    return [f'--uid={uid},{SYSTEM_UID}'] if uid is not None else []
+
+
+class ProcessTracker:
+    """
+    Follows all processes of a package (the main one and ":remote"-style
+    secondary processes) from ActivityManager start/death events in the log
+    stream itself, so one long-lived logcat follows restarts without
+    polling pidof or restarting adb. On Android 10+ that logcat is limited
+    to the app's and system_server's uids (see uid_logcat_args).
+    """
+    
+    WATCH_TAG = 'ActivityManager'
+    
+    # "Start proc 6192:com.hooked.hooked/u0a245 for top-activity {...}"
+    _START_RE = re.compile(r'Start proc (\d+):([^/\s]+)')
+    # "Process com.hooked.hooked (pid 6192) has died: fore TOP"
+    _DIED_RE = re.compile(r'Process (\S+) \(pid (\d+)\) has died')
+    # "Killing 6192:com.hooked.hooked/u0a245 (adj 900): remove task"
+    _KILLED_RE = re.compile(r'Killing (\d+):([^/\s]+)')
+    
+    def __init__(self, package: str, processes: Optional[Dict[str, str]] = None):
+        self.package = package
+        # pid (an int, as on LogRecords) -> process name
+        self.processes = {}
+        self.pid_bytes = set()
+        # Whether any process of the package was ever known
+        self.found = False
+        for pid, name in (processes or {}).items():
+            self._add(int(pid), name)
+    
+    def _add(self, pid: int, name: str):
+        self.found = True
+        self.processes[pid] = name
+        self.pid_bytes.add(str(pid).encode('ascii'))
+    
+    def _remove(self, pid: int) -> Optional[str]:
+        self.pid_bytes.discard(str(pid).encode('ascii'))
+        return self.processes.pop(pid, None)
+    
+    def observe(self, parsed: LogRecord) -> Optional[Notice]:
+        """Update the tracked processes from an ActivityManager record."""
+        if parsed.tag != self.WATCH_TAG:
+            return None
+        message = parsed.message
+        
+        if message.startswith('Start proc'):
+            match = self._START_RE.match(message)
+            if match and _is_package_process(match.group(2), self.package):
+                pid, name = int(match.group(1)), match.group(2)
+                self._add(pid, name)
+                return Notice(f"  {Colors.BRIGHT_GREEN}▶ {name} started (pid {pid}){Colors.RESET}")
+            return None
+        
+        if 'has died' in message:
+            match = self._DIED_RE.search(message)
+            pid = int(match.group(2)) if match else None
+        elif message.startswith('Killing'):
+            match = self._KILLED_RE.match(message)
+            pid = int(match.group(1)) if match else None
+        else:
+            return None
+        
+        if pid is None or pid not in self.processes:
+            return None
+        name = self._remove(pid)
+        if name == self.package:
+            return Notice(f"  {Colors.BRIGHT_YELLOW}⟳ {name} (pid {pid}) died, waiting for restart...{Colors.RESET}")
+        return Notice(f"  {Colors.BRIGHT_YELLOW}⟳ {name} (pid {pid}) died{Colors.RESET}")
+
+
+# ============================================================================
+# Device-Side Filtering
+# ============================================================================
+
+# logcat -e (--regex) was added in Android 7.0
+LOGCAT_REGEX_SDK = 24
+
+_LEVEL_LETTERS = 'VDIWEF'
+
+
+def get_sdk_level(serial: Optional[str] = None) -> int:
+    """Android API level of the device, or 0 if it can't be read."""
+    try:
+        result = run_adb(
+            (['-s', serial] if serial else []) + ['shell', 'getprop', 'ro.build.version.sdk'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        return int(result.stdout.strip())
+    except (subprocess.TimeoutExpired, subprocess.SubprocessError, ValueError):
+        return 0
+
+
+def logcat_filter_args(log_filter: LogFilter, message_regex: Optional[str] = None,
+                       watch_tag: Optional[str] = None) -> List[str]:
+    """
+    logcat arguments that filter on the device, so lines that can't pass
+    are never formatted, sent or parsed. The level becomes a "*:LEVEL"
+    filterspec. Tags only become "TAG:LEVEL ... *:S" with exact tags, as
+    filterspecs can't match substrings; a --filter expression stays on
+    the host. watch_tag (the ProcessTracker's) is always let through at
+    INFO. message_regex becomes -e; callers only pass it when the device
+    supports it and nothing else needs the lines.
+    """
+    min_level = log_filter.min_level
+    tags = log_filter.tags
+    letter = _LEVEL_LETTERS[min(min_level, LogLevel.FATAL)]
+    specs = {}
+    if log_filter.exact_tags and tags and all(t and ':' not in t and not any(c.isspace() for c in t) for t in tags):
+        specs = {tag: letter for tag in tags}
+        default = 'S'
+    elif min_level > LogLevel.VERBOSE:
+        default = letter
+    else:
+        default = None
+    if default is not None and watch_tag is not None:
+        # Keep the lower of the two levels if the watch tag is also a filter tag
+        specs[watch_tag] = min(specs.get(watch_tag, 'I'), 'I', key=_LEVEL_LETTERS.index)
+    
+    args = ['-e', message_regex] if message_regex else []
+    args += [f'{tag}:{level}' for tag, level in specs.items()]
+    if default is not None:
+        args.append(f'*:{default}')
+    return args
+
+
+class TrafficStats:
+    """Counts what reached the host, and how much of it host-side filters dropped."""
+    
+    def __init__(self, device_args: Optional[List[str]] = None):
+        self.device_args = device_args or []
+        self.bytes = 0
+        self.lines = 0
+        self.kept = 0
+    
+    def count(self, batch: List[bytes], items: List[Any]):
+        self.bytes += sum(map(len, batch)) + len(batch)
+        self.lines += len(batch)
+        self.kept += len(items)
+    
+    def stats_lines(self) -> List[str]:
+        dropped = self.lines - self.kept
+        share = dropped / self.lines if self.lines else 0.0
+        return [
+            f"device filter: {' '.join(self.device_args) or 'none'}",
+            f"received {self.bytes / (1024 * 1024):,.1f} MB in {self.lines:,} lines",
+            f"dropped on the host: {dropped:,} lines ({share:.1%})",
+        ]
+
+
+# ============================================================================
+# Stream Resume
+# ============================================================================
+
+class StreamCursor:
+    """
+    Remembers where a logcat stream stopped so the next one resumes there.
+    
+    A reconnect asks logcat for lines since the last timestamp seen (-T),
+    which also repeats the lines at that timestamp. Records are hashed into
+    a small window of recent lines; while resuming, records at or before
+    the last timestamp whose hash is in the window are dropped, and the
+    first newer record ends the resume.
+    """
+    
+    def __init__(self, window: int = 256):
+        self.timestamp = None
+        self.resuming = False
+        self.duplicates = 0
+        self._key = None
+        self._recent = deque(maxlen=window)
+    
+    def resume_args(self, log_format: str) -> List[str]:
+        """logcat arguments to start after the last record seen, if there is one."""
+        # -T takes wall-clock times; uptime seconds from "monotonic" can't be resumed from
+        if self.timestamp is None or log_format == 'monotonic':
+            return []
+        self.resuming = True
+        return ['-T', self.timestamp]
+    
+    def seen(self, parsed: LogRecord) -> bool:
+        """Note a record; True if it was already read before the reconnect."""
+        timestamp = parsed.timestamp
+        line_hash = hash((timestamp, parsed.pid, parsed.tid, parsed.tag, parsed.message))
+        key = timestamp_key(timestamp)
+        if self.resuming:
+            if key > self._key:
+                self.resuming = False
+            elif line_hash in self._recent:
+                self.duplicates += 1
+                return True
+        self.timestamp = timestamp
+        self._key = key
+        self._recent.append(line_hash)
+        return False
+
+
+# ============================================================================
+# Message Reassembly
+# ============================================================================
+
+# Set by main() from --reassemble; 0 turns reassembly off
+REASSEMBLE_CHARS = 3000
+
+
+class MessageAssembler:
+    """
+    Joins messages a logger split into ~4 KB records back into one record.
+    
+    Android caps a log message at about 4 KB, so loggers print long ones
+    (like response bodies) as back-to-back records. A record whose message
+    is at least min_chars long opens a group; following records from the
+    same pid, thread, tag and level within window seconds of it are
+    appended, and the first shorter one closes it. Records from other
+    threads pass straight through, so a joined record can come out after
+    records logged while it was being written.
+    
+    Memory is capped by max_chars per group and max_open groups (the
+    oldest is released when exceeded); expire() releases groups that got
+    nothing new for timeout seconds, so a live stream isn't held up
+    waiting for a fragment that never comes.
+    """
+    
+    def __init__(self, min_chars: int = 3000, window: float = 0.05, timeout: float = 0.25,
+                 max_chars: int = 1024 * 1024, max_open: int = 16):
+        self.min_chars = min_chars
+        self.window = window
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.max_open = max_open
+        self.joined = 0
+        # key -> [records, total chars, deadline]
+        self._open = {}
+    
+    def feed(self, parsed: LogRecord) -> List[LogRecord]:
+        """Add a record; returns the records that are complete, in order."""
+        key = (parsed.pid, parsed.tid, parsed.tag, parsed.level)
+        size = len(parsed.message)
+        ready = []
+        group = self._open.get(key)
+        if group is not None:
+            start = timestamp_seconds(group[0][-1].timestamp)
+            end = timestamp_seconds(parsed.timestamp)
+            if start is None or end is None or 0 <= end - start <= self.window:
+                group[0].append(parsed)
+                group[1] += size
+                if size < self.min_chars or group[1] >= self.max_chars:
+                    del self._open[key]
+                    return [self._join(group[0])]
+                group[2] = time.monotonic() + self.timeout
+                return ready
+            del self._open[key]
+            ready.append(self._join(group[0]))
+        
+        if size < self.min_chars:
+            ready.append(parsed)
+            return ready
+        self._open[key] = [[parsed], size, time.monotonic() + self.timeout]
+        if len(self._open) > self.max_open:
+            ready.append(self._join(self._open.pop(next(iter(self._open)))[0]))
+        return ready
+    
+    def expire(self) -> List[LogRecord]:
+        """Release groups that have waited longer than the timeout."""
+        if not self._open:
+            return []
+        now = time.monotonic()
+        due = [key for key, group in self._open.items() if group[2] <= now]
+        return [self._join(self._open.pop(key)[0]) for key in due]
+    
+    def flush(self) -> List[LogRecord]:
+        """Release every open group (at the end of a stream)."""
+        ready = [self._join(group[0]) for group in self._open.values()]
+        self._open.clear()
+        return ready
+    
+    def _join(self, records: List[LogRecord]) -> LogRecord:
+        if len(records) == 1:
+            return records[0]
+        self.joined += len(records) - 1
+        joined = records[0].copy()
+        joined.message = ''.join(r.message for r in records)
+        if joined.raw is not None:
+            joined.raw = '\n'.join(r.raw for r in records)
+        return joined
+
+
+def new_assembler() -> Optional[MessageAssembler]:
+    """A MessageAssembler for one stream, or None if reassembly is off."""
+    return MessageAssembler(REASSEMBLE_CHARS) if REASSEMBLE_CHARS else None
+
+
+# ============================================================================
+# Storm Control
+# ============================================================================
+
+# Set by main() from --no-collapse / --rate-limit / --rate-burst; empty turns the guard off
+STORM_SETTINGS: Dict[str, Any] = {}
+
+_NEVER_SUPPRESSED = ('E', 'F', 'A')
+
+
+class StormGuard:
+    """
+    Keeps a spinning tag from flooding the view, before anything is rendered.
+    
+    Consecutive records with the same tag, level and message collapse into
+    one followed by a "(repeated ×N)" marker. With a rate, each tag and
+    level gets a token bucket of that many records per second (burst deep),
+    refilled by record time so captures behave like the live stream did;
+    records over it are dropped with their continuation lines and counted
+    in a summary every interval seconds. ERROR and FATAL records are never
+    collapsed or dropped.
+    """
+    
+    def __init__(self, collapse: bool = True, rate: float = 0.0, burst: Optional[float] = None,
+                 interval: float = 10.0):
+        self.collapse = collapse
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self.interval = interval
+        self.collapsed = 0
+        self.suppressed_total = 0
+        self._last = None
+        self._repeats = 0
+        self._dropping = False
+        # (tag, level) -> [tokens, record time of last refill]
+        self._buckets = {}
+        self._suppressed = {}
+        self._summary_at = None
+    
+    def process(self, items: List[Any]) -> List[Any]:
+        """Filter one item list; an empty one (an idle stream) releases pending markers."""
+        if not items:
+            return self._release()
+        out = []
+        for item in items:
+            cls = item.__class__
+            if cls is str:
+                # Continuation lines go wherever their record went
+                if not self._dropping:
+                    out.append(item)
+                continue
+            if cls is not LogRecord:
+                self._end_run(out)
+                self._last = None
+                out.append(item)
+                continue
+            level = item.level
+            if level in _NEVER_SUPPRESSED:
+                self._end_run(out)
+                self._last = None
+                self._dropping = False
+                out.append(item)
+                continue
+            key = (item.tag, level, item.message)
+            if key == self._last:
+                self._repeats += 1
+                self.collapsed += 1
+                self._dropping = True
+                continue
+            # A record that isn't shown doesn't end the run of the one before it
+            if self.rate and not self._admit(item, level, out):
+                self._dropping = True
+                continue
+            self._end_run(out)
+            if self.collapse:
+                self._last = key
+            self._dropping = False
+            out.append(item)
+        return out
+    
+    def finish(self) -> List[Any]:
+        """Markers still pending at the end of a stream."""
+        self._last = None
+        return self._release()
+    
+    def apply(self, batches):
+        """Run process() over item batches (from read_records), then finish()."""
+        for items in batches:
+            yield self.process(items)
+        yield self.finish()
+    
+    def _release(self) -> List[Any]:
+        """The current run's repeat count and a summary of what was suppressed so far."""
+        out = []
+        self._end_run(out)
+        if self._suppressed:
+            out.append(self._summary())
+        return out
+    
+    def _end_run(self, out: List[Any]):
+        if self._repeats:
+            out.append(Notice(f"{' ' * 8}{Colors.BRIGHT_BLACK}(repeated ×{self._repeats:,}){Colors.RESET}"))
+            self._repeats = 0
+    
+    def _admit(self, item: LogRecord, level: str, out: List[Any]) -> bool:
+        """Take a token from the record's bucket; False if it is empty."""
+        now = timestamp_seconds(item.timestamp)
+        if now is None:
+            now = time.monotonic()
+        key = (item.tag, level)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+        elif now > bucket[1]:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        
+        if self._summary_at is None or now < self._summary_at - self.interval:
+            self._summary_at = now + self.interval
+        elif now >= self._summary_at:
+            self._summary_at = now + self.interval
+            if self._suppressed:
+                self._end_run(out)
+                out.append(self._summary())
+        
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return True
+        self._suppressed[key] = self._suppressed.get(key, 0) + 1
+        self.suppressed_total += 1
+        return False
+    
+    def _summary(self) -> Notice:
+        counts = sorted(self._suppressed.items(), key=lambda kv: -kv[1])
+        self._suppressed = {}
+        total = sum(n for _, n in counts)
+        top = ', '.join(f"{tag}/{level} {n:,}" for (tag, level), n in counts[:3])
+        more = f", {len(counts) - 3} more tags" if len(counts) > 3 else ''
+        return Notice(f"{' ' * 8}{Colors.BRIGHT_BLACK}⋯ rate limited: {total:,} lines suppressed "
+                      f"({top}{more}){Colors.RESET}")
+
+
+def new_storm_guard() -> Optional[StormGuard]:
+    """A StormGuard for one stream, or None if it is turned off."""
+    if not STORM_SETTINGS.get('collapse') and not STORM_SETTINGS.get('rate'):
+        return None
+    return StormGuard(**STORM_SETTINGS)
+
+
+# ============================================================================
+# Crash Aggregation
+# ============================================================================
+
+# Set by main(); None turns exception grouping off
+CRASH_TABLE: Optional['CrashTable'] = None
+
+# "java.lang.IllegalStateException: boom", or the bare class name
+_EXCEPTION_HEADER_RE = re.compile(r'(?:[a-zA-Z_$][\w$]*\.)+[A-Za-z_$][\w$]*(?:Exception|Error|Throwable)(?::|\s*$)')
+_TRACE_LINE_RE = re.compile(r'\s*(?:at |Caused by: |Suppressed: |\.\.\. \d+ (?:more|common frames omitted))')
+# Line numbers and lambda / anonymous class indexes, which change from build to build
+_FRAME_NOISE_RE = re.compile(r'\(.*\)\s*$|\d+')
+
+
+class CrashGroup:
+    """Every occurrence of one exception fingerprint."""
+    __slots__ = ('fingerprint', 'title', 'root_cause', 'tag', 'count', 'first_seen', 'last_seen')
+    
+    def __init__(self, fingerprint: str, title: str, root_cause: str, tag: str, timestamp: str):
+        self.fingerprint = fingerprint
+        self.title = title
+        self.root_cause = root_cause
+        self.tag = tag
+        self.count = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+
+class CrashTable:
+    """
+    Exceptions seen this session, by fingerprint.
+    
+    The fingerprint hashes the exception class, the classes of its
+    "Caused by:" chain and its top frames with line numbers and lambda or
+    anonymous class indexes removed, so the same crash matches across
+    builds and messages.
+    """
+    
+    TOP_FRAMES = 5
+    
+    def __init__(self, full_traces: bool = False):
+        self.full_traces = full_traces
+        self.groups: Dict[str, CrashGroup] = {}
+        self.summary_requested = False
+    
+    def record(self, lines: List[str], tag: str, timestamp: str) -> CrashGroup:
+        """Count one trace (its header line first); returns its group."""
+        header = lines[0].strip()
+        classes = [header.split(':', 1)[0].strip()]
+        frames = []
+        for line in lines[1:]:
+            line = line.strip()
+            if line.startswith('at '):
+                if len(classes) == 1 and len(frames) < self.TOP_FRAMES:
+                    frames.append(_FRAME_NOISE_RE.sub('', line[3:]))
+            elif line.startswith('Caused by: '):
+                classes.append(line[11:].split(':', 1)[0].strip())
+        key = '\n'.join(classes + frames)
+        fingerprint = f"{zlib.crc32(key.encode('utf-8')):08x}"
+        group = self.groups.get(fingerprint)
+        if group is None:
+            group = self.groups[fingerprint] = CrashGroup(fingerprint, header, classes[-1], tag, timestamp)
+        group.count += 1
+        group.last_seen = timestamp
+        return group
+    
+    def stats_lines(self, limit: int = 10) -> List[str]:
+        """The most frequent exceptions, two lines each."""
+        ranked = sorted(self.groups.values(), key=lambda g: -g.count)
+        lines = []
+        for group in ranked[:limit]:
+            title = group.title if len(group.title) <= 100 else group.title[:99] + '…'
+            lines.append(f"{group.count:>5,}×  #{group.fingerprint}  {title}")
+            cause = f"caused by {group.root_cause} · " if group.root_cause != title.split(':', 1)[0] else ''
+            lines.append(f"{'':>8}{cause}{group.tag} · first {group.first_seen} · last {group.last_seen}")
+        if len(ranked) > limit:
+            lines.append(f"... and {len(ranked) - limit} more")
+        return lines
+
+
+class TraceGrouper:
+    """
+    Assembles stack traces from the item stream and counts them in a CrashTable.
+    
+    A trace starts at an exception line (a record's message or an unparsed
+    line) and takes the "at", "Caused by:" and "... N more" lines after
+    it, unparsed or from records of the same pid, thread and tag (logcat
+    prints a multi-line message as one record per line). The first trace
+    with a fingerprint passes through whole; repeats become one reference
+    line. A trace is held until it ends, at most max_lines lines, or the
+    stream goes idle.
+    """
+    
+    def __init__(self, table: CrashTable, max_lines: int = 256):
+        self.table = table
+        self.max_lines = max_lines
+        self._trace = []
+        self._lines = []
+        self._key = None
+        # The record the trace starts in or, for unparsed lines, follows
+        self._record = None
+        self._last_record = None
+        # With a list, each repeat's (trace items, reference) is also added to it, for view_file_parallel
+        self.repeats: Optional[List[tuple]] = None
+    
+    @property
+    def held(self) -> List[Any]:
+        """The items of the trace being assembled, not passed on yet."""
+        return self._trace
+    
+    def process(self, items: List[Any]) -> List[Any]:
+        """Group one item list; an empty one (an idle stream) releases a held trace."""
+        out = []
+        for item in items:
+            cls = item.__class__
+            if cls is LogRecord:
+                text = item.message
+                self._last_record = item
+            elif cls is str:
+                text = item
+            else:
+                self._end(out)
+                out.append(item)
+                continue
+            
+            if self._trace:
+                if _TRACE_LINE_RE.match(text) and (cls is str or self._key is None or self._key == _trace_key(item)):
+                    self._trace.append(item)
+                    self._lines.append(text)
+                    if self._key is None and cls is LogRecord:
+                        self._key = _trace_key(item)
+                    if len(self._trace) >= self.max_lines:
+                        self._end(out)
+                    continue
+                self._end(out)
+            
+            if _EXCEPTION_HEADER_RE.match(text.lstrip()):
+                self._trace = [item]
+                self._lines = [text]
+                self._key = _trace_key(item) if cls is LogRecord else None
+                self._record = self._last_record
+            else:
+                out.append(item)
+        if not items:
+            self._end(out)
+        if self.table.summary_requested:
+            self.table.summary_requested = False
+            out.extend(Notice(f"  {Colors.BRIGHT_BLACK}{line}{Colors.RESET}") for line in self.table.stats_lines())
+        return out
+    
+    def apply(self, batches):
+        """Run process() over item batches (from read_records), then release a held trace."""
+        for items in batches:
+            yield self.process(items)
+        out = []
+        self._end(out)
+        yield out
+    
+    def _end(self, out: List[Any]):
+        """Count the held trace and pass it, or a reference to it, on."""
+        if not self._trace:
+            return
+        trace, self._trace = self._trace, []
+        first = trace[0]
+        record = self._record
+        group = self.table.record(self._lines, record.tag if record else '', record.timestamp if record else '')
+        if group.count == 1 or self.table.full_traces:
+            out.extend(trace)
+            return
+        reference = f"↺ {self._lines[0].strip()} (#{group.fingerprint}, seen ×{group.count:,})"
+        if first.__class__ is LogRecord:
+            first = first.copy()
+            first.message = reference
+            out.append(first)
+        else:
+            out.append(f"    {reference}")
+        if self.repeats is not None:
+            self.repeats.append((trace, out[-1]))
+
+
+def _trace_key(parsed: LogRecord) -> tuple:
+    return (parsed.pid, parsed.tid, parsed.tag)
+
+
+def new_trace_grouper() -> Optional[TraceGrouper]:
+    """A TraceGrouper for one stream, or None if grouping is off."""
+    return TraceGrouper(CRASH_TABLE) if CRASH_TABLE is not None else None
+
+
+# ============================================================================
+# HTTP Correlation
+# ============================================================================
+
+# Set by main(); None turns request/response correlation off
+HTTP_STATS: Optional['HttpStats'] = None
+
+# "→ GET /user_catches"
+_HTTP_REQUEST_RE = re.compile(r'→\s*(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS)\s+(\S+)')
+# "← 200 OK /user_catches (142ms)"; no status code means the request failed
+_HTTP_RESPONSE_RE = re.compile(r'←\s*(?:(\d{3})\b)?')
+_HTTP_PATH_RE = re.compile(r'(?:^|\s)(?:https?://[^/\s]+)?(/[^\s?#]*)')
+_HTTP_DURATION_RE = re.compile(r'\((\d+(?:\.\d+)?)\s*ms\)')
+# Numeric ids, UUIDs and long hex strings, so each route is one endpoint
+_HTTP_ID_RE = re.compile(r'/(?:\d+|[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}|[0-9a-fA-F]{16,})(?=/|$)')
+
+
+def normalize_endpoint_path(path: str) -> str:
+    """Path of a URL or path, without query and with ids folded to ":id"."""
+    match = _HTTP_PATH_RE.match(path)
+    if match:
+        path = match.group(1)
+    return _HTTP_ID_RE.sub('/:id', path.rstrip(',.;:)')) or '/'
+
+
+def parse_http_response(message: str) -> tuple:
+    """(status or None, normalized path or None, logged duration in ms or None) of a "←" line."""
+    match = _HTTP_RESPONSE_RE.match(message)
+    rest = message[match.end():]
+    path = _HTTP_PATH_RE.search(rest)
+    duration = _HTTP_DURATION_RE.search(rest)
+    return (
+        int(match.group(1)) if match.group(1) else None,
+        normalize_endpoint_path(path.group(1)) if path else None,
+        float(duration.group(1)) if duration else None,
+    )
+
+
+def format_ms(ms: float) -> str:
+    """"142ms" or "1.2s"."""
+    return f"{ms:.0f}ms" if ms < 1000 else f"{ms / 1000:.1f}s"
+
+
+class LatencyHistogram:
+    """
+    Latencies in buckets 5% wide.
+    
+    Percentiles come out within 5% of the exact value, and a histogram
+    never holds more than a few hundred counters however many samples
+    it takes.
+    """
+    __slots__ = ('buckets', 'count')
+    
+    GROWTH = 1.05
+    _LOG_GROWTH = math.log(GROWTH)
+    
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+    
+    def add(self, ms: float):
+        index = int(math.log(ms) / self._LOG_GROWTH) + 1 if ms >= 1 else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+    
+    def percentile(self, fraction: float) -> float:
+        """Latency below which fraction of the samples fall (0 when empty)."""
+        rank = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.GROWTH ** (index - 0.5) if index else 0.5
+        return 0.0
+
+
+class EndpointStats:
+    """Responses and latencies of one endpoint."""
+    __slots__ = ('latency', 'count', 'errors')
+    
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.count = 0
+        self.errors = 0
+    
+    def record(self, latency: Optional[float], status: Optional[int]):
+        self.count += 1
+        if status is None or status >= 400:
+            self.errors += 1
+        if latency is not None:
+            self.latency.add(latency)
+    
+    def error_rate(self) -> float:
+        return self.errors / self.count if self.count else 0.0
+
+
+class HttpStats:
+    """
+    Latency percentiles and error rates per endpoint ("GET /user_catches/:id").
+    
+    Endpoints past max_endpoints are counted as "other". When a writer is
+    set, a summary is kept on its status line, redrawn at most every
+    status_interval seconds.
+    """
+    
+    OTHER = 'other'
+    
+    def __init__(self, writer: Optional[OutputWriter] = None, max_endpoints: int = 200,
+                 status_interval: float = 1.0):
+        self.writer = writer
+        self.max_endpoints = max_endpoints
+        self.status_interval = status_interval
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.overall = EndpointStats()
+        self.unmatched = 0
+        self.unanswered = 0
+        self._published = 0.0
+    
+    def record(self, endpoint: str, latency: Optional[float], status: Optional[int]):
+        """Count one response (status None for a failed request)."""
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            if len(self.endpoints) >= self.max_endpoints:
+                endpoint = self.OTHER
+                stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+        stats.record(latency, status)
+        self.overall.record(latency, status)
+    
+    def publish(self):
+        """Refresh the status line if it is due."""
+        if self.writer is None or not self.overall.count:
+            return
+        now = time.monotonic()
+        if now - self._published >= self.status_interval:
+            self._published = now
+            self.writer.set_status('http', self.status_line())
+    
+    def status_line(self) -> str:
+        overall = self.overall
+        latency = overall.latency
+        parts = [f"HTTP {overall.count:,} responses"]
+        if latency.count:
+            parts.append(f"p50 {format_ms(latency.percentile(0.5))} · p95 {format_ms(latency.percentile(0.95))}"
+                         f" · p99 {format_ms(latency.percentile(0.99))}")
+        errors = f"{overall.error_rate():.1%} errors"
+        parts.append(f"{Colors.BRIGHT_RED}{errors}{Colors.BRIGHT_BLACK}" if overall.errors else errors)
+        timed = [(stats.latency.percentile(0.95), endpoint)
+                 for endpoint, stats in self.endpoints.items() if stats.latency.count]
+        if len(timed) > 1:
+            p95, endpoint = max(timed)
+            parts.append(f"slowest {endpoint} p95 {format_ms(p95)}")
+        return f"{Colors.BRIGHT_BLACK}{' · '.join(parts)}{Colors.RESET}"
+    
+    def stats_lines(self, limit: int = 15) -> List[str]:
+        """A table of the busiest endpoints."""
+        ranked = sorted(self.endpoints.items(), key=lambda item: -item[1].count)
+        width = min(48, max(len(endpoint) for endpoint, _ in ranked[:limit]))
+        lines = [f"{'endpoint':<{width}}  {'count':>7}  {'p50':>6}  {'p95':>6}  {'p99':>6}  {'errors':>6}"]
+        for endpoint, stats in ranked[:limit]:
+            if len(endpoint) > width:
+                endpoint = endpoint[:width - 1] + '…'
+            latency = stats.latency
+            if latency.count:
+                percentiles = '  '.join(f"{format_ms(latency.percentile(p)):>6}" for p in (0.5, 0.95, 0.99))
+            else:
+                percentiles = '  '.join(f"{'-':>6}" for _ in range(3))
+            lines.append(f"{endpoint:<{width}}  {stats.count:>7,}  {percentiles}  {stats.error_rate():>6.1%}")
+        if len(ranked) > limit:
+            lines.append(f"... and {len(ranked) - limit} more")
+        if self.unmatched or self.unanswered:
+            lines.append(f"{self.unmatched:,} responses without a request, "
+                         f"{self.unanswered:,} requests without a response")
+        return lines
+
+
+class HttpCorrelator:
+    """
+    Pairs "→ METHOD /path" request records with their "← status" responses.
+    
+    Requests wait per tag and pid, at most max_pending each and for at
+    most expire seconds of log time. A response takes the oldest waiting
+    request for its path, or the oldest one when it names no path. Its
+    latency is the difference of the two logcat timestamps, or the
+    duration the response logged if its request was not seen. Items pass
+    through unchanged.
+    """
+    
+    def __init__(self, stats: HttpStats, max_pending: int = 64, expire: float = 60.0,
+                 max_streams: int = 256):
+        self.stats = stats
+        self.max_pending = max_pending
+        self.expire = expire
+        self.max_streams = max_streams
+        # (tag, pid) -> deque of (seconds, method, path), oldest first
+        self._pending: 'OrderedDict[tuple, deque]' = OrderedDict()
+    
+    def process(self, items: List[Any]) -> List[Any]:
+        """Observe one item list; returns it as is."""
+        for item in items:
+            if item.__class__ is not LogRecord:
+                continue
+            first = item.message[:1]
+            if first == '→':
+                self._request(item)
+            elif first == '←':
+                self._response(item)
+        self.stats.publish()
+        return items
+    
+    def apply(self, batches):
+        """Run process() over item batches (from read_records)."""
+        for items in batches:
+            yield self.process(items)
+    
+    def _request(self, parsed: LogRecord):
+        match = _HTTP_REQUEST_RE.match(parsed.message)
+        if not match:
+            return
+        key = (parsed.tag, parsed.pid)
+        pending = self._pending.get(key)
+        if pending is None:
+            if len(self._pending) >= self.max_streams:
+                _, dropped = self._pending.popitem(last=False)
+                self.stats.unanswered += len(dropped)
+            pending = self._pending[key] = deque()
+        else:
+            self._pending.move_to_end(key)
+        if len(pending) >= self.max_pending:
+            pending.popleft()
+            self.stats.unanswered += 1
+        pending.append((timestamp_seconds(parsed.timestamp), match.group(1),
+                        normalize_endpoint_path(match.group(2))))
+    
+    def _response(self, parsed: LogRecord):
+        status, path, logged = parse_http_response(parsed.message)
+        now = timestamp_seconds(parsed.timestamp)
+        request = None
+        pending = self._pending.get((parsed.tag, parsed.pid))
+        if pending:
+            while pending and now is not None and pending[0][0] is not None and now - pending[0][0] > self.expire:
+                pending.popleft()
+                self.stats.unanswered += 1
+            for index, waiting in enumerate(pending):
+                if path is None or waiting[2] == path:
+                    request = waiting
+                    del pending[index]
+                    break
+        if request is None:
+            self.stats.unmatched += 1
+            if path is None:
+                return
+            self.stats.record(f"* {path}", logged, status)
+            return
+        started, method, path = request
+        latency = logged
+        if started is not None and now is not None:
+            elapsed = now - started
+            if elapsed < -43200:
+                # Time-of-day timestamps wrap at midnight
+                elapsed += 86400
+            if elapsed >= 0:
+                latency = elapsed * 1000
+        self.stats.record(f"{method} {path}", latency, status)
+
+
+def new_http_correlator() -> Optional[HttpCorrelator]:
+    """An HttpCorrelator for one stream, or None if correlation is off."""
+    return HttpCorrelator(HTTP_STATS) if HTTP_STATS is not None else None
+
+
+def apply_output_stages(batches, observe_only: bool = False):
+    """
+    Pass item batches through the HTTP, trace grouping and storm control
+    stages that are on; with observe_only, just the ones that leave the
+    items as they are (for the interactive view, which keeps everything).
+    """
+    stages = (new_http_correlator(),) if observe_only else (new_http_correlator(), new_trace_grouper(),
+                                                             new_storm_guard())
+    for stage in stages:
+        if stage is not None:
+            batches = stage.apply(batches)
+    return batches
+
+
+# ============================================================================
+# Instrumentation
+# ============================================================================
+
+# Set by main() for --stats and --stats-json; None leaves every probe at one global lookup
+RUN_STATS: Optional['RunStats'] = None
+
+# logd's chatty summaries: "uid=10123(u0_a123) com.hooked.hooked expire 3 lines", "... identical 12 lines"
+_CHATTY_RE = re.compile(r'\b(?:identical|expire) (\d+) lines?\b')
+# What logcat prints when the log buffer wrapped before it could read it
+_OVERFLOW_RE = re.compile(r'(?:logcat|read): [Uu]nexpected EOF|[Ll]og buffer overflow|No buffer space available')
+
+RUN_STAGES = ('parse', 'filter', 'colorize', 'json', 'write')
+
+
+class RunStats:
+    """
+    Throughput, stage costs, backlog and drops of the viewer itself.
+    
+    The probes sit in parse_batch (decoding and parsing, net of
+    filtering), collect_record (filtering), colorize_message and
+    _format_log_line (highlighting, finding and rendering JSON bodies) and
+    OutputWriter (writing). Stage seconds are wall time summed over
+    threads, so with render workers they can add up to more than the
+    elapsed time.
+    """
+    
+    def __init__(self, writer: Optional[OutputWriter] = None, pipeline: Optional['RenderPipeline'] = None,
+                 status: bool = True, status_interval: float = 1.0):
+        self.writer = writer
+        self.pipeline = pipeline
+        self.status = status
+        self.status_interval = status_interval
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.records = 0
+        self.passed = 0
+        self.rendered = 0
+        self.seconds = dict.fromkeys(RUN_STAGES, 0.0)
+        self.chatty_markers = 0
+        self.chatty_lines = 0
+        self.overflow_markers = 0
+        self.exceptions: Dict[str, int] = {}
+        self._published = self.started
+        self._published_lines = 0
+    
+    def count_batch(self, batch: List[bytes], items: List[Any], seconds: float):
+        """Count one parse_batch() call: lines in, items out, time spent parsing."""
+        self.lines_read += len(batch)
+        self.bytes_read += sum(map(len, batch)) + len(batch)
+        self.passed += len(items)
+        self.seconds['parse'] += seconds
+        self.publish()
+    
+    def observe_chatty(self, message: str):
+        match = _CHATTY_RE.search(message)
+        if match:
+            self.chatty_markers += 1
+            self.chatty_lines += int(match.group(1))
+    
+    def observe_unparsed(self, line: str):
+        if _OVERFLOW_RE.search(line):
+            self.overflow_markers += 1
+    
+    def count_exception(self, error: BaseException):
+        name = type(error).__name__
+        self.exceptions[name] = self.exceptions.get(name, 0) + 1
+    
+    def stage_seconds(self) -> Dict[str, float]:
+        seconds = dict(self.seconds)
+        if self.writer is not None:
+            seconds['write'] = self.writer.write_seconds
+        return seconds
+    
+    def backlog(self) -> Dict[str, int]:
+        """High-water marks of the writer buffer and the pipeline queues."""
+        backlog = {'writer_bytes': self.writer.max_buffered if self.writer is not None else 0}
+        if self.pipeline is not None:
+            backlog['read_queue'] = self.pipeline.read_queue.high_water
+            backlog['render_queue'] = self.pipeline.render_queue.high_water
+        return backlog
+    
+    def publish(self):
+        """Refresh the status line if it is due."""
+        if self.writer is None or not self.status:
+            return
+        now = time.monotonic()
+        if now - self._published < self.status_interval:
+            return
+        rate = (self.lines_read - self._published_lines) / (now - self._published)
+        self._published = now
+        self._published_lines = self.lines_read
+        self.writer.set_status('stats', self.status_line(rate))
+    
+    def status_line(self, rate: float) -> str:
+        seconds = self.stage_seconds()
+        total = sum(seconds.values()) or 1.0
+        shares = ' '.join(f"{stage} {seconds[stage] / total:.0%}" for stage in RUN_STAGES)
+        parts = [f"{rate:,.0f} lines/s"]
+        dropped = self.chatty_lines + self.overflow_markers
+        if dropped:
+            parts.append(f"{Colors.BRIGHT_YELLOW}{dropped:,} dropped by logd{Colors.BRIGHT_BLACK}")
+        errors = sum(self.exceptions.values())
+        if errors:
+            parts.append(f"{Colors.BRIGHT_RED}{errors:,} exceptions{Colors.BRIGHT_BLACK}")
+        if self.pipeline is not None:
+            parts.append(f"queued {self.pipeline.read_queue.qsize()}+{self.pipeline.render_queue.qsize()}")
+        parts.append(shares)
+        return f"{Colors.BRIGHT_BLACK}⏱ {' · '.join(parts)}{Colors.RESET}"
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything counted, as plain JSON-friendly values."""
+        writer = self.writer
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'elapsed': round(time.monotonic() - self.started, 3),
+            'command': sys.argv[1:],
+            'lines': {
+                'read': self.lines_read,
+                'read_bytes': self.bytes_read,
+                'records': self.records,
+                'passed': self.passed,
+                'rendered': self.rendered,
+                'written': writer.lines if writer is not None else 0,
+                'written_bytes': writer.bytes if writer is not None else 0,
+            },
+            'seconds': {stage: round(value, 6) for stage, value in self.stage_seconds().items()},
+            'backlog': self.backlog(),
+            'drops': {
+                'chatty_markers': self.chatty_markers,
+                'chatty_lines': self.chatty_lines,
+                'overflow_markers': self.overflow_markers,
+            },
+            'exceptions': dict(self.exceptions),
+        }
+    
+    def stats_lines(self) -> List[str]:
+        snapshot = self.snapshot()
+        lines, seconds = snapshot['lines'], snapshot['seconds']
+        elapsed = snapshot['elapsed'] or 1e-9
+        per = {'parse': lines['read'], 'filter': lines['records'], 'colorize': lines['rendered'],
+               'json': lines['rendered'], 'write': lines['written']}
+        result = [
+            f"read      {lines['read']:>12,} lines  {lines['read_bytes'] / (1024 * 1024):,.1f} MB"
+            f"  {lines['read'] / elapsed:,.0f} lines/s",
+            f"filtered  {lines['records']:>12,} records, {lines['passed']:,} items passed",
+            f"written   {lines['written']:>12,} lines  {lines['written_bytes'] / (1024 * 1024):,.1f} MB"
+            f"  ({lines['rendered']:,} items rendered)",
+        ]
+        for stage in RUN_STAGES:
+            count = per[stage]
+            cost = f"  {seconds[stage] / count * 1e6:,.1f} µs/line" if count else ''
+            result.append(f"{stage:<9} {seconds[stage]:>12.3f} s{cost}")
+        backlog = snapshot['backlog']
+        queues = ''.join(f" · {name.replace('_', ' ')} max {depth}" for name, depth in backlog.items()
+                         if name != 'writer_bytes')
+        result.append(f"backlog   writer buffer max {backlog['writer_bytes'] / 1024:,.0f} KB{queues}")
+        drops = snapshot['drops']
+        result.append(f"dropped   {drops['chatty_lines']:,} lines by chatty ({drops['chatty_markers']:,} markers), "
+                      f"{drops['overflow_markers']:,} buffer overflow markers")
+        if self.exceptions:
+            kinds = ', '.join(f"{name} ×{count}" for name, count in sorted(self.exceptions.items()))
+            result.append(f"errors    {sum(self.exceptions.values()):,} exceptions: {kinds}")
+        return result
+    
+    def dump(self, path: str):
+        """Append the snapshot as one JSON line to path ('-' for stdout)."""
+        line = json.dumps(self.snapshot(), sort_keys=True) + '\n'
+        if path == '-':
+            sys.stdout.write(line)
+            return
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+# ============================================================================
+# Profiling
+# ============================================================================
+
+class StackSampler:
+    """
+    Samples every other thread's stack at a fixed interval.
+    
+    Each sample is weighted by the CPU time its thread used since the last
+    one (where the platform has per-thread CPU clocks), so threads blocked
+    in select() or on a queue don't count. Stacks are kept as folded
+    "outer;inner" strings, the input format of flamegraph.pl and
+    speedscope.
+    """
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Dict[str, float] = {}
+        self.samples = 0
+        self.cpu_weighted = hasattr(time, 'pthread_getcpuclockid')
+        # Threads of the profiler itself
+        self.ignore = set()
+        self._cpu: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='logview-sampler', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        self.ignore.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident in self.ignore:
+                    continue
+                weight = 1.0
+                if self.cpu_weighted:
+                    try:
+                        used = time.clock_gettime(time.pthread_getcpuclockid(ident))
+                    except OSError:
+                        continue
+                    weight = used - self._cpu.get(ident, used)
+                    self._cpu[ident] = used
+                    if weight <= 0:
+                        continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack = ';'.join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0.0) + weight
+                self.samples += 1
+    
+    def write(self, path: str):
+        """Write the folded stacks, weighted in microseconds of CPU (or in samples)."""
+        scale = 1e6 if self.cpu_weighted else 1
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, weight in sorted(self.stacks.items()):
+                f.write(f"{stack} {max(1, round(weight * scale))}\n")
+    
+    def top(self, limit: int) -> List[tuple]:
+        """(self share, total share, function) of the costliest functions."""
+        total = sum(self.stacks.values()) or 1.0
+        own: Dict[str, float] = {}
+        inclusive: Dict[str, float] = {}
+        for stack, weight in self.stacks.items():
+            names = stack.split(';')
+            own[names[-1]] = own.get(names[-1], 0.0) + weight
+            for name in set(names):
+                inclusive[name] = inclusive.get(name, 0.0) + weight
+        ranked = sorted(own, key=lambda name: -own[name])[:limit]
+        return [(own[name] / total, inclusive[name] / total, name) for name in ranked]
+
+
+class MemoryWatch:
+    """
+    tracemalloc snapshots every interval seconds.
+    
+    Each snapshot is compared with the previous one, and growth is
+    reported as it happens. On exit, the last snapshot is compared with
+    the first.
+    """
+    
+    def __init__(self, interval: float, writer: Optional[OutputWriter] = None, frames: int = 1):
+        self.interval = interval
+        self.writer = writer
+        self.frames = frames
+        self.first = None
+        self.last = None
+        self.sizes: List[tuple] = []
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='logview-memory', daemon=True)
+    
+    def start(self):
+        tracemalloc.start(self.frames)
+        self._started = time.monotonic()
+        self.first = self.last = self._snapshot()
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.last = self._snapshot()
+        tracemalloc.stop()
+    
+    def _snapshot(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ])
+        self.sizes.append((time.monotonic() - self._started, tracemalloc.get_traced_memory()[0]))
+        return snapshot
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            previous, self.last = self.last, self._snapshot()
+            growth = self.growth(previous, self.last, 1)
+            if self.writer is not None and growth:
+                size = self.sizes[-1][1] - self.sizes[-2][1]
+                self.writer.write_line(f"{Colors.BRIGHT_BLACK}⏱ memory {self.sizes[-1][1] / (1024 * 1024):,.1f} MB "
+                                       f"traced ({size / 1024:+,.0f} KB), most at {growth[0]}{Colors.RESET}")
+    
+    @staticmethod
+    def growth(before, after, limit: int) -> List[str]:
+        """The source lines whose allocations grew most between two snapshots."""
+        lines = []
+        for diff in after.compare_to(before, 'lineno')[:limit]:
+            if diff.size_diff <= 0:
+                break
+            frame = diff.traceback[0]
+            lines.append(f"{os.path.basename(frame.filename)}:{frame.lineno} {diff.size_diff / 1024:+,.0f} KB "
+                         f"in {diff.count_diff:+,} blocks")
+        return lines
+    
+    def stats_lines(self, limit: int = 10) -> List[str]:
+        start, end = self.sizes[0][1], self.sizes[-1][1]
+        lines = [f"traced {start / (1024 * 1024):,.1f} MB at start, {end / (1024 * 1024):,.1f} MB at exit "
+                 f"({len(self.sizes)} snapshots, peak {max(size for _, size in self.sizes) / (1024 * 1024):,.1f} MB)"]
+        lines += self.growth(self.first, self.last, limit)
+        return lines
+
+
+class SessionProfiler:
+    """
+    --profile: a profiler around the whole session, plus a MemoryWatch.
+    
+    'deterministic' runs cProfile in every thread (one profiler per
+    thread before Python 3.12, whose cProfile sees all threads already)
+    and writes pstats, which snakeviz, gprof2dot and pstats load; times
+    are CPU time of the calling thread.
+    'sampling' runs a StackSampler and writes folded stacks, at far lower
+    cost. Nothing here runs or is installed unless --profile is given.
+    """
+    
+    def __init__(self, path: str, mode: str = 'deterministic', memory_interval: float = 60.0,
+                 writer: Optional[OutputWriter] = None):
+        self.path = path
+        self.mode = mode
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.profilers: List[cProfile.Profile] = []
+        self.sampler = StackSampler() if mode == 'sampling' else None
+        self.memory = MemoryWatch(memory_interval, writer) if memory_interval > 0 else None
+    
+    def start(self):
+        self.started = time.monotonic()
+        if self.memory is not None:
+            self.memory.start()
+        if self.sampler is not None:
+            if self.memory is not None:
+                self.sampler.ignore.add(self.memory._thread.ident)
+            self.sampler.start()
+            return
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._profile_thread)
+        self._profile_thread()
+    
+    def _profile_thread(self, *args):
+        # Runs first thing in each new thread; enable() replaces this hook. Timed
+        # in thread CPU time, so threads waiting on queues and locks cost nothing.
+        profiler = cProfile.Profile(time.thread_time)
+        self.profilers.append(profiler)
+        profiler.enable()
+    
+    def stop(self):
+        """Stop profiling and write the profile file."""
+        self.elapsed = time.monotonic() - self.started
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.write(self.path)
+        else:
+            threading.setprofile(None)
+            for profiler in self.profilers:
+                profiler.disable()
+            stats = pstats.Stats(*self.profilers)
+            stats.dump_stats(self.path)
+        if self.memory is not None:
+            self.memory.stop()
+    
+    def stats_lines(self, limit: int = 15) -> List[str]:
+        """The top cost centers, then memory growth."""
+        lines = []
+        if self.sampler is not None:
+            lines.append(f"{'self':>6}  {'total':>6}  function ({self.sampler.samples:,} samples)")
+            for own, inclusive, name in self.sampler.top(limit):
+                lines.append(f"{own:>6.1%}  {inclusive:>6.1%}  {name}")
+        else:
+            stats = pstats.Stats(*self.profilers).stats
+            total = sum(entry[2] for entry in stats.values()) or 1.0
+            lines.append(f"{'self':>6}  {'self s':>8}  {'cum s':>8}  {'calls':>10}  function")
+            for (filename, lineno, name), (_, calls, own, cumulative, _) in sorted(
+                    stats.items(), key=lambda item: -item[1][2])[:limit]:
+                where = f" ({os.path.basename(filename)}:{lineno})" if lineno else ''
+                lines.append(f"{own / total:>6.1%}  {own:>8.3f}  {cumulative:>8.3f}  {calls:>10,}  {name}{where}")
+        lines.append(f"written to {self.path}")
+        if self.memory is not None:
+            lines += self.memory.stats_lines()
+        return lines
+
+
+# ============================================================================
+# Pipe Reading
+# ============================================================================
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# How long a live stream may be quiet before held-back records and markers are released
+IDLE_SECONDS = 0.25
+
+_LEVEL_BYTES = {ord(k): v for k, v in LogLevel._names.items() if len(k) == 1}
+
+
+def iter_line_batches(stream, chunk_size: int = READ_CHUNK_SIZE, idle: Optional[float] = None):
+    """
+    Read a binary stream in large chunks and yield lists of complete lines
+    (as bytes, without the newline). The partial line at the end of a chunk
+    is carried into the next one. Ends at EOF, so a process that exits is
+    noticed without polling it, and nothing it wrote before exiting is lost.
+    
+    With idle (seconds), an empty list is yielded whenever the stream has
+    been quiet that long, so held-back records can be released; the stream
+    must then be unbuffered (a pipe opened with bufsize=0).
+    """
+    read = getattr(stream, 'read1', None) or stream.read
+    tail = b''
+    while True:
+        if idle is not None:
+            while not select.select([stream], [], [], idle)[0]:
+                yield []
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        if tail:
+            chunk = tail + chunk
+        lines = chunk.split(b'\n')
+        tail = lines.pop()
+        if lines:
+            yield lines
+    if tail:
+        yield [tail]
+
+
+def decode_line(data: bytes) -> str:
+    """Decode a raw logcat line; invalid UTF-8 from native code becomes U+FFFD."""
+    return data.decode('utf-8', 'replace').rstrip()
+
+
+def make_byte_prefilter(log_format: str, log_filter: LogFilter,
+                        tracker: Optional['ProcessTracker'] = None) -> Optional[Callable[[bytes], bool]]:
+    """
+    Build a check that rejects raw lines which cannot pass the filter's
+    level and tags (or, with a tracker, don't come from a tracked process), so they
+    are never decoded or parsed. Lines from the tracker's watch tag are
+    always kept. It only rejects lines it fully understands; anything else
+    (continuation lines, non-ASCII tags, unusual spacing) is kept for the
+    normal path to decide. Returns None when there is nothing to filter or
+    the format spans several lines.
+    """
+    min_level = log_filter.min_level
+    tag_filter = log_filter.tags
+    exact = log_filter.exact_tags
+    if log_format == 'long' or (min_level <= LogLevel.VERBOSE and not tag_filter and tracker is None):
+        return None
+    
+    if not tag_filter:
+        terms = None
+    elif exact:
+        terms = {t.encode('utf-8') for t in tag_filter}
+    else:
+        terms = [t.lower().encode('utf-8') for t in tag_filter]
+    levels = _LEVEL_BYTES
+    watch_tag = tracker.WATCH_TAG.encode('ascii') if tracker is not None else None
+    pids = tracker.pid_bytes if tracker is not None else None
+    
+    def decide(level: int, tag: bytes, pid: bytes) -> bool:
+        tag = tag.strip()
+        if tag == watch_tag:
+            return True
+        if pids is not None and pid not in pids:
+            return False
+        if level < min_level:
+            return False
+        if terms is None or not tag.isascii():
+            return True
+        if exact:
+            return tag in terms
+        tag = tag.lower()
+        return any(t in tag for t in terms)
+    
+    if log_format == 'time':
+        def prefilter(line: bytes) -> bool:
+            # "MM-DD HH:MM:SS.mmm L/TAG( PID): message"
+            if len(line) < 22 or line[20] != 0x2F or line[2] != 0x2D:
+                return True
+            level = levels.get(line[19])
+            open_paren = line.find(b'(', 21)
+            close = line.find(b')', open_paren)
+            if level is None or open_paren < 0 or close < 0:
+                return True
+            return decide(level, line[21:open_paren], line[open_paren + 1:close].strip())
+        return prefilter
+    
+    # threadtime, epoch and monotonic: "<time> PID TID L TAG: message"
+    skip = 1 if log_format == 'threadtime' else 0
+    
+    def prefilter(line: bytes) -> bool:
+        fields = line.split(None, 4 + skip)
+        if len(fields) < 5 + skip:
+            return True
+        level_field = fields[3 + skip]
+        if len(level_field) != 1:
+            return True
+        level = levels.get(level_field[0])
+        if level is None:
+            return True
+        tag, sep, _ = fields[4 + skip].partition(b':')
+        return not sep or decide(level, tag, fields[1 + skip])
+    return prefilter
+
+
+# ============================================================================
+# Render Pipeline
+# ============================================================================
+
+def parse_batch(batch: List[bytes], parser: LogcatParser, prefilter: Optional[Callable[[bytes], bool]],
+                log_filter: LogFilter,
+                tracker: Optional['ProcessTracker'] = None,
+                cursor: Optional[StreamCursor] = None,
+                assembler: Optional[MessageAssembler] = None) -> List[Any]:
+    """
+    Decode, parse and filter a batch of raw lines. Returns records that pass
+    the filters (LogRecords), unparsed lines (str) and tracker notices (Notice),
+    in input order. With a tracker, only records from its processes pass;
+    with a cursor, records repeated after a resume are dropped; with an
+    assembler, split messages are joined before they are filtered.
+    """
+    stats = RUN_STATS
+    if stats is not None:
+        started = time.perf_counter()
+        filtering = stats.seconds['filter']
+    items = []
+    if assembler is not None:
+        for parsed in assembler.expire():
+            collect_record(items, parsed, log_filter, tracker)
+    for data in batch:
+        # Drop lines that can't pass the filters before decoding them
+        if prefilter is not None and not prefilter(data):
+            continue
+        line = decode_line(data)
+        parsed = parser.parse(line)
+        if parsed is PENDING:
+            continue
+        if not parsed:
+            if line and (cursor is None or not cursor.resuming):
+                items.append(line)
+                if stats is not None:
+                    stats.observe_unparsed(line)
+        elif cursor is None or not cursor.seen(parsed):
+            if assembler is None:
+                collect_record(items, parsed, log_filter, tracker)
+            else:
+                for parsed in assembler.feed(parsed):
+                    collect_record(items, parsed, log_filter, tracker)
+    if stats is not None:
+        stats.count_batch(batch, items, time.perf_counter() - started - (stats.seconds['filter'] - filtering))
+    return items
+
+
+def read_records(batches, parser: LogcatParser, prefilter: Optional[Callable[[bytes], bool]],
+                 log_filter: LogFilter,
+                 tracker: Optional['ProcessTracker'] = None, cursor: Optional[StreamCursor] = None,
+                 stats: Optional[TrafficStats] = None, assembler: Optional[MessageAssembler] = None):
+    """
+    Run parse_batch() over raw line batches, yielding one item list per batch.
+    An empty batch (see iter_line_batches' idle) just releases expired
+    assembler groups.
+    """
+    for batch in batches:
+        items = parse_batch(batch, parser, prefilter, log_filter, tracker, cursor, assembler)
+        if stats is not None:
+            stats.count(batch, items)
+        yield items
+    yield finish_records(parser, log_filter, tracker, cursor, assembler)
+
+
+def finish_records(parser: LogcatParser, log_filter: LogFilter,
+                   tracker: Optional['ProcessTracker'] = None, cursor: Optional[StreamCursor] = None,
+                   assembler: Optional[MessageAssembler] = None) -> List[Any]:
+    """Items still held at the end of a stream: a "long" record waiting for its blank line, split messages."""
+    items = []
+    parsed = parser.flush()
+    if parsed and (cursor is None or not cursor.seen(parsed)):
+        if assembler is None:
+            collect_record(items, parsed, log_filter, tracker)
+        else:
+            for parsed in assembler.feed(parsed):
+                collect_record(items, parsed, log_filter, tracker)
+    if assembler is not None:
+        for parsed in assembler.flush():
+            collect_record(items, parsed, log_filter, tracker)
+    return items
+
+
+def collect_record(items: List[Any], parsed: LogRecord, log_filter: LogFilter,
+                   tracker: Optional['ProcessTracker'] = None):
+    """Append a parsed record to items if it passes the filters, plus any tracker notice."""
+    stats = RUN_STATS
+    if stats is not None and parsed.tag == 'chatty':
+        stats.observe_chatty(parsed.message)
+    if tracker is not None:
+        notice = tracker.observe(parsed)
+        if notice is not None:
+            items.append(notice)
+        if parsed.pid not in tracker.processes:
+            return
+    if stats is not None:
+        started = time.perf_counter()
+        keep = log_filter.matches(parsed)
+        stats.seconds['filter'] += time.perf_counter() - started
+        stats.records += 1
+        if keep:
+            items.append(parsed)
+    elif log_filter.matches(parsed):
+        items.append(parsed)
+
+
+def render_batch(items: List[Any], show_json: bool) -> List[tuple]:
+    """
+    Render parsed items into (level, text) pairs. Unparsed lines pass
+    through with level None; their color depends on the lines before them,
+    so LogPrinter decides it in output order.
+    """
+    rendered = []
+    for item in items:
+        cls = item.__class__
+        if cls is str:
+            rendered.append((None, item))
+        elif cls is Notice:
+            rendered.append((Notice, item))
+        else:
+            rendered.append((item.level, format_log_line(item, show_json)))
+    if RUN_STATS is not None:
+        RUN_STATS.rendered += len(rendered)
+    return rendered
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that tracks its depth and how often producers had to wait."""
+    
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(maxsize)
+        self.name = name
+        self.puts = 0
+        self.blocked_puts = 0
+        self.high_water = 0
+        self._depth_total = 0
+    
+    def put(self, item, block=True, timeout=None):
+        if self.full():
+            self.blocked_puts += 1
+        super().put(item, block, timeout)
+        depth = self.qsize()
+        self.puts += 1
+        self._depth_total += depth
+        if depth > self.high_water:
+            self.high_water = depth
+    
+    def stats_line(self) -> str:
+        """Human-readable depth summary."""
+        avg = self._depth_total / self.puts if self.puts else 0.0
+        return (
+            f"{self.name}: depth {self.qsize()}/{self.maxsize}, avg {avg:.1f}, "
+            f"max {self.high_water}, {self.blocked_puts}/{self.puts} puts blocked"
+        )
+
+
+class RenderPipeline:
+    """
+    Reader -> render workers -> ordered writer.
+    
+    A reader thread pulls item batches from the source and numbers them, a
+    pool of worker threads renders them, and the calling thread emits the
+    results strictly in input order. Both hand-offs are bounded queues, so a
+    slow stage blocks the one before it instead of growing memory; the
+    reader keeps draining the adb pipe while rendering catches up.
+    """
+    
+    def __init__(self, workers: int = 1, queue_size: int = 64):
+        self.workers = max(1, workers)
+        self.read_queue = MonitoredQueue('read queue', queue_size)
+        self.render_queue = MonitoredQueue('render queue', queue_size)
+    
+    def run(self, source, render: Callable[[List[Any]], List[tuple]], emit: Callable[[List[tuple]], None]):
+        """Run until source is exhausted; exceptions in any stage are re-raised here."""
+        errors = []
+        
+        def reader():
+            seq = 0
+            try:
+                for items in source:
+                    if items:
+                        self.read_queue.put((seq, items))
+                        seq += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                for _ in range(self.workers):
+                    self.read_queue.put(None)
+        
+        def worker():
+            try:
+                while True:
+                    job = self.read_queue.get()
+                    if job is None:
+                        break
+                    seq, items = job
+                    self.render_queue.put((seq, render(items)))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.render_queue.put(None)
+        
+        threads = [threading.Thread(target=reader, name='logview-reader', daemon=True)]
+        threads += [
+            threading.Thread(target=worker, name=f'logview-render-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        # Ordered writer: hold results that arrive early until their turn
+        pending = {}
+        next_seq = 0
+        running = self.workers
+        while running:
+            job = self.render_queue.get()
+            if job is None:
+                running -= 1
+                continue
+            seq, rendered = job
+            pending[seq] = rendered
+            while next_seq in pending:
+                emit(pending.pop(next_seq))
+                next_seq += 1
+        
+        if errors:
+            raise errors[0]
+    
+    def stats_lines(self) -> List[str]:
+        """Queue depth summaries, one per hand-off."""
+        return [self.read_queue.stats_line(), self.render_queue.stats_line()]
+
+
+# ============================================================================
+# Main Logic
+# ============================================================================
+
+class LogPrinter:
+    """Prints rendered records and unparsed lines in order, tracking error blocks."""
+    
+    def __init__(self, writer: OutputWriter, log_filter: LogFilter, show_json: bool):
+        self.writer = writer
+        self.log_filter = log_filter
+        self.show_json = show_json
+        self.last_level = None
+        self.in_error_block = False
+    
+    def print_unparsed(self, line: str):
+        """Print an unparseable line (like a stack trace) with color based on the last level."""
+        if not line:
+            return
+        if self.last_level in ('E', 'F', 'A'):
+            # Colorize stack trace elements
+            self.writer.write_line(STACK_TRACE_HIGHLIGHTER.highlight(line), urgent=True)
+        elif self.last_level == 'W':
+            self.writer.write_line(f"{Colors.YELLOW}{line}{Colors.RESET}")
+        else:
+            self.writer.write_line(f"{Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
+    
+    def print_rendered(self, current_level: str, text: str):
+        """Print an already formatted record line."""
+        writer = self.writer
+        is_error = current_level in ('E', 'F', 'A')
+        
+        # Close error block before printing non-error line
+        if self.in_error_block and not is_error:
+            writer.write_line(format_separator('E'))
+            self.in_error_block = False
+        
+        # Open error block before first error line
+        if is_error and not self.in_error_block:
+            writer.write_line(format_separator(current_level))
+            self.in_error_block = True
+        
+        # Print the formatted line; errors and crashes go out immediately
+        writer.write_line(text, urgent=is_error)
+        
+        self.last_level = current_level
+    
+    def print_record(self, parsed: LogRecord):
+        """Print a parsed record if it passes the filters."""
+        if self.log_filter.matches(parsed):
+            self.print_rendered(parsed.level, format_log_line(parsed, self.show_json))
+    
+    def emit(self, rendered: List[tuple]):
+        """Print the output of render_batch()."""
+        for level, text in rendered:
+            if level is None:
+                self.print_unparsed(text)
+            elif level is Notice:
+                self.writer.write_line(text)
+            else:
+                self.print_rendered(level, text)
+
+
+def stream_logs(package: str, log_filter: LogFilter, show_json: bool,
+                log_format: str = 'time', writer: Optional[OutputWriter] = None,
+                pipeline: Optional[RenderPipeline] = None, track: str = 'events',
+                archive: Optional['ArchiveWriter'] = None, device_args: Optional[List[str]] = None,
+                stats: Optional[TrafficStats] = None, consumer: Optional[Callable[[List[Any]], None]] = None):
+    """
+    Stream and display logs, following the app across restarts.
+    
+    With track='events', one long-lived logcat is read and a ProcessTracker
+    follows the package's processes from ActivityManager events; adb is only
+    restarted if the stream itself ends. Where the device supports it, that
+    logcat only carries the app's and system_server's uids. With track='pid', logcat is
+    restarted with --pid whenever the main process changes.
+    
+    With a pipeline, reading, rendering and writing run on separate threads;
+    without one, everything runs inline on the calling thread. With an
+    archive, every record shown is also recorded to it. device_args (see
+    logcat_filter_args) are passed to logcat to filter on the device. With
+    a consumer, item batches go to it instead of being rendered.
+    """
+    if writer is None:
+        writer = OutputWriter()
+    printer = LogPrinter(writer, log_filter, show_json)
+    cursor = StreamCursor()
+    
+    def render(items: List[Any]) -> List[tuple]:
+        return render_batch(items, show_json)
+    
+    while True:
+        if track == 'events':
+            tracker = ProcessTracker(package, snapshot_processes(package))
+            if not tracker.processes:
+                writer.write_line(f"  {Colors.BRIGHT_BLACK}Waiting for {package} to start...{Colors.RESET}")
+            logcat_args = ['logcat', '-v', log_format] + uid_logcat_args(get_package_uid(package))
+        else:
+            tracker = None
+            # Get PID
+            pid = get_pid(package)
+            
+            if not pid:
+                writer.flush()
+                print_waiting_message(package)
+                time.sleep(1)
+                continue
+            
+            # Clear waiting message
+            print(" " * 60, end='\r')
+            logcat_args = ['logcat', '-v', log_format, f'--pid={pid}']
+        
+        prefilter = make_byte_prefilter(log_format, log_filter, tracker)
+        
+        # Resume right after the last line of the previous session; filterspecs go last
+        logcat_args += cursor.resume_args(log_format)
+        logcat_args += device_args or []
+        
+        # Start logcat; output is read as raw bytes in large chunks
+        process = run_adb_popen(
+            logcat_args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        
+        # Each logcat session gets a parser locked to the requested format
+        parser = LogcatParser(log_format)
+        
+        try:
+            if process.stdout is None:
+                time.sleep(1)
+                continue
+            
+            batches = iter_line_batches(process.stdout, idle=IDLE_SECONDS)
+            items = read_records(batches, parser, prefilter, log_filter, tracker, cursor, stats,
+                                 new_assembler())
+            if archive is not None:
+                items = archive.tap(items)
+            items = apply_output_stages(items, observe_only=consumer is not None)
+            if consumer is not None:
+                for batch in items:
+                    consumer(batch)
+            elif pipeline is not None:
+                pipeline.run(items, render, printer.emit)
+            else:
+                for batch in items:
+                    printer.emit(render(batch))
+                
+        except BrokenPipeError:
+            raise
+        except Exception as e:
+            # Reconnect rather than end the session, but say why
+            if RUN_STATS is not None:
+                RUN_STATS.count_exception(e)
+            writer.write_line(f"{Colors.BRIGHT_RED}⚠ {type(e).__name__}: {e}{Colors.RESET}", urgent=True)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        
+        # App restarted (pid mode) or the logcat stream dropped; reconnect
+        writer.flush()
+        print_reconnect_message(package, 'App restarted' if tracker is None else 'Log stream ended')
+        time.sleep(1)
+
+
+# ============================================================================
+# Multi-Device Streaming
+# ============================================================================
+
+ANSI_ESCAPE_RE = re.compile(r'\033\[[0-9;]*m')
+
+DEVICE_COLORS = ('BRIGHT_CYAN', 'BRIGHT_MAGENTA', 'BRIGHT_YELLOW', 'BRIGHT_GREEN', 'BRIGHT_BLUE', 'BRIGHT_RED')
+
+
+def device_label(serial: str, width: int = 6) -> str:
+    """Compact device label: the tail of the serial ("emulator-5554" -> "5554")."""
+    tail = serial.rsplit('-', 1)[-1] if '-' in serial else serial
+    return tail[-width:]
+
+
+def timestamp_key(timestamp: str) -> Any:
+    """Sort key for a record timestamp; seconds-based formats compare numerically."""
+    if timestamp[:1].isdigit() and '-' not in timestamp:
+        try:
+            return float(timestamp)
+        except ValueError:
+            pass
+    return timestamp
+
+
+def timestamp_seconds(timestamp: str) -> Optional[float]:
+    """Seconds from a timestamp (time of day for dated formats), or None."""
+    key = timestamp_key(timestamp)
+    if key.__class__ is float:
+        return key
+    try:
+        hours, minutes, seconds = timestamp.rsplit(' ', 1)[-1].split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+def fit_visible(text: str, width: int) -> str:
+    """Truncate or pad text to a visible width, keeping its color codes intact."""
+    text = text.expandtabs(4)
+    out = []
+    visible = 0
+    pos = 0
+    for match in ANSI_ESCAPE_RE.finditer(text):
+        chunk = text[pos:match.start()]
+        if visible + len(chunk) > width:
+            out.append(chunk[:width - visible])
+            visible = width
+            break
+        out.append(chunk)
+        visible += len(chunk)
+        out.append(match.group())
+        pos = match.end()
+    else:
+        chunk = text[pos:]
+        out.append(chunk[:width - visible])
+        visible += min(len(chunk), width - visible)
+    if visible >= width:
+        out.append(Colors.RESET)
+    return ''.join(out) + ' ' * (width - visible)
+
+
+class PrefixedWriter:
+    """Writer adapter that starts every output line with a device prefix."""
+    
+    def __init__(self, writer: OutputWriter, prefix: str):
+        self.writer = writer
+        self.prefix = prefix
+    
+    def write_line(self, text: str, urgent: bool = False):
+        prefix = self.prefix
+        self.writer.write_line(prefix + text.replace('\n', '\n' + prefix), urgent)
+
+
+class PaneWriter:
+    """Writer adapter that places a device's lines in its own column."""
+    
+    def __init__(self, writer: OutputWriter, index: int, count: int, total_width: int):
+        self.writer = writer
+        self.width = max(10, (total_width - (count - 1)) // count)
+        self.before = [' ' * self.width] * index
+        self.after = [' ' * self.width] * (count - index - 1)
+    
+    def write_line(self, text: str, urgent: bool = False):
+        divider = f"{Colors.BRIGHT_BLACK}│{Colors.RESET}"
+        rows = [
+            divider.join(self.before + [fit_visible(line, self.width)] + self.after).rstrip()
+            for line in text.split('\n')
+        ]
+        self.writer.write_line('\n'.join(rows), urgent)
+
+
+class DeviceStream:
+    """State for one followed device."""
+    
+    def __init__(self, serial: str, printer: LogPrinter, out):
+        self.serial = serial
+        self.printer = printer
+        self.out = out
+        self.last_key = None
+        self.active = False
+        self.cursor = StreamCursor()
+
+
+class TimestampMerger:
+    """
+    Heap merge of live per-device record streams by timestamp.
+    
+    A record is released once every other active device has reached its
+    timestamp, or after it has been held for `window` seconds, so a quiet
+    device delays output by at most the window.
+    """
+    
+    def __init__(self, devices: List[DeviceStream], show_json: bool, window: float = 0.2):
+        self.devices = devices
+        self.show_json = show_json
+        self.window = window
+        self._heap = []
+        self._seq = 0
+    
+    def push(self, device: DeviceStream, item: Any):
+        """Queue a record (LogRecord), unparsed line (str) or notice from a device."""
+        if isinstance(item, str):
+            key = device.last_key
+        else:
+            key = device.last_key = timestamp_key(item.timestamp)
+        if key is None:
+            self._emit(device, item)
+            return
+        self._seq += 1
+        heapq.heappush(self._heap, (key, self._seq, time.monotonic(), device, item))
+    
+    def drain(self, force: bool = False):
+        """Release every record that is safe to print."""
+        heap = self._heap
+        now = time.monotonic()
+        while heap:
+            key, _, arrived, device, item = heap[0]
+            if not force and now - arrived < self.window:
+                if any(
+                    d.active and d is not device and (d.last_key is None or d.last_key < key)
+                    for d in self.devices
+                ):
+                    break
+            heapq.heappop(heap)
+            self._emit(device, item)
+    
+    def _emit(self, device: DeviceStream, item: Any):
+        device.printer.emit(render_batch([item], self.show_json))
+
+
+async def _adb_output(serial: str, args: List[str]) -> str:
+    """Run a short adb command against one device and return its stdout."""
+    service = adb_service(['-s', serial] + args) if ADB_CLIENT is not None else None
+    if service is not None:
+        try:
+            reader, writer = await ADB_CLIENT.open_async(*service)
+            try:
+                return (await asyncio.wait_for(reader.read(), timeout=5)).decode('utf-8', 'replace')
+            finally:
+                writer.close()
+        except asyncio.TimeoutError:
+            return ''
+        except OSError:
+            pass
+    if not ADB_PATH:
+        raise FileNotFoundError("adb not found")
+    process = await asyncio.create_subprocess_exec(
+        ADB_PATH, '-s', serial, *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=5)
+    except asyncio.TimeoutError:
+        process.kill()
+        return ''
+    return stdout.decode('utf-8', 'replace')
+
+
+async def _adb_stream(serial: str, args: List[str]) -> Any:
+    """Start a streaming adb command on one device: an AsyncAdbService if it can, else an adb process."""
+    service = adb_service(['-s', serial] + args) if ADB_CLIENT is not None else None
+    if service is not None:
+        try:
+            return AsyncAdbService(*await ADB_CLIENT.open_async(*service))
+        except (OSError, asyncio.TimeoutError):
+            pass
+    if not ADB_PATH:
+        raise FileNotFoundError("adb not found")
+    return await asyncio.create_subprocess_exec(
+        ADB_PATH, '-s', serial, *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+
+
+async def follow_device(device: DeviceStream, merger: TimestampMerger, package: str, log_format: str,
+                        log_filter: LogFilter, device_args: Optional[List[str]] = None):
+    """Follow the package on one device, feeding records into the merger."""
+    while True:
+        tracker = ProcessTracker(
+            package,
+            parse_ps_output(await _adb_output(device.serial, ['shell', 'ps', '-A', '-o', 'PID,NAME']), package)
+        )
+        if not tracker.processes:
+            device.out.write_line(f"{Colors.BRIGHT_BLACK}Waiting for {package} to start...{Colors.RESET}")
+        prefilter = make_byte_prefilter(log_format, log_filter, tracker)
+        
+        uid = None
+        sdk = (await _adb_output(device.serial, ['shell', 'getprop', 'ro.build.version.sdk'])).strip()
+        if sdk.isdigit() and int(sdk) >= LOGCAT_UID_SDK:
+            uid = parse_package_uid(await _adb_output(device.serial, ['shell', 'pm', 'list', 'packages', '-U', package]),
+                                    package)
+        process = await _adb_stream(device.serial, ['logcat', '-v', log_format, *uid_logcat_args(uid),
+                                                    *device.cursor.resume_args(log_format), *(device_args or [])])
+        parser = LogcatParser(log_format)
+        assembler = new_assembler()
+        stages = [stage for stage in (new_http_correlator(), new_trace_grouper(), new_storm_guard())
+                  if stage is not None]
+        device.active = True
+        tail = b''
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(process.stdout.read(READ_CHUNK_SIZE), IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Quiet stream: release held-back records and markers
+                    lines = []
+                else:
+                    if not chunk:
+                        break
+                    lines = (tail + chunk).split(b'\n')
+                    tail = lines.pop()
+                items = parse_batch(lines, parser, prefilter, log_filter, tracker, device.cursor, assembler)
+                for stage in stages:
+                    items = stage.process(items)
+                for item in items:
+                    merger.push(device, item)
+            items = parse_batch([tail] if tail else [], parser, prefilter, log_filter, tracker, device.cursor,
+                                assembler)
+            items += finish_records(parser, log_filter, tracker, device.cursor, assembler)
+            for stage in stages:
+                items = stage.process(items) + stage.process([])
+            for item in items:
+                merger.push(device, item)
+        finally:
+            device.active = False
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+        
+        merger.drain(force=True)
+        device.out.write_line(f"{Colors.BRIGHT_YELLOW}⟳ Log stream ended, reconnecting to {package}...{Colors.RESET}")
+        await asyncio.sleep(1)
+
+
+async def stream_devices(serials: List[str], package: str, log_filter: LogFilter,
+                         show_json: bool, log_format: str = 'time', writer: Optional[OutputWriter] = None,
+                         panes: bool = False, merge_window: float = 0.2, device_args: Optional[List[str]] = None):
+    """
+    Follow the package on several devices at once from a single event loop,
+    one adb logcat per device, merged into one view by timestamp.
+    """
+    if writer is None:
+        writer = OutputWriter()
+    width = shutil.get_terminal_size().columns
+    label_width = max(len(device_label(s)) for s in serials)
+    
+    devices = []
+    for i, serial in enumerate(serials):
+        color = getattr(Colors, DEVICE_COLORS[i % len(DEVICE_COLORS)])
+        if panes:
+            out = PaneWriter(writer, i, len(serials), width)
+        else:
+            out = PrefixedWriter(writer, f"{color}{device_label(serial):<{label_width}}{Colors.RESET} ")
+        devices.append(DeviceStream(serial, LogPrinter(out, log_filter, show_json), out))
+    
+    if panes:
+        header = f"{Colors.BRIGHT_BLACK}│{Colors.RESET}".join(
+            fit_visible(f"{Colors.BOLD}{getattr(Colors, DEVICE_COLORS[i % len(DEVICE_COLORS)])}{serial}{Colors.RESET}",
+                        devices[i].out.width)
+            for i, serial in enumerate(serials)
+        )
+        writer.write_line(header.rstrip())
+    
+    merger = TimestampMerger(devices, show_json, merge_window)
+    tasks = [
+        asyncio.ensure_future(follow_device(d, merger, package, log_format, log_filter, device_args))
+        for d in devices
+    ]
+    try:
+        while True:
+            await asyncio.sleep(merge_window / 4)
+            merger.drain()
+            for task in tasks:
+                if task.done() and task.exception() is not None:
+                    raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        merger.drain(force=True)
+
+
+# ============================================================================
+# Offline Input
+# ============================================================================
+
+FILE_CHUNK_SIZE = 1024 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def iter_mmap_batches(mm: mmap.mmap, chunk_size: int = FILE_CHUNK_SIZE):
+    """
+    Yield lists of lines from a memory-mapped file. Chunks are cut at a
+    newline, so no partial line is carried over, and pages that have been
+    read are released so memory stays flat however large the file is.
+    """
+    size = len(mm)
+    pos = 0
+    released = 0
+    while pos < size:
+        end = min(pos + chunk_size, size)
+        if end < size:
+            cut = mm.rfind(b'\n', pos, end)
+            if cut < 0:
+                # A single line longer than the chunk
+                cut = mm.find(b'\n', end)
+            end = size if cut < 0 else cut + 1
+        lines = mm[pos:end].split(b'\n')
+        if not lines[-1]:
+            lines.pop()
+        pos = end
+        yield lines
+        
+        done = pos - pos % mmap.PAGESIZE
+        if done > released and hasattr(mm, 'madvise'):
+            mm.madvise(mmap.MADV_DONTNEED, released, done - released)
+            released = done
+
+
+def iter_file_batches(path: str):
+    """
+    Yield raw line batches from a saved capture: '-' reads stdin, gzip
+    files (by content, not name) are decompressed as they stream, and other
+    regular files are memory-mapped.
+    """
+    if path == '-':
+        yield from iter_line_batches(sys.stdin.buffer, FILE_CHUNK_SIZE)
+        return
+    
+    with open(path, 'rb') as f:
+        if f.read(2) == GZIP_MAGIC:
+            f.seek(0)
+            with gzip.GzipFile(fileobj=f) as gz:
+                yield from iter_line_batches(gz, FILE_CHUNK_SIZE)
+            return
+        f.seek(0)
+        
+        # Pipes and other special files can't be mapped; empty files needn't be
+        info = os.fstat(f.fileno())
+        if not stat.S_ISREG(info.st_mode) or info.st_size == 0:
+            yield from iter_line_batches(f, FILE_CHUNK_SIZE)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield from iter_mmap_batches(mm)
+
+
+def detect_format(lines: List[bytes]) -> Optional[str]:
+    """Guess the logcat -v format of a capture from its first lines."""
+    probe = LogcatParser()
+    for data in lines[:100]:
+        probe.parse(decode_line(data))
+        if probe.format is not None:
+            return probe.format
+    return None
+
+
+def view_file(path: str, log_filter: LogFilter, show_json: bool,
+              log_format: Optional[str] = None, writer: Optional[OutputWriter] = None,
+              pipeline: Optional[RenderPipeline] = None, package: Optional[str] = None,
+              archive: Optional['ArchiveWriter'] = None, stats: Optional[TrafficStats] = None,
+              consumer: Optional[Callable[[List[Any]], None]] = None):
+    """
+    Display a saved logcat capture (see iter_file_batches) through the same
+    parse, filter and render path as a live stream, one batch at a time.
+    
+    Without a format, it is detected from the first lines. With a package,
+    only its processes are shown; as there is no device to ask, they are
+    found from the ActivityManager events in the capture, so it must
+    include the app's start (warn_untracked says so if it didn't). With an archive, records shown are recorded.
+    With a consumer, item batches go to it instead of being rendered.
+    """
+    if writer is None:
+        writer = OutputWriter()
+    printer = LogPrinter(writer, log_filter, show_json)
+    
+    batches = iter_file_batches(path)
+    first = next(batches, None)
+    if first is None:
+        return
+    if log_format is None:
+        log_format = detect_format(first)
+    
+    tracker = ProcessTracker(package, {}) if package else None
+    prefilter = make_byte_prefilter(log_format, log_filter, tracker) if log_format else None
+    items = read_records(itertools.chain([first], batches), LogcatParser(log_format), prefilter,
+                         log_filter, tracker, stats=stats, assembler=new_assembler())
+    if archive is not None:
+        items = archive.tap(items)
+    items = apply_output_stages(items, observe_only=consumer is not None)
+    
+    def render(items: List[Any]) -> List[tuple]:
+        return render_batch(items, show_json)
+    
+    if consumer is not None:
+        for batch in items:
+            consumer(batch)
+    elif pipeline is not None:
+        pipeline.run(items, render, printer.emit)
+    else:
+        for batch in items:
+            printer.emit(render(batch))
+    if consumer is None:
+        warn_untracked(tracker, writer)
+    writer.flush()
+
+
+def warn_untracked(tracker: Optional[ProcessTracker], writer: OutputWriter):
+    """
+    After a capture filtered by package: if it never showed the package's
+    start, none of the app's lines were shown, so say so and point at --pid.
+    """
+    if tracker is not None and not tracker.found:
+        writer.write_line(f"  {Colors.BRIGHT_YELLOW}⚠ No start of {tracker.package} in the capture, so none of its "
+                          f"lines were shown; use --pid PID to show them by pid{Colors.RESET}")
+
+
+# ============================================================================
+# Parallel Offline Rendering
+# ============================================================================
+
+class WatchEvent(LogRecord):
+    """An ActivityManager record returned by a render worker for the parent's ProcessTracker."""
+    __slots__ = ()
+
+
+class DeferredTracker:
+    """
+    Stand-in for ProcessTracker in render workers, which see one chunk
+    without the process state built up by earlier ones. Every pid passes;
+    ActivityManager records are handed back as WatchEvents and each record
+    carries its pid, so the parent can replay events in order and drop
+    records from other processes.
+    """
+    
+    WATCH_TAG = ProcessTracker.WATCH_TAG
+    pid_bytes = None
+    
+    class _AllPids:
+        def __contains__(self, pid: int) -> bool:
+            return True
+    
+    processes = _AllPids()
+    
+    def observe(self, parsed: LogRecord) -> Optional[WatchEvent]:
+        if parsed.tag == self.WATCH_TAG:
+            return parsed.copy(WatchEvent)
+        return None
+
+
+def iter_record_chunks(batches, log_format: Optional[str]):
+    """
+    Join line batches into chunks that can be parsed independently. For
+    "long", where a record spans several lines, each chunk is cut before a
+    record header so no record (or multi-line JSON message) is split. Line
+    formats need no care: every line parses on its own, and continuation
+    lines such as stack traces are colored by the parent in output order.
+    """
+    carry = []
+    for lines in batches:
+        if carry:
+            lines = carry + lines
+            carry = []
+        if log_format == 'long':
+            # Back up to the last header that follows a blank line
+            for i in range(len(lines) - 1, 0, -1):
+                if not lines[i - 1] and lines[i][:2] == b'[ ' and parse_long_header(decode_line(lines[i])):
+                    carry = lines[i:]
+                    lines = lines[:i]
+                    break
+            else:
+                carry = lines
+                continue
+        yield b'\n'.join(lines)
+    if carry:
+        yield b'\n'.join(carry)
+
+
+def _init_render_worker(colors: bool, cache_size: int, templates: bool, json_limits: JsonLimits,
+                        reassemble: int, storm: Dict[str, Any]):
+    """Process pool initializer: match the parent's color, cache, JSON, reassembly and storm settings."""
+    global RENDER_CACHE, JSON_LIMITS, REASSEMBLE_CHARS, STORM_SETTINGS
+    if not colors:
+        Colors.disable()
+    RENDER_CACHE = RenderCache(cache_size, templates=templates) if cache_size > 0 else None
+    JSON_LIMITS = json_limits
+    REASSEMBLE_CHARS = reassemble
+    STORM_SETTINGS = storm
+
+
+def _observed_items(items: List[Any]) -> List[tuple]:
+    """
+    (index, item) of the items the parent's HTTP and trace stages need:
+    requests, responses and trace lines, plus the record before an
+    unparsed exception line, whose tag and time the trace is counted under.
+    """
+    observed = []
+    last = None
+    for index, item in enumerate(items):
+        cls = item.__class__
+        if cls is LogRecord:
+            last = (index, item)
+            text = item.message
+            if text[:1] in ('→', '←'):
+                observed.append(last)
+                continue
+        elif cls is str:
+            text = item
+        else:
+            continue
+        if _TRACE_LINE_RE.match(text):
+            observed.append((index, item))
+        elif _EXCEPTION_HEADER_RE.match(text.lstrip()):
+            if cls is str and last is not None and (not observed or observed[-1] is not last):
+                observed.append(last)
+            observed.append((index, item))
+    return observed
+
+
+def render_chunk(data: bytes, log_format: Optional[str], log_filter: LogFilter,
+                 show_json: bool, follow: bool, observe: bool = False) -> tuple:
+    """
+    Render worker: parse, filter and format one chunk. Returns (rendered,
+    observed, count, indexes): rendered is render_batch() pairs or, with
+    follow (a package to track), one (level, text, pid) triple or
+    (WatchEvent, record) pair per item, for the parent's ProcessTracker.
+    With observe, observed holds (index, item) for the HTTP and trace
+    lines among the count items (see _observed_items), which the parent
+    feeds to its own HTTP correlator and trace grouper, as pairs and traces
+    can span chunks, and indexes holds the item index of each rendered
+    pair (None for a storm marker), so the parent can replace a repeated
+    trace with its reference.
+    
+    Storm control runs per chunk, and not at all with follow, as records
+    of other processes are only dropped later in the parent.
+    """
+    tracker = DeferredTracker() if follow else None
+    prefilter = make_byte_prefilter(log_format, log_filter, tracker) if log_format else None
+    items = []
+    for batch in read_records([data.split(b'\n')], LogcatParser(log_format), prefilter,
+                              log_filter, tracker, assembler=new_assembler()):
+        items.extend(batch)
+    observed = _observed_items(items) if observe else []
+    count = len(items)
+    indexes = None
+    guard = None if follow else new_storm_guard()
+    if guard is not None:
+        at = {id(item): index for index, item in enumerate(items)} if observe else None
+        items = [item for batch in guard.apply([items]) for item in batch]
+        if observe:
+            indexes = [at.get(id(item)) for item in items]
+    elif observe and not follow:
+        indexes = list(range(count))
+    if not follow:
+        return render_batch(items, show_json), observed, count, indexes
+    
+    rendered = []
+    for item in items:
+        cls = item.__class__
+        if cls is WatchEvent:
+            rendered.append((WatchEvent, item))
+        elif cls is str:
+            rendered.append((None, item, None))
+        else:
+            rendered.append((item.level, format_log_line(item, show_json), item.pid))
+    return rendered, observed, count, indexes
+
+
+def view_file_parallel(path: str, jobs: int, log_filter: LogFilter, show_json: bool,
+                       log_format: Optional[str] = None, writer: Optional[OutputWriter] = None,
+                       package: Optional[str] = None):
+    """
+    view_file() on a pool of processes. The capture is read in chunks
+    (see iter_record_chunks) that workers parse, filter and format, and
+    results are printed in the original order. At most two chunks per
+    worker are in flight, so memory stays bounded.
+    
+    The HTTP report and exception summary are built here from the lines
+    workers hand back, so they match view_file(). Output is held from the
+    start of a trace until the trace grouper has seen its end, so a repeat
+    can be printed as its one-line reference.
+    """
+    if writer is None:
+        writer = OutputWriter()
+    printer = LogPrinter(writer, log_filter, show_json)
+    tracker = ProcessTracker(package, {}) if package else None
+    
+    batches = iter_file_batches(path)
+    first = next(batches, None)
+    if first is None:
+        return
+    if log_format is None:
+        log_format = detect_format(first)
+    
+    grouper = new_trace_grouper()
+    if grouper is not None:
+        grouper.repeats = []
+    stages = [stage for stage in (new_http_correlator(), grouper) if stage is not None]
+    # Items passed so far, and the position of the last one the stages got
+    position = [0, -1]
+    gap = Notice('')
+    # (position, level, text) entries not printed yet; notices and storm markers have no position
+    held = deque()
+    # Position of each item the stages were given that the grouper still holds
+    positions = {}
+    
+    def observe(kept: List[tuple]):
+        # A gap stands in for the items between two observed ones, so it ends a trace there
+        items = []
+        for at, item in kept:
+            if at != position[1] + 1:
+                items.append(gap)
+            items.append(item)
+            position[1] = at
+        if grouper is not None:
+            positions.update((id(item), at) for at, item in kept)
+        for stage in stages:
+            stage.process(items)
+    
+    def release():
+        # Replace repeated traces by their reference, then print up to the trace still being assembled
+        pending = None
+        if grouper is not None:
+            if grouper.repeats:
+                references = {}
+                for trace, reference in grouper.repeats:
+                    entry = (positions[id(trace[0])],) + render_batch([reference], show_json)[0]
+                    references.update((positions[id(item)], entry) for item in trace)
+                grouper.repeats.clear()
+                entries = []
+                placed = set()
+                for entry in held:
+                    reference = references.get(entry[0])
+                    if reference is None:
+                        entries.append(entry)
+                    elif id(reference) not in placed:
+                        # The trace's first line still shown takes its reference; the rest are dropped
+                        placed.add(id(reference))
+                        entries.append(reference)
+                held.clear()
+                held.extend(entries)
+            kept = {id(item): positions[id(item)] for item in grouper.held}
+            positions.clear()
+            positions.update(kept)
+            if grouper.held:
+                pending = positions[id(grouper.held[0])]
+        out = []
+        while held and (pending is None or held[0][0] is None or held[0][0] < pending):
+            out.append(held.popleft()[1:])
+        printer.emit(out)
+    
+    def emit(result: tuple):
+        rendered, observed, count, indexes = result
+        base = position[0]
+        if tracker is None:
+            if indexes is None:
+                held.extend((None,) + pair for pair in rendered)
+            else:
+                held.extend((None if index is None else base + index,) + pair
+                            for pair, index in zip(rendered, indexes))
+            kept = [(base + index, item) for index, item in observed]
+            position[0] += count
+        else:
+            observed = dict(observed)
+            kept = []
+            for index, item in enumerate(rendered):
+                if item[0] is WatchEvent:
+                    notice = tracker.observe(item[1])
+                    if notice is not None:
+                        held.append((None, Notice, notice))
+                    continue
+                if item[0] is not None and item[2] not in tracker.processes:
+                    continue
+                held.append((position[0], item[0], item[1]))
+                if index in observed:
+                    kept.append((position[0], observed[index]))
+                position[0] += 1
+        if kept:
+            observe(kept)
+        release()
+    
+    settings = (bool(Colors.RESET), RENDER_CACHE.lines.maxsize if RENDER_CACHE else 0,
+                RENDER_CACHE is not None and RENDER_CACHE.templates is not None, JSON_LIMITS,
+                REASSEMBLE_CHARS, STORM_SETTINGS)
+    with concurrent.futures.ProcessPoolExecutor(jobs, initializer=_init_render_worker, initargs=settings) as pool:
+        pending = deque()
+        for chunk in iter_record_chunks(itertools.chain([first], batches), log_format):
+            pending.append(pool.submit(render_chunk, chunk, log_format, log_filter, show_json,
+                                       tracker is not None, bool(stages)))
+            if len(pending) >= jobs * 2:
+                emit(pending.popleft().result())
+        while pending:
+            emit(pending.popleft().result())
+    for stage in stages:
+        stage.process([])
+    release()
+    warn_untracked(tracker, writer)
+    writer.flush()
+
+
+# ============================================================================
+# Session Archive
+# ============================================================================
+
+ARCHIVE_MAGIC = b'LVA1'
+ARCHIVE_BLOCK = struct.Struct('>4sII')     # b'BLK1', summary length, data length
+ARCHIVE_TRAILER = struct.Struct('>QI4s')   # index offset, index length, b'LVAX'
+
+
+class ArchiveWriter:
+    """
+    Records a session to a block-compressed archive.
+    
+    Records are stored in blocks of up to BLOCK_RECORDS, each compressed on
+    its own and preceded by a summary: earliest and latest timestamp, and the
+    levels, tags and pids it contains. The summaries form a sparse index,
+    also written at the end of the file on close so queries can skip
+    blocks without reading them. Unparsed lines (stack traces) are kept
+    with the record before them.
+    """
+    
+    BLOCK_RECORDS = 1024
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self._file = open(path, 'wb')
+        self._file.write(ARCHIVE_MAGIC)
+        self._index = []
+        self._block = []
+        self._lock = threading.Lock()
+    
+    def add(self, item: Any):
+        """Add a parsed record, or an unparsed line that belongs to the last record."""
+        with self._lock:
+            if item.__class__ is str:
+                if self._block:
+                    self._block[-1][6].append(item)
+                return
+            if item.__class__ is Notice:
+                return
+            if len(self._block) >= self.BLOCK_RECORDS:
+                self._flush_block()
+            # pid and tid are stored as text, as archives always have
+            self._block.append([item.timestamp, item.level, item.tag, str(item.pid),
+                                str(item.tid), item.message, []])
+            self.records += 1
+    
+    def tap(self, batches):
+        """Pass item batches (from read_records) through, recording them in order."""
+        for items in batches:
+            for item in items:
+                self.add(item)
+            yield items
+    
+    def _flush_block(self):
+        block = self._block
+        if not block:
+            return
+        # Buffers interleave, so timestamps are only roughly in order
+        timestamps = sorted({r[0] for r in block}, key=timestamp_key)
+        summary = {
+            'n': len(block),
+            't0': timestamps[0],
+            't1': timestamps[-1],
+            'levels': ''.join(sorted({r[1] for r in block})),
+            'tags': sorted({r[2] for r in block}),
+            'pids': sorted({r[3] for r in block}),
+        }
+        head = json.dumps(summary, separators=(',', ':')).encode('utf-8')
+        data = zlib.compress(json.dumps(block, separators=(',', ':')).encode('utf-8'))
+        offset = self._file.tell()
+        self._file.write(ARCHIVE_BLOCK.pack(b'BLK1', len(head), len(data)))
+        self._file.write(head)
+        self._file.write(data)
+        self._index.append([offset, summary])
+        self._block = []
+    
+    def close(self):
+        """Write the last block and the index."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_block()
+            index = zlib.compress(json.dumps(self._index, separators=(',', ':')).encode('utf-8'))
+            offset = self._file.tell()
+            self._file.write(index)
+            self._file.write(ARCHIVE_TRAILER.pack(offset, len(index), b'LVAX'))
+            self._file.close()
+
+
+class ArchiveReader:
+    """Queries an archive written by ArchiveWriter, reading only blocks that can match."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        if self._file.read(4) != ARCHIVE_MAGIC:
+            raise ValueError(f"Not a logview archive: {path}")
+        self.index = self._read_index()
+        self.blocks_read = 0
+    
+    def _read_index(self) -> List[list]:
+        f = self._file
+        size = os.fstat(f.fileno()).st_size
+        if size >= 4 + ARCHIVE_TRAILER.size:
+            f.seek(size - ARCHIVE_TRAILER.size)
+            offset, length, magic = ARCHIVE_TRAILER.unpack(f.read(ARCHIVE_TRAILER.size))
+            if magic == b'LVAX':
+                f.seek(offset)
+                return json.loads(zlib.decompress(f.read(length)))
+        
+        # No index (the session was killed): rebuild it from the block headers
+        index = []
+        offset = 4
+        while offset + ARCHIVE_BLOCK.size <= size:
+            f.seek(offset)
+            magic, head_len, data_len = ARCHIVE_BLOCK.unpack(f.read(ARCHIVE_BLOCK.size))
+            if magic != b'BLK1' or offset + ARCHIVE_BLOCK.size + head_len + data_len > size:
+                break
+            index.append([offset, json.loads(f.read(head_len))])
+            offset += ARCHIVE_BLOCK.size + head_len + data_len
+        return index
+    
+    def _read_block(self, offset: int) -> List[list]:
+        f = self._file
+        f.seek(offset)
+        _, head_len, data_len = ARCHIVE_BLOCK.unpack(f.read(ARCHIVE_BLOCK.size))
+        f.seek(head_len, os.SEEK_CUR)
+        self.blocks_read += 1
+        return json.loads(zlib.decompress(f.read(data_len)))
+    
+    def query(self, log_filter: LogFilter):
+        """
+        Yield item lists (records and their unparsed lines, as read_records()
+        does) for records matching the filter. Blocks whose summary rules
+        out the filter's level, tags, pids or time window are never read.
+        """
+        window = log_filter.window
+        tags = log_filter.tags
+        terms = [t.lower() for t in tags] if tags and not log_filter.exact_tags else None
+        pids = {str(int(pid)) for pid in log_filter.pids if pid.isdigit()} if log_filter.pids else None
+        
+        for offset, summary in self.index:
+            if window is not None and not window.overlaps(summary['t0'], summary['t1']):
+                continue
+            if max(LogLevel.from_string(level) for level in summary['levels']) < log_filter.min_level:
+                continue
+            if terms and not any(t in tag.lower() for tag in summary['tags'] for t in terms):
+                continue
+            if tags and log_filter.exact_tags and set(tags).isdisjoint(summary['tags']):
+                continue
+            if pids and pids.isdisjoint(summary['pids']):
+                continue
+            
+            items = []
+            for timestamp, level, tag, pid, tid, message, lines in self._read_block(offset):
+                parsed = LogRecord(timestamp, level, tag, _id_number(pid), _id_number(tid), message)
+                if log_filter.matches(parsed):
+                    items.append(parsed)
+                    items.extend(lines)
+            if items:
+                yield items
+    
+    def close(self):
+        self._file.close()
+
+
+def replay_archive(path: str, log_filter: LogFilter, show_json: bool,
+                   writer: Optional[OutputWriter] = None) -> ArchiveReader:
+    """Print the records of an archive that match the filter with the normal renderer."""
+    if writer is None:
+        writer = OutputWriter()
+    printer = LogPrinter(writer, log_filter, show_json)
+    reader = ArchiveReader(path)
+    items = apply_output_stages(reader.query(log_filter))
+    try:
+        for batch in items:
+            printer.emit(render_batch(batch, show_json))
+    finally:
+        reader.close()
+    writer.flush()
+    return reader
 
 
 # ============================================================================
-# ADB Functions
+# Interactive View
 # ============================================================================
 
-def run_adb(args: List[str], **kwargs) -> subprocess.CompletedProcess:
-    """Run an ADB command."""
-    if not ADB_PATH:
-        raise FileNotFoundError("adb not found")
-    return subprocess.run([ADB_PATH] + args, **kwargs)
+class RingBuffer:
+    """The last capacity items appended, addressed by sequence number."""
+    
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._slots = [None] * self.capacity
+        self.first_seq = 0
+        self.next_seq = 0
+    
+    def __len__(self) -> int:
+        return self.next_seq - self.first_seq
+    
+    def append(self, item: Any) -> int:
+        seq = self.next_seq
+        self._slots[seq % self.capacity] = item
+        self.next_seq += 1
+        if self.next_seq - self.first_seq > self.capacity:
+            self.first_seq += 1
+        return seq
+    
+    def get(self, seq: int) -> Any:
+        """The item with this sequence number, or None once it has been overwritten."""
+        if self.first_seq <= seq < self.next_seq:
+            return self._slots[seq % self.capacity]
+        return None
+    
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self.first_seq = self.next_seq
+    
+    def seqs(self) -> range:
+        return range(self.first_seq, self.next_seq)
 
 
-def run_adb_popen(args: List[str], **kwargs) -> subprocess.Popen:
-    """Run an ADB command with Popen."""
-    if not ADB_PATH:
-        raise FileNotFoundError("adb not found")
-    return subprocess.Popen([ADB_PATH] + args, **kwargs)
+_SGR_RE = re.compile(r'\033\[([0-9;]*)m')
 
 
-def get_pid(package: str) -> Optional[str]:
-    """Get the PID for a package, or None if not running."""
-    try:
-        result = run_adb(
-            ['shell', 'pidof', '-s', package],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        pid = result.stdout.strip()
-        return pid if pid else None
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
-        return None
+class CursesPalette:
+    """Turns text with the ANSI codes of Colors into (text, curses attribute) runs."""
+    
+    def __init__(self):
+        self.colors = curses.has_colors()
+        if self.colors:
+            curses.use_default_colors()
+        self._pairs: Dict[int, int] = {}
+    
+    def _color(self, fg: int) -> int:
+        if not self.colors or fg < 0:
+            return 0
+        bold = 0
+        if fg >= 8 and curses.COLORS < 16:
+            fg -= 8
+            bold = curses.A_BOLD
+        pair = self._pairs.get(fg)
+        if pair is None:
+            pair = len(self._pairs) + 1
+            if pair >= curses.COLOR_PAIRS:
+                return bold
+            curses.init_pair(pair, fg, -1)
+            self._pairs[fg] = pair
+        return curses.color_pair(pair) | bold
+    
+    def runs(self, text: str) -> List[tuple]:
+        runs = []
+        fg, flags, pos = -1, 0, 0
+        for match in _SGR_RE.finditer(text):
+            if match.start() > pos:
+                runs.append((text[pos:match.start()], self._color(fg) | flags))
+            pos = match.end()
+            for code in map(int, filter(None, match.group(1).split(';'))):
+                if code == 0:
+                    fg, flags = -1, 0
+                elif code == 1:
+                    flags |= curses.A_BOLD
+                elif code == 2:
+                    flags |= curses.A_DIM
+                elif code == 4:
+                    flags |= curses.A_UNDERLINE
+                elif 30 <= code <= 37:
+                    fg = code - 30
+                elif 90 <= code <= 97:
+                    fg = code - 90 + 8
+                elif code == 39:
+                    fg = -1
+        if pos < len(text):
+            runs.append((text[pos:], self._color(fg) | flags))
+        return runs
 
 
-def clear_logcat():
-    """Clear the logcat buffer."""
-    try:
-        run_adb(['logcat', '-c'], timeout=5)
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
+class TuiWriter:
+    """Writer stand-in that puts lines into the interactive view as notices."""
+    
+    # What RunStats reads from an OutputWriter
+    lines = 0
+    bytes = 0
+    write_seconds = 0.0
+    max_buffered = 0
+    
+    def __init__(self, app: 'TuiApp'):
+        self.app = app
+    
+    def write_line(self, text: str, urgent: bool = False):
+        self.app.push([Notice(line) for line in text.split('\n')])
+    
+    def set_status(self, slot: str, text: Optional[str]):
+        self.app.set_status(slot, text)
+    
+    def flush(self):
+        pass
+    
+    def close(self):
         pass
 
 
-def check_adb() -> bool:
-    """Check if ADB is available and a device is connected."""
-    if not ADB_PATH:
-        return False
-    try:
-        result = run_adb(
-            ['devices'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        lines = result.stdout.strip().split('\n')
-        devices = [l for l in lines[1:] if l.strip() and 'device' in l]
-        return len(devices) > 0
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError, FileNotFoundError):
-        return False
-
-
-# ============================================================================
-# Main Logic
-# ============================================================================
-
-def passes_filters(parsed: Dict[str, str], min_level: int, tag_filter: Optional[List[str]]) -> bool:
-    """Check if a parsed log line passes the filters."""
-    # Level filter
-    log_level = LogLevel.from_string(parsed['level'])
-    if log_level < min_level:
-        return False
+class TuiConsole:
+    """sys.stdout stand-in while curses owns the terminal; print()ed lines become notices."""
     
-    # Tag filter
-    if tag_filter:
-        tag_lower = parsed['tag'].lower()
-        if not any(t.lower() in tag_lower for t in tag_filter):
-            return False
+    def __init__(self, app: 'TuiApp'):
+        self.app = app
+        self._partial = ''
     
-    return True
+    def write(self, text: str) -> int:
+        lines = re.split(r'[\r\n]', self._partial + text)
+        self._partial = lines.pop()
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            self.app.push([Notice(line) for line in lines])
+        return len(text)
+    
+    def flush(self):
+        pass
 
 
-def stream_logs(package: str, min_level: int, tag_filter: Optional[List[str]], show_json: bool):
-    """Stream and display logs, reconnecting if the app restarts."""
-    last_level = None
-    in_error_block = False
+class TuiApp:
+    """
+    Full-screen view over a RingBuffer of the items a stream produced.
     
-    while True:
-        # Get PID
-        pid = get_pid(package)
-        
-        if not pid:
-            print_waiting_message(package)
-            time.sleep(1)
-            continue
+    The reader thread push()es item batches; the screen thread only ever
+    renders the rows in view, colorizing them when they scroll in. The
+    level, tag and search filters select rows from the buffer, so
+    changing them re-filters what was kept instead of reconnecting.
+    Unparsed lines go with the record before them.
+    """
+    
+    HELP = [
+        '↑/k ↓/j  move        PgUp/PgDn  page       g/Home G/End  top, bottom',
+        'f  follow new lines on/off     Enter  show the whole record',
+        'v d i w e  minimum level       t  tags (comma-separated)     /  search',
+        'c  clear the buffer            q  quit                       ?  this help',
+    ]
+    
+    def __init__(self, capacity: int, min_level: int = LogLevel.VERBOSE, tags: Optional[List[str]] = None,
+                 exact_tags: bool = False):
+        self.ring = RingBuffer(capacity)
+        self.min_level = min_level
+        self.tags = tags
+        self.exact_tags = exact_tags
+        self.search = ''
+        self.view_filter = LogFilter(min_level, tags, exact_tags)
+        # Sequence numbers of the rows shown, oldest first; rows before view_start were evicted
+        self.view: List[int] = []
+        self.view_start = 0
+        self.top = 0
+        self.cursor = 0
+        self.follow = True
+        self.ended = False
+        self.dirty = True
+        self._last_shown = True
+        self._statuses: Dict[str, str] = {}
+        self._rendered: Dict[int, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self.palette = None
+    
+    # -- Reader side --
+    
+    def push(self, items: List[Any]):
+        """Add a batch of items (from any thread)."""
+        if not items:
+            return
+        with self._lock:
+            for item in items:
+                seq = self.ring.append(item)
+                if self._shows(item):
+                    self.view.append(seq)
+            self._evict()
+            self.dirty = True
+    
+    def set_status(self, slot: str, text: Optional[str]):
+        with self._lock:
+            if text is None:
+                self._statuses.pop(slot, None)
+            else:
+                self._statuses[slot] = ANSI_ESCAPE_RE.sub('', text)
+            self.dirty = True
+    
+    def _shows(self, item: Any) -> bool:
+        cls = item.__class__
+        if cls is str:
+            return self._last_shown
+        if cls is Notice:
+            return True
+        shown = self.view_filter.matches(item) and (
+            not self.search or self.search in item.message.lower() or self.search in item.tag.lower())
+        self._last_shown = shown
+        return shown
+    
+    def _evict(self):
+        first, view = self.ring.first_seq, self.view
+        start = self.view_start
+        while start < len(view) and view[start] < first:
+            start += 1
+        gone = start - self.view_start
+        if gone:
+            self.view_start = start
+            self.top = max(0, self.top - gone)
+            self.cursor = max(0, self.cursor - gone)
+        if start > 4096 and start * 2 > len(view):
+            del view[:start]
+            self.view_start = 0
+    
+    # -- Screen side --
+    
+    def rows(self) -> int:
+        return len(self.view) - self.view_start
+    
+    def refilter(self):
+        """Rebuild the rows from the buffer after a filter change, keeping the cursor's place."""
+        with self._lock:
+            rows = self.rows()
+            anchor = self.view[self.view_start + self.cursor] if rows else 0
+            self.view_filter = LogFilter(self.min_level, self.tags, self.exact_tags)
+            self._last_shown = True
+            self.view = [seq for seq in self.ring.seqs() if self._shows(self.ring.get(seq))]
+            self.view_start = 0
+            self.cursor = min(bisect.bisect_left(self.view, anchor), max(0, len(self.view) - 1))
+            self.top = max(0, self.cursor - 5)
+            self.dirty = True
+    
+    def clear(self):
+        with self._lock:
+            self.ring.clear()
+            self.view, self.view_start, self.top, self.cursor = [], 0, 0, 0
+            self.dirty = True
+    
+    def _row_text(self, item: Any) -> str:
+        cls = item.__class__
+        if cls is LogRecord:
+            timestamp = item.timestamp[-12:]
+            text = f"{Colors.BRIGHT_BLACK}{timestamp}{Colors.RESET} {format_log_line(item, False)}"
+        elif cls is str:
+            text = STACK_TRACE_HIGHLIGHTER.highlight(item)
+        else:
+            text = item
+        return text.replace('\n', ' ').expandtabs(4)
+    
+    def draw(self, screen):
+        height, width = screen.getmaxyx()
+        height -= 1
+        with self._lock:
+            rows = self.rows()
+            if self.follow:
+                self.cursor = max(0, rows - 1)
+            self.cursor = min(self.cursor, max(0, rows - 1))
+            if self.cursor < self.top:
+                self.top = self.cursor
+            elif self.cursor >= self.top + height:
+                self.top = self.cursor - height + 1
+            visible = self.view[self.view_start + self.top:self.view_start + min(rows, self.top + height)]
+            items = [(seq, self.ring.get(seq)) for seq in visible]
+            status = list(self._statuses.values())
+            buffered, evicted = len(self.ring), self.ring.first_seq
+            self.dirty = False
         
-        # Clear waiting message
-        print(" " * 60, end='\r')
+        # Colorize only what is on screen; rows that scrolled away are dropped
+        rendered = {}
+        for seq, item in items:
+            runs = self._rendered.get(seq)
+            if runs is None:
+                runs = self.palette.runs(self._row_text(item))
+            rendered[seq] = runs
+        self._rendered = rendered
         
-        # Start logcat
-        process = run_adb_popen(
-            ['logcat', '-v', 'time', f'--pid={pid}'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        screen.erase()
+        for y, (seq, _) in enumerate(items):
+            selected = self.top + y == self.cursor and not self.follow
+            x = 0
+            for text, attr in rendered[seq]:
+                if x >= width - 1:
+                    break
+                try:
+                    screen.addnstr(y, x, text, width - 1 - x, attr | (curses.A_REVERSE if selected else 0))
+                except curses.error:
+                    pass
+                x += len(text)
         
+        mode = f'PAUSED +{rows - 1 - self.cursor:,} below' if not self.follow else 'END' if self.ended else 'LIVE'
+        parts = [mode, f"{rows:,} rows ({buffered:,} kept, {evicted:,} dropped)", f"≥{_LEVEL_LETTERS[self.min_level]}"]
+        if self.tags:
+            parts.append(f"tags {','.join(self.tags)}")
+        if self.search:
+            parts.append(f"/{self.search}")
+        parts += status
+        parts.append('? help')
+        bar = ' · '.join(parts)
         try:
-            stdout = process.stdout
-            if stdout is None:
-                time.sleep(1)
-                continue
-                
-            for line in stdout:
-                # Check if process has ended (app crashed/stopped)
-                if process.poll() is not None:
-                    break
-                
-                line = line.rstrip()
-                if not line:
-                    continue
-                
-                # Parse the line
-                parsed = parse_logcat_line(line)
-                if not parsed:
-                    # Print unparseable lines (like stack traces) with color based on last level
-                    if last_level in ('E', 'F', 'A'):
-                        # Colorize stack trace elements
-                        colored_line = line
-                        # Highlight "at " prefix
-                        colored_line = re.sub(r'^(\s*at\s+)', f'{Colors.BRIGHT_BLACK}\\1{Colors.RESET}', colored_line)
-                        # Highlight class.method
-                        colored_line = re.sub(r'([a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*)\(', f'{Colors.BRIGHT_RED}\\1{Colors.RESET}(', colored_line)
-                        # Highlight file:line
-                        colored_line = re.sub(r'\(([^:]+):(\d+)\)', f'({Colors.CYAN}\\1{Colors.RESET}:{Colors.BRIGHT_YELLOW}\\2{Colors.RESET})', colored_line)
-                        # Highlight Caused by:
-                        colored_line = re.sub(r'(Caused by:)', f'{Colors.BOLD}{Colors.BRIGHT_RED}\\1{Colors.RESET}', colored_line)
-                        # Highlight exception names
-                        colored_line = re.sub(r'\b([A-Z][a-zA-Z]*(?:Exception|Error))\b', f'{Colors.BOLD}{Colors.BRIGHT_RED}\\1{Colors.RESET}', colored_line)
-                        print(colored_line)
-                    elif last_level == 'W':
-                        print(f"{Colors.YELLOW}{line}{Colors.RESET}")
-                    else:
-                        print(f"{Colors.BRIGHT_BLACK}{line}{Colors.RESET}")
-                    continue
-                
-                # Apply filters
-                if not passes_filters(parsed, min_level, tag_filter):
-                    continue
-                
-                current_level = parsed['level'].upper()
-                is_error = current_level in ('E', 'F', 'A')
-                
-                # Close error block before printing non-error line
-                if in_error_block and not is_error:
-                    print(format_separator('E'))
-                    in_error_block = False
-                
-                # Open error block before first error line
-                if is_error and not in_error_block:
-                    print(format_separator(current_level))
-                    in_error_block = True
-                
-                # Print the formatted line
-                print(format_log_line(parsed, show_json))
-                sys.stdout.flush()
-                
-                last_level = current_level
-                
-        except Exception as e:
+            screen.addnstr(height, 0, bar.ljust(width - 1), width - 1, curses.A_REVERSE)
+        except curses.error:
             pass
+        screen.refresh()
+    
+    def prompt(self, screen, label: str, value: str) -> Optional[str]:
+        """Edit a line of text on the status bar; None if cancelled with Esc."""
+        height, width = screen.getmaxyx()
+        screen.timeout(-1)
+        try:
+            while True:
+                line = f"{label}{value}"
+                screen.addnstr(height - 1, 0, line.ljust(width - 1), width - 1, curses.A_REVERSE)
+                screen.move(height - 1, min(len(line), width - 2))
+                screen.refresh()
+                key = screen.get_wch()
+                if key in ('\n', '\r', curses.KEY_ENTER):
+                    return value
+                if key == '\x1b':
+                    return None
+                if key in ('\x7f', '\b', curses.KEY_BACKSPACE):
+                    value = value[:-1]
+                elif isinstance(key, str) and key.isprintable():
+                    value += key
         finally:
-            process.terminate()
-            try:
-                process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                process.kill()
-        
-        # App probably restarted, try to reconnect
-        print_reconnect_message(package)
-        time.sleep(1)
+            screen.timeout(50)
+    
+    def pager(self, screen, lines: List[str]):
+        """Show lines full screen until q, Esc or Enter."""
+        top = 0
+        screen.timeout(-1)
+        try:
+            while True:
+                height, width = screen.getmaxyx()
+                screen.erase()
+                for y, line in enumerate(lines[top:top + height - 1]):
+                    x = 0
+                    for text, attr in self.palette.runs(line.expandtabs(4)):
+                        if x >= width - 1:
+                            break
+                        try:
+                            screen.addnstr(y, x, text, width - 1 - x, attr)
+                        except curses.error:
+                            pass
+                        x += len(text)
+                try:
+                    screen.addnstr(height - 1, 0, '↑↓ scroll · q close'.ljust(width - 1), width - 1, curses.A_REVERSE)
+                except curses.error:
+                    pass
+                screen.refresh()
+                key = screen.getch()
+                if key in (ord('q'), 27, 10, 13, curses.KEY_ENTER):
+                    return
+                if key in (curses.KEY_DOWN, ord('j')):
+                    top = min(top + 1, max(0, len(lines) - height + 1))
+                elif key in (curses.KEY_UP, ord('k')):
+                    top = max(0, top - 1)
+                elif key in (curses.KEY_NPAGE, ord(' ')):
+                    top = min(top + height - 1, max(0, len(lines) - height + 1))
+                elif key == curses.KEY_PPAGE:
+                    top = max(0, top - height + 1)
+        finally:
+            screen.timeout(50)
+    
+    def details(self, screen):
+        """Show the selected row as the normal output would, JSON body included."""
+        with self._lock:
+            rows = self.rows()
+            item = self.ring.get(self.view[self.view_start + self.cursor]) if rows else None
+        if item is None:
+            return
+        if item.__class__ is LogRecord:
+            lines = [f"{Colors.BOLD}{item.timestamp}  pid {item.pid}  tid {item.tid}  "
+                     f"{item.level}/{item.tag}{Colors.RESET}", '']
+            lines += format_log_line(item, True).split('\n')
+        else:
+            lines = [item]
+        self.pager(screen, lines)
+    
+    def run(self, screen):
+        """Handle keys and redraw until q."""
+        curses.curs_set(0)
+        self.palette = CursesPalette()
+        screen.timeout(50)
+        levels = {ord(k): LogLevel.from_string(k) for k in 'vdiwe'}
+        while True:
+            if self.dirty:
+                self.draw(screen)
+            key = screen.getch()
+            if key == -1:
+                continue
+            height = screen.getmaxyx()[0] - 1
+            self.dirty = True
+            if key in (ord('q'), ord('Q')):
+                return
+            elif key in (curses.KEY_UP, ord('k')):
+                self.follow = False
+                self.cursor = max(0, self.cursor - 1)
+            elif key in (curses.KEY_DOWN, ord('j')):
+                self.cursor += 1
+            elif key == curses.KEY_PPAGE:
+                self.follow = False
+                self.cursor = max(0, self.cursor - height)
+            elif key in (curses.KEY_NPAGE, ord(' ')):
+                self.cursor += height
+            elif key in (curses.KEY_HOME, ord('g')):
+                self.follow = False
+                self.cursor = 0
+            elif key in (curses.KEY_END, ord('G')):
+                self.follow = True
+            elif key == ord('f'):
+                self.follow = not self.follow
+            elif key in levels:
+                self.min_level = levels[key]
+                self.refilter()
+            elif key == ord('t'):
+                value = self.prompt(screen, 'tags: ', ','.join(self.tags or []))
+                if value is not None:
+                    self.tags = [t.strip() for t in value.split(',') if t.strip()] or None
+                    self.refilter()
+            elif key == ord('/'):
+                value = self.prompt(screen, '/', self.search)
+                if value is not None:
+                    self.search = value.lower()
+                    self.refilter()
+            elif key == ord('c'):
+                self.clear()
+            elif key in (10, 13, curses.KEY_ENTER):
+                self.details(screen)
+            elif key == ord('?'):
+                self.pager(screen, self.HELP)
+
+
+def run_tui(app: TuiApp, source: Callable[[], None]):
+    """
+    Run source (which push()es into app) on a thread while app runs the
+    screen. print() output goes into the view until the screen closes.
+    """
+    def read():
+        try:
+            source()
+        except Exception as e:
+            app.push([Notice(f"{Colors.BRIGHT_RED}⚠ {type(e).__name__}: {e}{Colors.RESET}")])
+        app.ended = True
+        app.dirty = True
+    
+    stdout = sys.stdout
+    sys.stdout = TuiConsole(app)
+    try:
+        threading.Thread(target=read, name='logview-source', daemon=True).start()
+        curses.wrapper(app.run)
+    finally:
+        sys.stdout = stdout
 
 
 def main():
@@ -827,12 +5482,23 @@ Examples:
   %(prog)s com.hooked.hooked --level ERROR
   %(prog)s com.hooked.hooked --tag CatchApiService,AuthApiService
   %(prog)s com.hooked.hooked --level WARNING --tag Api --clear
+  %(prog)s --input logcat.txt.gz --level ERROR
+  %(prog)s com.hooked.hooked --filter 'tag contains Api and json.status >= 500'
+  adb logcat -d | %(prog)s com.hooked.hooked --input -
         """
     )
     
     parser.add_argument(
         'package',
-        help='Android package name (e.g., com.hooked.hooked)'
+        nargs='?',
+        help='Android package name (e.g., com.hooked.hooked); optional with --input'
+    )
+    parser.add_argument(
+        '--input',
+        metavar='FILE',
+        help='Read a saved logcat capture instead of a device: a plain or gzip file, '
+             'or - for stdin. With a package, its processes are found from the '
+             'ActivityManager events in the capture'
     )
     parser.add_argument(
         '--level',
@@ -843,6 +5509,30 @@ Examples:
         '--tag',
         help='Filter by tag(s), comma-separated (e.g., CatchApiService,AuthApiService)'
     )
+    parser.add_argument(
+        '--exact-tags',
+        action='store_true',
+        help='Match --tag names exactly instead of as substrings, so the device can filter them'
+    )
+    parser.add_argument(
+        '--grep',
+        metavar='REGEX',
+        help='Only show messages matching this regular expression (run on the device with '
+             'logcat -e when following by pid on Android 7+)'
+    )
+    parser.add_argument(
+        '--filter',
+        metavar='EXPR',
+        help='Only records matching this expression, e.g. '
+             '\'tag in {CatchApiService, AuthApiService} and json.status >= 500\'. '
+             'Fields: level, tag, pid, tid, message, time, json.<path>; operators: '
+             '== != < <= > >= ~ !~ (regex) contains, in {...}, not in {...}; and, or, not, ( )'
+    )
+    parser.add_argument(
+        '--filter-stats',
+        action='store_true',
+        help='Print the device filter, bytes received and lines dropped on the host on exit'
+    )
     parser.add_argument(
         '--clear',
         action='store_true',
@@ -853,26 +5543,270 @@ Examples:
         action='store_true',
         help='Disable JSON pretty-printing'
     )
+    parser.add_argument(
+        '--json-depth',
+        type=int,
+        default=8,
+        help='Collapse JSON nested deeper than this to "[… N items]"; 0 for no limit (default: 8)'
+    )
+    parser.add_argument(
+        '--json-items',
+        type=int,
+        default=50,
+        help='Show at most this many entries of a JSON array or object; 0 for no limit (default: 50)'
+    )
+    parser.add_argument(
+        '--json-max-bytes',
+        type=int,
+        default=64 * 1024,
+        help='Stop rendering a JSON body after about this many bytes of output; '
+             '0 for no limit (default: 65536)'
+    )
+    parser.add_argument(
+        '--json-drop-over',
+        type=int,
+        default=0,
+        metavar='BYTES',
+        help='Don\'t parse or show JSON bodies larger than this, just their size (default: show all)'
+    )
+    parser.add_argument(
+        '--reassemble',
+        type=int,
+        default=3000,
+        metavar='CHARS',
+        help='Join back-to-back records from one thread and tag whose messages are at least CHARS '
+             'long (a long message a logger split at the ~4 KB limit) into one; 0 disables (default: 3000)'
+    )
+    parser.add_argument(
+        '--no-collapse',
+        action='store_true',
+        help='Show every repeat of a line instead of collapsing consecutive duplicates into "(repeated ×N)"'
+    )
+    parser.add_argument(
+        '--full-traces',
+        action='store_true',
+        help='Print every stack trace in full instead of a one-line reference to an identical earlier one'
+    )
+    parser.add_argument(
+        '--no-crash-summary',
+        action='store_true',
+        help='Don\'t print the exceptions seen, most frequent first, on exit (also printed on SIGUSR1)'
+    )
+    parser.add_argument(
+        '--no-http-stats',
+        action='store_true',
+        help='Don\'t pair "→ GET /path" requests with their "← 200" responses for latency and error stats'
+    )
+    parser.add_argument(
+        '--no-http-status',
+        action='store_true',
+        help='Don\'t keep HTTP latency percentiles on a status line below the output (terminals only)'
+    )
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=0,
+        metavar='N',
+        help='Show at most N lines per second per tag and level, summarizing what was dropped; '
+             'errors are never dropped (default: no limit)'
+    )
+    parser.add_argument(
+        '--rate-burst',
+        type=float,
+        metavar='N',
+        help='With --rate-limit, lines a quiet tag may print at once (default: one second\'s worth)'
+    )
+    parser.add_argument(
+        '--tui',
+        action='store_true',
+        help='Full-screen view: scroll back, pause, and change the level (v d i w e), tags (t) and '
+             'search (/) live over the records kept (? for keys)'
+    )
+    parser.add_argument(
+        '--tui-buffer',
+        type=int,
+        default=50000,
+        metavar='N',
+        help='Lines --tui keeps; older ones are dropped so memory stays flat (default: 50000)'
+    )
     parser.add_argument(
         '--no-color',
         action='store_true',
         help='Disable colors (for piping to files)'
     )
+    parser.add_argument(
+        '--flush-ms',
+        type=float,
+        default=16,
+        help='Max milliseconds output may wait in the write buffer; 0 writes every line '
+             'immediately, higher values trade latency for throughput (default: 16)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Render worker threads between the reader and writer threads; '
+             '0 runs everything on one thread (default: 1)'
+    )
+    parser.add_argument(
+        '--record',
+        metavar='ARCHIVE',
+        help='Also record the records shown to an indexed, compressed archive for --replay'
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='ARCHIVE',
+        help='Query an archive written by --record instead of reading a device; '
+             'combine with --level, --tag, --pid, --since and --until'
+    )
+    parser.add_argument(
+        '--pid',
+        help='Only these pids, comma-separated'
+    )
+    parser.add_argument(
+        '--since',
+        help='Only records at or after this time ("14:02", "01-19 14:02:30")'
+    )
+    parser.add_argument(
+        '--until',
+        help='Only records up to the end of this time ("14:05" includes 14:05:59)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='With --input, parse and render the capture on this many processes; '
+             '0 uses one per CPU (default: 1)'
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Show throughput, stage costs, backlog, drops and exceptions on a status line and on exit'
+    )
+    parser.add_argument(
+        '--stats-json',
+        metavar='FILE',
+        help='Append the same figures as one JSON line to FILE on exit (- for stdout)'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Profile the session, print the top cost centers on exit and write FILE: pstats '
+             '(snakeviz, gprof2dot) or, with --profile-mode sampling, folded stacks (speedscope, flamegraph.pl)'
+    )
+    parser.add_argument(
+        '--profile-mode',
+        choices=['deterministic', 'sampling'],
+        default='deterministic',
+        help='cProfile in every thread (exact call counts, slower), or CPU-weighted stack samples '
+             'every 5 ms (cheap enough for a live session) (default: deterministic)'
+    )
+    parser.add_argument(
+        '--profile-memory',
+        type=float,
+        default=60,
+        metavar='SECONDS',
+        help='With --profile, trace allocations and report growth every SECONDS and on exit; 0 turns it off '
+             '(default: 60)'
+    )
+    parser.add_argument(
+        '--pipeline-stats',
+        action='store_true',
+        help='Print pipeline queue depths on exit'
+    )
+    parser.add_argument(
+        '--track',
+        default='events',
+        choices=('events', 'pid'),
+        help='How to follow app restarts: "events" reads one long-lived logcat (limited to the '
+             'app\'s uid and ActivityManager\'s on Android 10+) and tracks all of the app\'s processes '
+             'from ActivityManager events; "pid" polls pidof and restarts logcat --pid (default: events)'
+    )
+    parser.add_argument(
+        '--adb-transport',
+        default='auto',
+        choices=('auto', 'socket', 'process'),
+        help='How to talk to adb: "socket" speaks the adb server protocol on port 5037 '
+             '(ANDROID_ADB_SERVER_PORT) with no adb process per command; "process" runs the adb '
+             'command for everything; "auto" uses the socket when the server answers (default: auto)'
+    )
+    parser.add_argument(
+        '--devices',
+        help='Follow the package on several devices at once: "all" or comma-separated serials'
+    )
+    parser.add_argument(
+        '--panes',
+        action='store_true',
+        help='With --devices, show each device in its own column instead of one merged view'
+    )
+    parser.add_argument(
+        '--merge-window-ms',
+        type=float,
+        default=200,
+        help='With --devices, max time a line is held back to merge devices by timestamp (default: 200)'
+    )
+    parser.add_argument(
+        '--format',
+        choices=LogcatParser.FORMATS,
+        help='logcat output format to request from adb (default: time), '
+             'or of the --input capture (default: detected)'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=4096,
+        help='Max rendered lines kept in the render cache, 0 to disable (default: 4096)'
+    )
+    parser.add_argument(
+        '--cache-templates',
+        action='store_true',
+        help='Also cache highlighted message templates with numbers and UUIDs masked'
+    )
+    parser.add_argument(
+        '--cache-stats',
+        action='store_true',
+        help='Print render cache hit/miss counters on exit'
+    )
     
     args = parser.parse_args()
+    offline = args.input or args.replay
+    if not args.package and not offline:
+        parser.error('a package is required unless --input or --replay is given')
+    if offline and (args.devices or args.clear):
+        parser.error('--devices and --clear need a device and cannot be used with --input or --replay')
+    if args.record and (args.replay or args.devices or args.jobs != 1):
+        parser.error('--record cannot be used with --replay, --devices or --jobs')
+    if args.tui and (args.replay or args.devices or args.jobs != 1):
+        parser.error('--tui cannot be used with --replay, --devices or --jobs')
+    if args.tui and (curses is None or not sys.stdout.isatty()):
+        parser.error('--tui needs a terminal and the curses module (on Windows: pip install windows-curses)')
     
     # Disable colors if requested
     if args.no_color:
         Colors.disable()
     
-    # Check ADB
-    if not ADB_PATH:
+    for path in (args.input, args.replay):
+        if path and path != '-' and not os.path.exists(path):
+            print(f"{Colors.BRIGHT_RED}Error: Input file not found: {path}{Colors.RESET}")
+            sys.exit(1)
+    
+    # Talk to the adb server over its socket unless told to run adb for everything
+    global ADB_CLIENT
+    if not offline and args.adb_transport != 'process':
+        ADB_CLIENT = connect_adb_server()
+        if ADB_CLIENT is None and args.adb_transport == 'socket':
+            client = AdbClient()
+            print(f"{Colors.BRIGHT_RED}Error: No adb server at {client.host}:{client.port}.{Colors.RESET}")
+            sys.exit(1)
+    
+    # Check ADB (not needed to read a saved capture or archive)
+    if not offline and ADB_CLIENT is None and not ADB_PATH:
         print(f"{Colors.BRIGHT_RED}Error: adb not found.{Colors.RESET}")
         print(f"{Colors.BRIGHT_BLACK}Searched in PATH and common locations.{Colors.RESET}")
         print(f"{Colors.BRIGHT_BLACK}Install Android SDK or add adb to your PATH.{Colors.RESET}")
         sys.exit(1)
     
-    if not check_adb():
+    if not offline and not check_adb():
         print(f"{Colors.BRIGHT_RED}Error: No Android device connected.{Colors.RESET}")
         print(f"{Colors.BRIGHT_BLACK}Connect a device or start an emulator.{Colors.RESET}")
         sys.exit(1)
@@ -881,20 +5815,141 @@ Examples:
     min_level = LogLevel.from_string(args.level)
     tag_filter = [t.strip() for t in args.tag.split(',')] if args.tag else None
     show_json = not args.no_json
+    pids = [p.strip() for p in args.pid.split(',')] if args.pid else None
+    
+    # Set up the render cache, JSON limits, reassembly, storm control, crash grouping and HTTP stats
+    global RENDER_CACHE, JSON_LIMITS, REASSEMBLE_CHARS, STORM_SETTINGS, CRASH_TABLE, HTTP_STATS, RUN_STATS
+    if args.cache_size > 0:
+        RENDER_CACHE = RenderCache(args.cache_size, templates=args.cache_templates)
+    JSON_LIMITS = JsonLimits(args.json_depth, args.json_items, args.json_max_bytes, args.json_drop_over)
+    REASSEMBLE_CHARS = args.reassemble
+    STORM_SETTINGS = {'collapse': not args.no_collapse, 'rate': args.rate_limit, 'burst': args.rate_burst}
+    CRASH_TABLE = CrashTable(args.full_traces)
+    if hasattr(signal, 'SIGUSR1'):
+        # Printed in stream order by the trace grouper, not from the handler
+        signal.signal(signal.SIGUSR1, lambda signum, frame: setattr(CRASH_TABLE, 'summary_requested', True))
+    if not args.no_http_stats:
+        HTTP_STATS = HttpStats()
+    
+    # Resolve devices for multi-device mode
+    serials = None
+    if args.devices:
+        connected = list_devices()
+        if args.devices == 'all':
+            serials = connected
+        else:
+            serials = [s.strip() for s in args.devices.split(',') if s.strip()]
+            missing = [s for s in serials if s not in connected]
+            if missing:
+                print(f"{Colors.BRIGHT_RED}Error: Device(s) not connected: {', '.join(missing)}{Colors.RESET}")
+                sys.exit(1)
+    
+    # Push what logcat can express down to the device. In events mode the
+    # ProcessTracker needs ActivityManager lines, which -e would drop.
+    by_pid = args.track == 'pid' and not serials
+    push_regex = None
+    if args.grep and not offline and by_pid and get_sdk_level() >= LOGCAT_REGEX_SDK:
+        push_regex = args.grep
+    
+    # Compile the filters; --grep stays on the host unless the device runs it. The
+    # interactive view keeps every level and tag and applies those on screen.
+    app = TuiApp(args.tui_buffer, min_level, tag_filter, args.exact_tags) if args.tui else None
+    try:
+        log_filter = LogFilter(LogLevel.VERBOSE if app else min_level, None if app else tag_filter,
+                               args.exact_tags, None if push_regex else args.grep,
+                               pids, args.since, args.until, args.filter)
+    except (ValueError, re.error) as e:
+        parser.error(str(e))
+    device_args = None
+    if not offline:
+        device_args = logcat_filter_args(log_filter, push_regex, None if by_pid else ProcessTracker.WATCH_TAG)
+    stats = TrafficStats(device_args) if args.filter_stats else None
     
     # Clear logcat if requested
     if args.clear:
-        clear_logcat()
+        for serial in serials or [None]:
+            clear_logcat(serial)
     
     # Print banner
-    print_banner(args.package, args.level.upper(), args.tag)
+    if app is None:
+        print_banner(args.package, args.level.upper(), args.tag, serials, offline)
     
-    # Stream logs
+    # Stream logs, profiled from the start so every thread is covered
+    profiler = None
+    if args.profile:
+        profiler = SessionProfiler(args.profile, args.profile_mode, args.profile_memory)
+        profiler.start()
+    writer = TuiWriter(app) if app else OutputWriter(flush_interval=args.flush_ms / 1000)
+    if profiler is not None and profiler.memory is not None:
+        profiler.memory.writer = writer
+    if HTTP_STATS is not None and not args.no_http_status:
+        HTTP_STATS.writer = writer
+    pipeline = RenderPipeline(args.workers) if args.workers > 0 and not serials and not app else None
+    if args.stats or args.stats_json:
+        RUN_STATS = RunStats(writer, pipeline, status=args.stats)
+    archive = ArchiveWriter(args.record) if args.record else None
+    interrupted = False
     try:
-        stream_logs(args.package, min_level, tag_filter, show_json)
+        if app is not None:
+            if args.input:
+                run_tui(app, lambda: view_file(args.input, log_filter, show_json, args.format, writer,
+                                               package=args.package, archive=archive, stats=stats,
+                                               consumer=app.push))
+            else:
+                run_tui(app, lambda: stream_logs(args.package, log_filter, show_json, args.format or 'time',
+                                                 writer, None, args.track, archive, device_args, stats,
+                                                 consumer=app.push))
+        elif args.replay:
+            replay_archive(args.replay, log_filter, show_json, writer)
+        elif args.input and args.jobs != 1:
+            view_file_parallel(args.input, args.jobs or os.cpu_count() or 1, log_filter, show_json,
+                               args.format, writer, args.package)
+        elif args.input:
+            # Ends by itself at the end of the capture
+            view_file(args.input, log_filter, show_json, args.format, writer, pipeline, args.package,
+                      archive, stats)
+        elif serials:
+            asyncio.run(stream_devices(
+                serials, args.package, log_filter, show_json, args.format or 'time', writer,
+                panes=args.panes, merge_window=args.merge_window_ms / 1000, device_args=device_args
+            ))
+        else:
+            stream_logs(args.package, log_filter, show_json, args.format or 'time', writer, pipeline,
+                        args.track, archive, device_args, stats)
     except KeyboardInterrupt:
-        print_exit_message()
+        interrupted = True
+    except BrokenPipeError:
+        # Output closed early (e.g. piped into head); nothing more to show
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        if archive is not None:
+            archive.close()
         sys.exit(0)
+    
+    writer.close()
+    if profiler is not None:
+        profiler.stop()
+    if archive is not None:
+        archive.close()
+    if interrupted:
+        print_exit_message()
+    if archive is not None:
+        print(f"  {Colors.BRIGHT_BLACK}Recorded {archive.records:,} records to {archive.path}{Colors.RESET}")
+    if args.pipeline_stats and pipeline is not None:
+        print_pipeline_stats(pipeline)
+    if stats is not None:
+        print_filter_stats(stats)
+    if args.cache_stats:
+        print_cache_stats(RENDER_CACHE)
+    if not args.no_crash_summary:
+        print_crash_summary(CRASH_TABLE)
+    print_http_report(HTTP_STATS)
+    if profiler is not None:
+        print_profile(profiler)
+    if args.stats:
+        print_run_stats(RUN_STATS)
+    if args.stats_json:
+        RUN_STATS.dump(args.stats_json)
+    sys.exit(0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,886 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for logview.py.
+
+Usage:
+    python logview_bench.py
+    python logview_bench.py --compare HEAD~1
+    python logview_bench.py --min-time 2
+    python logview_bench.py --offline 1024
+    python logview_bench.py --scaling 64
+    python logview_bench.py --save
+    python logview_bench.py --check
+    python logview_bench.py --corpus capture.txt --corpus-lines 100000
+
+--save stores the results (lines/s per benchmark) in logview_bench.json;
+--check runs the suite again and exits with status 1 if any benchmark is
+more than --tolerance slower than the stored results. Baselines are only
+comparable on the machine and Python version that wrote them, so the file
+is not checked in: run --save once on a known-good revision, then --check
+after each change, with the same --min-time. Both also time a fixed
+calibration workload, and --check scales the stored results by how much
+faster or slower the machine runs it than when they were saved.
+
+The suite runs in --repeats passes sharing --min-time, and each benchmark
+reports its fastest pass, so results hold steady from run to run.
+
+--corpus writes the generated Hooked corpus the "corpus:" benchmarks run
+on (API calls and responses with JSON bodies, app logging, system noise
+and crashes) as a capture for logview.py --input.
+
+--offline N generates an N MB time-format capture and times view_file()
+over it from a plain (memory-mapped) and a gzip file. Targets on a 1 GB
+capture: reading and filtering out everything (ERROR+ on a capture with no
+errors) at 75 MB/s plain and 40 MB/s gzip, i.e. under 30 s per GB; shown
+lines cost what format_log_line costs (about 20k lines/s); peak memory
+stays flat (under 64 MB) at any size.
+
+--scaling N times full rendering of an N MB capture with --jobs 1, 2, 4
+and 8; rendering is CPU-bound, so it should scale with the CPUs available.
+"""
+
+import argparse
+import functools
+import gzip
+import heapq
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from types import ModuleType
+from typing import Callable, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import logview  # noqa: E402
+
+
+# ============================================================================
+# Corpus
+# ============================================================================
+
+SAMPLE_MESSAGES = [
+    '→ GET /user_catches',
+    '← 200 OK /user_catches (142ms)',
+    '→ POST /user_catches',
+    '← 201 Created /user_catches (388ms)',
+    '← 404 Not Found /user_catches/3f2a1b4c-1234-4abc-9def-0123456789ab (57ms)',
+    'Loading image https://hooked-images.s3.amazonaws.com/catches/3f2a1b4c.jpg',
+    'Loaded 25 catches in 312 ms',
+    'Retrying request after timeout (attempt 2 of 3)',
+    'java.lang.IllegalStateException: Catch id was null at CatchApiService.kt:35',
+    'Caused by: java.net.SocketTimeoutException: timeout',
+    'Response [500 Internal Server Error] from https://api.hooked.app/api/user_catches',
+    'Saving catch to /data/user/0/com.hooked.hooked/cache/upload_123.jpg',
+    "Species 'Largemouth Bass' confidence=0.93 enriched=true",
+    'Bitmap allocated at 0x7f3a2c10 size 1048576 bytes',
+    'Connected to ws://10.0.2.2:8080 ready=true',
+    'Token refresh failed: invalid signature, deprecated key id "k1"',
+    'Recomposition skipped for CatchGridItem key=42',
+    '← 200 OK /user_catches {"data": [{"id": "3f2a1b4c-1234-4abc-9def-0123456789ab", "species": "Bass", "weight": 2.4}]}',
+]
+
+
+def sample_messages() -> List[str]:
+    """Return the benchmark message corpus."""
+    return list(SAMPLE_MESSAGES)
+
+
+def varied_messages(count: int = 5000, seed: int = 1) -> List[str]:
+    """Polling-loop style traffic: few templates, varying ids, counts and timings."""
+    rng = random.Random(seed)
+    templates = [
+        lambda: '→ GET /user_catches',
+        lambda: f'← 200 OK /user_catches ({rng.randint(20, 900)}ms)',
+        lambda: f'→ GET /user_catches/{uuid.UUID(int=rng.getrandbits(128))}',
+        lambda: f'← {rng.choice([200, 200, 404, 500])} OK /user_catches/{uuid.UUID(int=rng.getrandbits(128))} ({rng.randint(20, 900)}ms)',
+        lambda: f'Loading image https://hooked-images.s3.amazonaws.com/catches/{rng.randint(1, 9999)}.jpg',
+        lambda: f'Successfully loaded {rng.randint(0, 200)} catches in {rng.randint(5, 400)} ms',
+        lambda: f'Recomposition skipped for CatchGridItem key={rng.randint(1, 500)}',
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+def varied_records(count: int = 5000, seed: int = 1) -> List[dict]:
+    """Parsed-record form of varied_messages()."""
+    rng = random.Random(seed)
+    return [
+        {'timestamp': '01-19 17:54:16.950', 'level': rng.choice('DDDIW'), 'tag': rng.choice(['CatchApiService', 'AsyncImage', 'CatchGrid']),
+         'pid': '6192', 'tid': '6192', 'message': msg, 'raw': msg}
+        for msg in varied_messages(count, seed)
+    ]
+
+
+def json_records(count: int = 40, seed: int = 1) -> List[dict]:
+    """Responses carrying catches-list JSON bodies of 10 to 400 entries."""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        catches = [
+            {'id': str(uuid.UUID(int=rng.getrandbits(128))), 'species': rng.choice(['Bass', 'Pike', 'Trout']),
+             'weight': round(rng.uniform(0.2, 9.0), 2), 'location': {'lat': rng.uniform(-90, 90), 'lng': rng.uniform(-180, 180)},
+             'tags': ['catch', 'release'], 'released': rng.random() < 0.5}
+            for _ in range(rng.randint(10, 400))
+        ]
+        message = f'← 200 OK /user_catches ({rng.randint(20, 900)}ms) {json.dumps({"data": catches, "next": None})}'
+        records.append({'timestamp': '01-19 17:54:16.950', 'level': 'D', 'tag': 'CatchApiService',
+                        'pid': '6192', 'tid': '6192', 'message': message, 'raw': message})
+    return records
+
+
+def logcat_lines(fmt: str, count: int = 5000) -> List[str]:
+    """Render varied_records() as raw logcat output in the given -v format."""
+    lines = []
+    for i, r in enumerate(varied_records(count)):
+        pid = int(r['pid'])
+        tid = pid + i % 3
+        if fmt == 'time':
+            lines.append(f"{r['timestamp']} {r['level']}/{r['tag']}({pid:>5}): {r['message']}")
+        elif fmt == 'threadtime':
+            lines.append(f"{r['timestamp']} {pid:>5} {tid:>5} {r['level']} {r['tag']}: {r['message']}")
+        elif fmt == 'epoch':
+            lines.append(f"{1705686856 + i // 100}.{i % 1000:03d} {pid:>5} {tid:>5} {r['level']} {r['tag']}: {r['message']}")
+        elif fmt == 'monotonic':
+            lines.append(f"{1200 + i // 100:>6}.{i % 1000:03d} {pid:>5} {tid:>5} {r['level']} {r['tag']}: {r['message']}")
+        elif fmt == 'long':
+            lines.append(f"[ {r['timestamp']} {pid:>5}:{tid:>5} {r['level']}/{r['tag']} ]")
+            lines.append(r['message'])
+            lines.append('')
+        else:
+            raise ValueError(fmt)
+    return lines
+
+
+# Traffic mix of the generated corpus, as weights per event
+CORPUS_MIX = {'http': 30, 'app': 30, 'noise': 40, 'crash': 0.1}
+CORPUS_APP_PID = 6192
+CORPUS_API_TAGS = ('CatchApiService', 'AuthApiService', 'UserApiService')
+CORPUS_ENDPOINTS = [
+    ('GET', '/user_catches'), ('GET', '/user_catches/{id}'), ('POST', '/user_catches'),
+    ('DELETE', '/user_catches/{id}'), ('GET', '/users/{id}/profile'), ('POST', '/auth/refresh'),
+    ('GET', '/species/{id}'), ('PUT', '/users/{id}/settings'),
+]
+CORPUS_NOISE = [
+    ('ActivityManager', 1000, 'I', lambda rng: f'Start proc {rng.randint(2000, 30000)}:com.google.android.gms/u0a{rng.randint(10, 200)} for service'),
+    ('art', None, 'I', lambda rng: f'Background concurrent copying GC freed {rng.randint(1000, 90000)}({rng.randint(1, 40)}MB) AllocSpace objects, '
+                                     f'{rng.randint(0, 20)}(1MB) LOS objects, {rng.randint(20, 60)}% free, {rng.randint(5, 60)}MB/{rng.randint(60, 120)}MB, '
+                                     f'paused {rng.randint(50, 900)}us total {rng.randint(10, 400)}.{rng.randint(0, 999):03d}ms'),
+    ('chatty', 512, 'I', lambda rng: f'uid=10123(com.hooked.hooked) RenderThread identical {rng.randint(2, 40)} lines'),
+    ('OpenGLRenderer', None, 'I', lambda rng: f'Davey! duration={rng.randint(700, 2000)}ms; Flags=0, IntendedVsync={rng.getrandbits(40)}, '
+                                                f'Vsync={rng.getrandbits(40)}, HandleInputStart={rng.getrandbits(40)}'),
+    ('ViewRootImpl', None, 'D', lambda rng: f'updatePointerIcon pointerType = {rng.choice([1000, 1002])}, calling pid = {CORPUS_APP_PID}'),
+    ('WindowManager', 1000, 'W', lambda rng: 'Unable to start animation, surface is null or no children.'),
+    ('InputMethodManager', None, 'V', lambda rng: f'Starting input: tba=com.hooked.hooked ic=null mNaviBarColor -{rng.getrandbits(24)}'),
+    ('wpa_supplicant', 800, 'D', lambda rng: f'wlan0: Control interface command \'SIGNAL_POLL\' rssi=-{rng.randint(30, 90)}'),
+]
+CORPUS_APP = [
+    ('AsyncImage', 'D', lambda rng: f'Loading image https://hooked-images.s3.amazonaws.com/catches/{uuid.UUID(int=rng.getrandbits(128))}.jpg'),
+    ('CatchGrid', 'D', lambda rng: f'Recomposition skipped for CatchGridItem key={rng.randint(1, 500)}'),
+    ('CatchRepository', 'I', lambda rng: f'Successfully loaded {rng.randint(0, 200)} catches in {rng.randint(5, 400)} ms'),
+    ('CatchRepository', 'D', lambda rng: f'Cache hit for catch {uuid.UUID(int=rng.getrandbits(128))} age={rng.randint(0, 3600)}s'),
+    ('SpeciesClassifier', 'I', lambda rng: f"Species '{rng.choice(['Largemouth Bass', 'Northern Pike', 'Rainbow Trout'])}' "
+                                            f"confidence={rng.random():.2f} enriched={rng.choice(['true', 'false'])}"),
+    ('UploadWorker', 'W', lambda rng: f'Retrying upload after timeout (attempt {rng.randint(2, 3)} of 3)'),
+    ('TokenManager', 'I', lambda rng: 'Token refreshed, expires in 3600 s'),
+]
+CORPUS_EXCEPTIONS = [
+    ('java.lang.IllegalStateException: Catch id was null', 'CatchViewModel', 'java.net.SocketTimeoutException: timeout'),
+    ('java.lang.NullPointerException: Attempt to invoke virtual method on a null object reference', 'CatchDetailScreen', None),
+    ('kotlinx.serialization.json.internal.JsonDecodingException: Unexpected JSON token at offset 12', 'CatchApiService',
+     'java.io.EOFException: End of input'),
+]
+
+
+def _corpus_json_body(rng: random.Random) -> str:
+    """A catches-list body; most are small, a few run to hundreds of entries."""
+    size = min(400, int(rng.paretovariate(1.2)))
+    catches = [
+        {'id': str(uuid.UUID(int=rng.getrandbits(128))), 'species': rng.choice(['Bass', 'Pike', 'Trout']),
+         'weight': round(rng.uniform(0.2, 9.0), 2), 'location': {'lat': round(rng.uniform(-90, 90), 5),
+                                                                 'lng': round(rng.uniform(-180, 180), 5)},
+         'tags': ['catch', 'release'], 'released': rng.random() < 0.5}
+        for _ in range(size)
+    ]
+    return json.dumps({'data': catches, 'next': None})
+
+
+def _corpus_trace(rng: random.Random) -> List[str]:
+    """The lines of one Kotlin crash, header first."""
+    header, screen, cause = rng.choice(CORPUS_EXCEPTIONS)
+    lines = ['FATAL EXCEPTION: main', f'Process: com.hooked.hooked, PID: {CORPUS_APP_PID}', header]
+    for depth in range(rng.randint(6, 20)):
+        lines.append(f'\tat com.hooked.ui.{screen}$load${depth % 3 + 1}.invokeSuspend({screen}.kt:{rng.randint(20, 400)})')
+    if cause:
+        lines.append(f'Caused by: {cause}')
+        lines.append(f'\tat okhttp3.internal.connection.RealCall.execute(RealCall.kt:{rng.randint(100, 200)})')
+        lines.append(f'\t... {rng.randint(5, 30)} more')
+    return lines
+
+
+def generate_corpus(count: int = 20000, seed: int = 1) -> List[dict]:
+    """
+    Records shaped like a real Hooked session: API calls answered 20 to
+    900 ms later (some with JSON bodies, some failing), app logging with
+    UUIDs and URLs, system noise from other processes, and the odd crash
+    logged one record per line. Timestamps only move forward.
+    """
+    rng = random.Random(seed)
+    kinds = list(CORPUS_MIX)
+    weights = list(CORPUS_MIX.values())
+    clock = 17 * 3600 + 54 * 60.0
+    responses = []
+    records = []
+
+    def emit(tag: str, level: str, message: str, pid: int, tid: int, at: float):
+        records.append({'clock': at, 'level': level, 'tag': tag, 'pid': pid, 'tid': tid, 'message': message})
+
+    while len(records) < count:
+        clock += rng.expovariate(400)
+        while responses and responses[0][0] <= clock:
+            emit(*heapq.heappop(responses)[1:])
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'http':
+            tag = rng.choice(CORPUS_API_TAGS)
+            method, path = rng.choice(CORPUS_ENDPOINTS)
+            path = path.format(id=uuid.UUID(int=rng.getrandbits(128)))
+            tid = CORPUS_APP_PID + rng.randint(20, 28)
+            emit(tag, 'D', f'→ {method} {path}', CORPUS_APP_PID, tid, clock)
+            latency = rng.lognormvariate(5.2, 0.6) / 1000
+            roll = rng.random()
+            if roll < 0.03:
+                response = ('E', '← HTTP FAILED: java.net.SocketTimeoutException: timeout')
+            elif roll < 0.08:
+                status = rng.choice(['404 Not Found', '500 Internal Server Error', '401 Unauthorized'])
+                response = ('W', f'← {status} {path} ({latency * 1000:.0f}ms)')
+            else:
+                body = f' {_corpus_json_body(rng)}' if method == 'GET' and rng.random() < 0.3 else ''
+                response = ('D', f'← {"201 Created" if method == "POST" else "200 OK"} {path} ({latency * 1000:.0f}ms){body}')
+            heapq.heappush(responses, (clock + latency, tag, *response, CORPUS_APP_PID, tid, clock + latency))
+        elif kind == 'app':
+            tag, level, make = rng.choice(CORPUS_APP)
+            emit(tag, level, make(rng), CORPUS_APP_PID, CORPUS_APP_PID + rng.choice([0, 0, 0, 14, 15]), clock)
+        elif kind == 'noise':
+            tag, pid, level, make = rng.choice(CORPUS_NOISE)
+            pid = pid or rng.randint(1500, 30000)
+            emit(tag, level, make(rng), pid, pid + rng.randint(0, 40), clock)
+        else:
+            for line in _corpus_trace(rng):
+                emit('AndroidRuntime', 'E', line, CORPUS_APP_PID, CORPUS_APP_PID, clock)
+    return records[:count]
+
+
+def format_corpus_record(record: dict, fmt: str) -> str:
+    """One generated record as a line of logcat -v fmt ('time' or 'threadtime')."""
+    seconds, millis = divmod(round(record['clock'] * 1000), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    timestamp = f"01-19 {hours % 24:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
+    if fmt == 'time':
+        return f"{timestamp} {record['level']}/{record['tag']}({record['pid']:>5}): {record['message']}"
+    if fmt == 'threadtime':
+        return f"{timestamp} {record['pid']:>5} {record['tid']:>5} {record['level']} {record['tag']}: {record['message']}"
+    raise ValueError(fmt)
+
+
+@functools.lru_cache(maxsize=None)
+def corpus_lines(fmt: str, count: int = 20000, seed: int = 1) -> List[str]:
+    """generate_corpus() as raw logcat output."""
+    return [format_corpus_record(record, fmt) for record in generate_corpus(count, seed)]
+
+
+@functools.lru_cache(maxsize=None)
+def corpus_records(fmt: str = 'threadtime') -> List[dict]:
+    """Parsed-record form of corpus_lines(), as dicts (see module_records)."""
+    records = []
+    for line in corpus_lines(fmt):
+        parsed = logview.parse_logcat_line(line)
+        records.append({'timestamp': parsed.timestamp, 'level': parsed.level, 'tag': parsed.tag,
+                        'pid': str(parsed.pid), 'tid': str(parsed.tid), 'message': parsed.message})
+    return records
+
+
+def module_records(module: ModuleType, records: List[dict]) -> list:
+    """Records in the form the module takes: LogRecords, or the dicts of older revisions."""
+    if not hasattr(module, 'LogRecord'):
+        return records
+    return [module.LogRecord(r['timestamp'], r['level'], r['tag'], int(r['pid']), int(r['tid']), r['message'])
+            for r in records]
+
+
+def corpus_json_bodies() -> List[str]:
+    """The JSON bodies in the corpus's responses."""
+    return [line[line.index(' {"data"') + 1:] for line in corpus_lines('threadtime') if ' {"data"' in line]
+
+
+def write_corpus(path: str, fmt: str, count: int, seed: int = 1):
+    """Write a generated corpus to path (gzip-compressed if it ends in .gz)."""
+    data = ('\n'.join(corpus_lines(fmt, count, seed)) + '\n').encode('utf-8')
+    with (gzip.open(path, 'wb') if path.endswith('.gz') else open(path, 'wb')) as f:
+        f.write(data)
+
+
+# ============================================================================
+# Harness
+# ============================================================================
+
+def load_revision(rev: str) -> ModuleType:
+    """Load logview.py as it was at a git revision."""
+    source = subprocess.run(
+        ['git', 'show', f'{rev}:logview.py'],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    tmp = tempfile.NamedTemporaryFile('w', suffix='.py', delete=False)
+    with tmp:
+        tmp.write(source)
+    spec = importlib.util.spec_from_file_location(f'logview_{rev}', tmp.name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    os.unlink(tmp.name)
+    return module
+
+
+def measure(fn: Callable[[str], object], items: List[str], min_time: float) -> float:
+    """Run fn over items repeatedly for at least min_time seconds; return items/sec."""
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for item in items:
+            fn(item)
+        count += len(items)
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def report(name: str, rate: Optional[float], baseline: Optional[float] = None, note: str = ''):
+    """Print one benchmark result line."""
+    if rate is None:
+        print(f"  {name:<36} {'n/a':>12}")
+        return
+    line = f"  {name:<36} {rate:>12,.0f} lines/s"
+    if baseline:
+        line += f"   (baseline {baseline:>10,.0f}, x{rate / baseline:.2f})"
+    print(line + note)
+
+
+RESULTS_FILE = os.path.join(HERE, 'logview_bench.json')
+
+
+def save_results(path: str, results: dict, min_time: float, calibration: float):
+    """Store lines/s per benchmark, with what they were measured on."""
+    data = {
+        'python': sys.version.split()[0],
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'min_time': min_time,
+        'calibration': round(calibration, 1),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path: str) -> tuple:
+    """Stored (results, calibration); warns when they come from another Python or machine."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    here = (sys.version.split()[0], platform.machine())
+    if (data.get('python'), data.get('machine')) != here:
+        print(f"warning: {path} was written by Python {data.get('python')} on {data.get('machine')}, "
+              f"this is Python {here[0]} on {here[1]}")
+    return data['results'], data.get('calibration')
+
+
+CALIBRATION_LINES = [f'{i:05d} calibration line {i * 7919 % 10007} of {i % 97}' for i in range(2000)]
+
+
+def bench_calibration(min_time: float) -> float:
+    """
+    How fast this machine is right now: plain Python string work that no
+    change to logview.py affects. A shared or throttled CPU can run a
+    whole suite a third slower than the last one, so --check scales the
+    stored results by this before comparing.
+    """
+    return measure(lambda line: line.split()[3].upper().count('1'), CALIBRATION_LINES, min_time)
+
+
+# ============================================================================
+# Benchmarks
+# ============================================================================
+
+def bench_colorize_message(module: ModuleType, min_time: float) -> float:
+    messages = sample_messages()
+    return measure(lambda m: module.colorize_message(m, 'D'), messages, min_time)
+
+
+def _bench_format_log_line(module: ModuleType, min_time: float, cache: Optional[dict]) -> Optional[float]:
+    records = module_records(module, varied_records())
+    if cache is not None:
+        if not hasattr(module, 'RenderCache'):
+            return None
+        module.RENDER_CACHE = module.RenderCache(**cache)
+    try:
+        return measure(module.format_log_line, records, min_time)
+    finally:
+        if cache is not None:
+            module.RENDER_CACHE = None
+
+
+def bench_format_log_line(module: ModuleType, min_time: float) -> Optional[float]:
+    return _bench_format_log_line(module, min_time, None)
+
+
+def bench_format_log_line_cached(module: ModuleType, min_time: float) -> Optional[float]:
+    return _bench_format_log_line(module, min_time, {'maxsize': 4096})
+
+
+def bench_format_log_line_templates(module: ModuleType, min_time: float) -> Optional[float]:
+    return _bench_format_log_line(module, min_time, {'maxsize': 4096, 'templates': True})
+
+
+def bench_format_json_bodies(module: ModuleType, min_time: float) -> float:
+    return measure(module.format_log_line, module_records(module, json_records()), min_time)
+
+
+def _bench_parse_logcat_line(fmt: str):
+    def bench(module: ModuleType, min_time: float) -> float:
+        return measure(module.parse_logcat_line, logcat_lines(fmt), min_time)
+    return bench
+
+
+def _bench_logcat_parser(fmt: str):
+    def bench(module: ModuleType, min_time: float) -> Optional[float]:
+        if not hasattr(module, 'LogcatParser'):
+            return None
+        lines = logcat_lines(fmt)
+        parser = module.LogcatParser(fmt)
+        return measure(parser.parse, lines, min_time)
+    return bench
+
+
+def bench_corpus_parse(fmt: str):
+    def bench(module: ModuleType, min_time: float) -> float:
+        return measure(module.parse_logcat_line, corpus_lines(fmt), min_time)
+    return bench
+
+
+def bench_corpus_filter(module: ModuleType, min_time: float) -> float:
+    """Record filter with --level WARNING over the corpus."""
+    return measure(_record_check(module, 3), module_records(module, corpus_records()), min_time)
+
+
+def bench_corpus_colorize(module: ModuleType, min_time: float) -> float:
+    return measure(lambda r: module.colorize_message(r['message'], r['level']), corpus_records(), min_time)
+
+
+def bench_pretty_print_json(module: ModuleType, min_time: float) -> float:
+    return measure(lambda body: module.pretty_print_json(body, ' ' * 50), corpus_json_bodies(), min_time)
+
+
+def bench_corpus_format(module: ModuleType, min_time: float) -> float:
+    return measure(module.format_log_line, module_records(module, corpus_records()), min_time)
+
+
+def _devnull_text():
+    return io.TextIOWrapper(open(os.devnull, 'wb'), encoding='utf-8', line_buffering=True)
+
+
+def bench_write_print_flush(module: ModuleType, min_time: float) -> float:
+    lines = varied_messages()
+    stream = _devnull_text()
+
+    def write(line: str):
+        print(line, file=stream)
+        stream.flush()
+    try:
+        return measure(write, lines, min_time)
+    finally:
+        stream.close()
+
+
+def bench_write_output_writer(module: ModuleType, min_time: float) -> Optional[float]:
+    if not hasattr(module, 'OutputWriter'):
+        return None
+    lines = varied_messages()
+    stream = _devnull_text()
+    writer = module.OutputWriter(stream, flush_interval=0.016)
+    try:
+        return measure(writer.write_line, lines, min_time)
+    finally:
+        writer.close()
+        stream.close()
+
+
+def _logcat_blob(fmt: str = 'time') -> bytes:
+    return ('\n'.join(logcat_lines(fmt)) + '\n').encode('utf-8')
+
+
+def _measure_stream(read_all: Callable[[bytes], int], blob: bytes, min_time: float) -> float:
+    """Lines/sec for a function that consumes a whole blob and returns its line count."""
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        count += read_all(blob)
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def _filter_args(module: ModuleType, min_level: int) -> tuple:
+    """Filter arguments in the form the module's API takes: a LogFilter, or (min_level, tag_filter)."""
+    if hasattr(module, 'LogFilter'):
+        return (module.LogFilter(min_level),)
+    return (min_level, None)
+
+
+def _record_check(module: ModuleType, min_level: int, tags: Optional[List[str]] = None) -> Callable[[dict], bool]:
+    """The module's per-record filter check: LogFilter.matches, or passes_filters."""
+    if hasattr(module, 'LogFilter'):
+        return module.LogFilter(min_level, tags).matches
+    return lambda parsed: module.passes_filters(parsed, min_level, tags)
+
+
+def bench_filter(module: ModuleType, min_time: float) -> float:
+    """Record filter with --level DEBUG --tag Api,Grid."""
+    return measure(_record_check(module, 1, ['Api', 'Grid']), module_records(module, varied_records()), min_time)
+
+
+def bench_filter_expression(module: ModuleType, min_time: float) -> Optional[float]:
+    """--filter with tag set, level, regex and a JSON predicate."""
+    if not hasattr(module, 'LogFilter'):
+        return None
+    log_filter = module.LogFilter(expression='level >= DEBUG and tag in {CatchApiService, CatchGrid} '
+                                             'and (message ~ /ms\\)$/ or json.status >= 500)')
+    return measure(log_filter.matches, module_records(module, varied_records()), min_time)
+
+
+def bench_read_text_lines(module: ModuleType, min_time: float) -> float:
+    """Old reading path: text-mode iteration, parse and filter every line (--level WARNING)."""
+    check = _record_check(module, 3)
+
+    def read_all(blob: bytes) -> int:
+        n = 0
+        for line in io.TextIOWrapper(io.BytesIO(blob), encoding='utf-8'):
+            n += 1
+            parsed = module.parse_logcat_line(line.rstrip())
+            if parsed:
+                check(parsed)
+        return n
+    return _measure_stream(read_all, _logcat_blob(), min_time)
+
+
+def bench_read_byte_chunks(module: ModuleType, min_time: float) -> Optional[float]:
+    """Chunked bytes with the pre-decode filter (--level WARNING)."""
+    if not hasattr(module, 'iter_line_batches'):
+        return None
+    prefilter = module.make_byte_prefilter('time', *_filter_args(module, 3))
+    check = _record_check(module, 3)
+
+    def read_all(blob: bytes) -> int:
+        n = 0
+        parser = module.LogcatParser('time')
+        for batch in module.iter_line_batches(io.BytesIO(blob)):
+            n += len(batch)
+            for data in batch:
+                if prefilter(data):
+                    parsed = parser.parse(module.decode_line(data))
+                    if parsed:
+                        check(parsed)
+        return n
+    return _measure_stream(read_all, _logcat_blob(), min_time)
+
+
+def _corpus_blob(fmt: str) -> bytes:
+    return ('\n'.join(corpus_lines(fmt)) + '\n').encode('utf-8')
+
+
+def _bench_end_to_end(workers: int, fmt: str = 'time', blob: Callable[[str], bytes] = _logcat_blob):
+    """Read, parse, render and write a capture (all levels)."""
+    def bench(module: ModuleType, min_time: float) -> Optional[float]:
+        if not hasattr(module, 'RenderPipeline'):
+            return None
+        stream = _devnull_text()
+        writer = module.OutputWriter(stream, flush_interval=0.016)
+        pipeline = module.RenderPipeline(workers) if workers else None
+
+        def read_all(blob: bytes) -> int:
+            parser = module.LogcatParser(fmt)
+            printer = module.LogPrinter(writer, *_filter_args(module, 0), True)
+            batches = (module.parse_batch(b, parser, None, *_filter_args(module, 0))
+                       for b in module.iter_line_batches(io.BytesIO(blob)))
+            render = lambda items: module.render_batch(items, True)
+            if pipeline is not None:
+                pipeline.run(batches, render, printer.emit)
+            else:
+                for items in batches:
+                    printer.emit(render(items))
+            return blob.count(b'\n')
+        try:
+            return _measure_stream(read_all, blob(fmt), min_time)
+        finally:
+            writer.close()
+            stream.close()
+    return bench
+
+
+BENCHMARKS = [
+    ('read (text lines, WARNING+)', bench_read_text_lines),
+    ('read (byte chunks, WARNING+)', bench_read_byte_chunks),
+    ('parse_logcat_line (time)', _bench_parse_logcat_line('time')),
+    ('parse_logcat_line (threadtime)', _bench_parse_logcat_line('threadtime')),
+] + [
+    (f'LogcatParser ({fmt})', _bench_logcat_parser(fmt))
+    for fmt in ('time', 'threadtime', 'epoch', 'monotonic', 'long')
+] + [
+    ('filter (level + tags)', bench_filter),
+    ('filter (expression)', bench_filter_expression),
+    ('colorize_message', bench_colorize_message),
+    ('format_log_line', bench_format_log_line),
+    ('format_log_line (line cache)', bench_format_log_line_cached),
+    ('format_log_line (+templates)', bench_format_log_line_templates),
+    ('format_log_line (JSON bodies)', bench_format_json_bodies),
+    ('write (print + flush per line)', bench_write_print_flush),
+    ('write (OutputWriter, 16 ms)', bench_write_output_writer),
+    ('end-to-end (inline)', _bench_end_to_end(0)),
+    ('end-to-end (pipeline, 1 worker)', _bench_end_to_end(1)),
+    ('end-to-end (pipeline, 2 workers)', _bench_end_to_end(2)),
+    ('corpus: parse_logcat_line (time)', bench_corpus_parse('time')),
+    ('corpus: parse_logcat_line (thread)', bench_corpus_parse('threadtime')),
+    ('corpus: filter (WARNING+)', bench_corpus_filter),
+    ('corpus: colorize_message', bench_corpus_colorize),
+    ('corpus: pretty_print_json', bench_pretty_print_json),
+    ('corpus: format_log_line', bench_corpus_format),
+    ('corpus: end-to-end (time)', _bench_end_to_end(0, 'time', _corpus_blob)),
+    ('corpus: end-to-end (threadtime)', _bench_end_to_end(0, 'threadtime', _corpus_blob)),
+]
+
+
+# ============================================================================
+# Offline Throughput
+# ============================================================================
+
+def write_capture(path: str, size_mb: int, compress: bool = False) -> int:
+    """Write a time-format capture of about size_mb megabytes; returns its line count."""
+    block = ('\n'.join(logcat_lines('time', 50000)) + '\n').encode('utf-8')
+    repeats = max(1, size_mb * 1024 * 1024 // len(block))
+    with (gzip.open(path, 'wb', compresslevel=1) if compress else open(path, 'wb')) as f:
+        for _ in range(repeats):
+            f.write(block)
+    return repeats * block.count(b'\n')
+
+
+def bench_offline(path: str, lines: int, min_level: int, jobs: int = 1) -> tuple:
+    """Time view_file() (or view_file_parallel() with jobs) over a capture; returns (seconds, lines/sec)."""
+    stream = _devnull_text()
+    writer = logview.OutputWriter(stream, flush_interval=0.016)
+    start = time.perf_counter()
+    try:
+        if jobs > 1:
+            logview.view_file_parallel(path, jobs, logview.LogFilter(min_level), True, None, writer)
+        else:
+            logview.view_file(path, logview.LogFilter(min_level), True, None, writer)
+    finally:
+        writer.close()
+        stream.close()
+    elapsed = time.perf_counter() - start
+    return elapsed, lines / elapsed
+
+
+def run_offline(size_mb: int):
+    """Generate a capture of size_mb megabytes and report view_file() throughput."""
+    logview.RENDER_CACHE = logview.RenderCache(4096)
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, 'capture.txt')
+        packed = os.path.join(tmp, 'capture.txt.gz')
+        lines = write_capture(plain, size_mb)
+        write_capture(packed, size_mb, compress=True)
+        size = os.path.getsize(plain) / (1024 * 1024)
+        print(f"Python {sys.version.split()[0]}, {size:,.0f} MB capture, {lines:,} lines")
+        for name, path, min_level in [
+            ('plain, ERROR+ (read + filter)', plain, logview.LogLevel.ERROR),
+            ('gzip, ERROR+ (read + filter)', packed, logview.LogLevel.ERROR),
+            ('plain, WARNING+', plain, logview.LogLevel.WARNING),
+            ('plain, all levels', plain, logview.LogLevel.VERBOSE),
+        ]:
+            elapsed, rate = bench_offline(path, lines, min_level)
+            print(f"  {name:<32} {rate:>12,.0f} lines/s  {size / elapsed:>7.1f} MB/s  {elapsed:>7.1f} s")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"  peak RSS {peak:,.0f} MB")
+
+
+def run_scaling(size_mb: int):
+    """Report full-rendering throughput of a generated capture at 1, 2, 4 and 8 processes."""
+    logview.RENDER_CACHE = logview.RenderCache(4096)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'capture.txt')
+        lines = write_capture(path, size_mb)
+        print(f"Python {sys.version.split()[0]}, {os.cpu_count()} CPUs, {size_mb} MB capture, {lines:,} lines")
+        base = None
+        for jobs in (1, 2, 4, 8):
+            elapsed, rate = bench_offline(path, lines, logview.LogLevel.VERBOSE, jobs)
+            base = base or rate
+            print(f"  {f'{jobs} process(es), all levels':<32} {rate:>12,.0f} lines/s  {elapsed:>7.1f} s  x{rate / base:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for logview.py')
+    parser.add_argument(
+        '--compare',
+        metavar='REV',
+        help='Also run against logview.py at this git revision (e.g., HEAD~1)'
+    )
+    parser.add_argument(
+        '--min-time',
+        type=float,
+        default=1.0,
+        help='Minimum seconds per benchmark, split over --repeats passes (default: 1.0)'
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=5,
+        help='Passes over the suite; each benchmark reports its fastest (default: 5)'
+    )
+    parser.add_argument(
+        '--offline',
+        type=int,
+        metavar='MB',
+        help='Only run the offline throughput check on a generated capture of this size'
+    )
+    parser.add_argument(
+        '--scaling',
+        type=int,
+        metavar='MB',
+        help='Only run the --jobs scaling check (1, 2, 4, 8 processes) on a generated capture of this size'
+    )
+    parser.add_argument(
+        '--only',
+        metavar='TEXT',
+        help='Only run benchmarks whose name contains TEXT'
+    )
+    parser.add_argument(
+        '--save',
+        nargs='?',
+        const=RESULTS_FILE,
+        metavar='FILE',
+        help=f'Store the results as the baseline for --check (default: {os.path.basename(RESULTS_FILE)})'
+    )
+    parser.add_argument(
+        '--check',
+        nargs='?',
+        const=RESULTS_FILE,
+        metavar='FILE',
+        help='Fail if any benchmark is slower than the stored baseline by more than --tolerance'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.15,
+        help='Slowdown --check accepts, as a fraction (default: 0.15)'
+    )
+    parser.add_argument(
+        '--corpus',
+        metavar='FILE',
+        help='Only write a generated corpus to FILE (.gz to compress) for logview.py --input'
+    )
+    parser.add_argument(
+        '--corpus-lines',
+        type=int,
+        default=100000,
+        help='Lines in the --corpus capture (default: 100000)'
+    )
+    parser.add_argument(
+        '--corpus-format',
+        choices=['time', 'threadtime'],
+        default='threadtime',
+        help='logcat -v format of the --corpus capture (default: threadtime)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=1,
+        help='Random seed of the --corpus capture (default: 1)'
+    )
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error('--repeats must be at least 1')
+    if args.check and not os.path.exists(args.check):
+        parser.error(f'no baseline at {args.check}; write one on this machine first with --save')
+
+    if args.corpus:
+        write_corpus(args.corpus, args.corpus_format, args.corpus_lines, args.seed)
+        print(f"Wrote {args.corpus_lines:,} {args.corpus_format} lines to {args.corpus}")
+        return
+    if args.scaling:
+        run_scaling(args.scaling)
+        return
+    if args.offline:
+        run_offline(args.offline)
+        return
+
+    baseline_module = load_revision(args.compare) if args.compare else None
+    stored, stored_calibration = load_results(args.check) if args.check else ({}, None)
+
+    print(f"Python {sys.version.split()[0]}, {len(sample_messages())} sample messages, "
+          f"{len(corpus_lines('threadtime')):,} corpus lines")
+    # The suite runs in several passes and each benchmark keeps its fastest.
+    # Noise (other processes, a shared CPU, GC) only ever slows a run down,
+    # and comes in spells, so passes spread over the whole run beat repeats
+    # back to back.
+    benchmarks = [(name, bench) for name, bench in BENCHMARKS if not args.only or args.only in name]
+    best = {}
+    calibration = 0.0
+    for _ in range(args.repeats):
+        calibration = max(calibration, bench_calibration(args.min_time / args.repeats))
+        for name, bench in benchmarks:
+            for module in (logview, baseline_module):
+                if module is None:
+                    continue
+                rate = bench(module, args.min_time / args.repeats)
+                key = (name, module is logview)
+                if rate is not None and (best.get(key) is None or rate > best[key]):
+                    best[key] = rate
+
+    # Stored results are scaled to how fast the machine is today
+    speed = calibration / stored_calibration if stored_calibration else 1.0
+    if args.check:
+        print(f"  machine speed x{speed:.2f} of the baseline's; stored results are scaled by it")
+    results = {}
+    regressions = []
+    for name, bench in benchmarks:
+        rate = best.get((name, True))
+        baseline = best.get((name, False)) if baseline_module else stored.get(name)
+        if baseline and not baseline_module:
+            baseline *= speed
+        note = ''
+        if rate is not None:
+            results[name] = round(rate, 1)
+            if args.check and baseline and rate < baseline * (1 - args.tolerance):
+                regressions.append(name)
+                note = '   REGRESSION'
+        report(name, rate, baseline, note)
+
+    if args.save:
+        save_results(args.save, results, args.min_time, calibration)
+        print(f"Saved {len(results)} results to {args.save}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower than {args.check}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
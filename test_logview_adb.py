@@ -0,0 +1,327 @@
+"""Tests for the adb server protocol client in logview.py, against a fake adb server on a local port."""
+
+import asyncio
+import socket
+import stat
+import subprocess
+import threading
+
+import pytest
+
+import logview
+from logview import AdbClient, AdbError, adb_service
+
+
+class FakeAdbServer:
+    """
+    Enough of the adb server for AdbClient: host:version, host:devices,
+    host:transport[-any|:SERIAL] and device services, answered from
+    services (service -> bytes, or an Exception whose text is sent as FAIL).
+    Every request is recorded, prefixed with the transport's serial.
+    """
+
+    def __init__(self, services=None, devices=b'', offline=()):
+        self.services = services or {}
+        self.devices = devices
+        self.offline = set(offline)
+        self.requests = []
+        self.stall = threading.Event()
+        self._sock = socket.socket()
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(8)
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read(conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    @staticmethod
+    def _fail(conn, message):
+        data = message.encode()
+        conn.sendall(b'FAIL%04x' % len(data) + data)
+
+    def _handle(self, conn):
+        serial = None
+        try:
+            while True:
+                request = self._read(conn, int(self._read(conn, 4), 16)).decode()
+                self.requests.append(request if serial is None else f"{serial} {request}")
+                if request == 'host:version':
+                    conn.sendall(b'OKAY0004001f')
+                    return
+                if request == 'host:devices':
+                    conn.sendall(b'OKAY%04x' % len(self.devices) + self.devices)
+                    return
+                if request.startswith('host:transport'):
+                    serial = request.split(':', 2)[2] if request.count(':') == 2 else '<any>'
+                    if serial in self.offline:
+                        self._fail(conn, f"device '{serial}' offline")
+                        return
+                    conn.sendall(b'OKAY')
+                    continue
+                answer = self.services.get(request)
+                if answer is None:
+                    self._fail(conn, f"unknown service {request}")
+                elif isinstance(answer, Exception):
+                    self._fail(conn, str(answer))
+                else:
+                    conn.sendall(b'OKAY' + answer)
+                    if request.endswith('stall'):
+                        self.stall.wait(5)
+                return
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+@pytest.fixture
+def server():
+    fake = FakeAdbServer(
+        services={
+            'shell:pidof -s com.hooked.hooked': b'6192\n',
+            'shell:getprop ro.build.version.sdk': b'34\n',
+            "shell:logcat -v time -T '01-19 17:54:16.170'": b'01-19 17:54:16.171 I/App( 6192): hello\n',
+            'shell:logcat -v time': b'01-19 17:54:16.100 I/App( 6192): one\n01-19 17:54:16.200 I/App( 6192): two\n',
+            'shell:refused': RuntimeError('closed'),
+            'shell:stall': b'partial',
+        },
+        devices=b'emulator-5554\tdevice\nR58M12ABCDE\tdevice\nZZ\toffline\n',
+        offline={'ZZ'},
+    )
+    yield fake
+    fake.stall.set()
+    fake.close()
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    monkeypatch.delenv('ANDROID_SERIAL', raising=False)
+    return AdbClient(port=server.port, timeout=2)
+
+
+@pytest.fixture
+def fallback_adb(tmp_path, monkeypatch):
+    """An adb command that just echoes its arguments, for the fallback path."""
+    path = tmp_path / 'adb'
+    path.write_text('#!/bin/sh\necho "adb $*"\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(logview, 'ADB_PATH', str(path))
+    return path
+
+
+# ============================================================================
+# Wire protocol
+# ============================================================================
+
+def test_requests_are_length_prefixed():
+    assert AdbClient._encode('host:version') == b'000chost:version'
+    assert AdbClient._encode('shell:é') == b'0008shell:\xc3\xa9'
+
+
+def test_query_reads_length_prefixed_answer(client):
+    assert client.query('host:version') == '001f'
+    assert client.version() == 0x1f
+
+
+def test_fail_reply_raises_adb_error_with_its_message(client):
+    with pytest.raises(AdbError, match='unknown service host:nope'):
+        client.query('host:nope')
+
+
+def test_version_is_none_without_a_server():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    assert AdbClient(port=port, timeout=1).version() is None
+
+
+def test_environment_picks_the_server(monkeypatch):
+    monkeypatch.setenv('ANDROID_ADB_SERVER_ADDRESS', '10.0.2.2')
+    monkeypatch.setenv('ANDROID_ADB_SERVER_PORT', '5038')
+    client = AdbClient()
+    assert (client.host, client.port) == ('10.0.2.2', 5038)
+
+
+def test_devices(client):
+    assert client.devices() == [('emulator-5554', 'device'), ('R58M12ABCDE', 'device'), ('ZZ', 'offline')]
+
+
+# ============================================================================
+# Transports and services
+# ============================================================================
+
+def test_transport_any_without_a_serial(client, server):
+    assert client.run(None, 'shell:pidof -s com.hooked.hooked') == b'6192\n'
+    assert server.requests == ['host:transport-any', '<any> shell:pidof -s com.hooked.hooked']
+
+
+def test_transport_to_a_serial(client, server):
+    client.run('R58M12ABCDE', 'shell:pidof -s com.hooked.hooked')
+    assert server.requests[0] == 'host:transport:R58M12ABCDE'
+
+
+def test_android_serial_picks_the_device(client, server, monkeypatch):
+    monkeypatch.setenv('ANDROID_SERIAL', 'emulator-5554')
+    client.run(None, 'shell:pidof -s com.hooked.hooked')
+    assert server.requests[0] == 'host:transport:emulator-5554'
+
+
+def test_transport_fail_raises(client):
+    with pytest.raises(AdbError, match="device 'ZZ' offline"):
+        client.run('ZZ', 'shell:pidof -s com.hooked.hooked')
+
+
+def test_service_fail_raises(client):
+    with pytest.raises(AdbError, match='closed'):
+        client.open(None, 'shell:refused')
+
+
+def test_read_timeout(client):
+    with pytest.raises(socket.timeout):
+        client.run(None, 'shell:stall', timeout=0.2)
+
+
+@pytest.mark.parametrize('args, expected', [
+    (['shell', 'pidof', '-s', 'com.hooked.hooked'], (None, 'shell:pidof -s com.hooked.hooked')),
+    (['-s', 'R58M12ABCDE', 'shell', 'getprop', 'ro.build.version.sdk'],
+     ('R58M12ABCDE', 'shell:getprop ro.build.version.sdk')),
+    (['logcat', '-v', 'time', '-T', '01-19 17:54:16.170'], (None, "shell:logcat -v time -T '01-19 17:54:16.170'")),
+    (['logcat', '-e', "it's (a|b)"], (None, "shell:logcat -e 'it'\"'\"'s (a|b)'")),
+    (['-s', 'emulator-5554', 'logcat', '-c'], ('emulator-5554', 'shell:logcat -c')),
+    (['devices'], None),
+    (['shell'], None),
+    (['start-server'], None),
+])
+def test_adb_service(args, expected):
+    assert adb_service(args) == expected
+
+
+# ============================================================================
+# run_adb / run_adb_popen over the socket, and falling back
+# ============================================================================
+
+def test_run_adb_uses_the_socket(client, server, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    monkeypatch.setattr(logview, 'ADB_PATH', None)
+    assert logview.get_pid('com.hooked.hooked') == '6192'
+    assert logview.get_sdk_level() == 34
+    assert logview.list_devices() == ['emulator-5554', 'R58M12ABCDE']
+
+
+def test_run_adb_timeout(client, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    with pytest.raises(subprocess.TimeoutExpired):
+        logview.run_adb(['shell', 'stall'], capture_output=True, timeout=0.2)
+
+
+def test_run_adb_falls_back_on_fail(client, server, fallback_adb, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    result = logview.run_adb(['-s', 'ZZ', 'shell', 'pidof', '-s', 'com.hooked.hooked'],
+                             capture_output=True, text=True)
+    assert result.stdout == 'adb -s ZZ shell pidof -s com.hooked.hooked\n'
+    assert server.requests == ['host:transport:ZZ']
+
+
+def test_run_adb_falls_back_without_a_server(fallback_adb, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', AdbClient(port=1, timeout=1))
+    result = logview.run_adb(['shell', 'pidof', '-s', 'x'], capture_output=True, text=True)
+    assert result.stdout == 'adb shell pidof -s x\n'
+
+
+def test_run_adb_without_adb_or_socket_raises(monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', AdbClient(port=1, timeout=1))
+    monkeypatch.setattr(logview, 'ADB_PATH', None)
+    with pytest.raises(FileNotFoundError):
+        logview.run_adb(['shell', 'true'], capture_output=True)
+
+
+def test_run_adb_popen_streams_logcat(client, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    process = logview.run_adb_popen(['logcat', '-v', 'time'], stdout=subprocess.PIPE, bufsize=0)
+    assert isinstance(process, logview.AdbService)
+    lines = [line for batch in logview.iter_line_batches(process.stdout) for line in batch]
+    assert lines == [b'01-19 17:54:16.100 I/App( 6192): one', b'01-19 17:54:16.200 I/App( 6192): two']
+    process.terminate()
+    assert process.wait(timeout=2) == 0
+
+
+def test_run_adb_popen_falls_back_on_fail(client, fallback_adb, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    process = logview.run_adb_popen(['-s', 'ZZ', 'logcat'], stdout=subprocess.PIPE)
+    assert isinstance(process, subprocess.Popen)
+    assert process.communicate()[0] == b'adb -s ZZ logcat\n'
+
+
+def test_connect_adb_server(server, monkeypatch):
+    monkeypatch.setenv('ANDROID_ADB_SERVER_PORT', str(server.port))
+    assert logview.connect_adb_server().port == server.port
+
+
+def test_connect_adb_server_without_server_or_adb(monkeypatch):
+    monkeypatch.setenv('ANDROID_ADB_SERVER_PORT', '1')
+    monkeypatch.setattr(logview, 'ADB_PATH', None)
+    assert logview.connect_adb_server() is None
+
+
+# ============================================================================
+# asyncio (multi-device)
+# ============================================================================
+
+def test_adb_output_async(client, server, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    assert asyncio.run(logview._adb_output('R58M12ABCDE', ['shell', 'pidof', '-s', 'com.hooked.hooked'])) == '6192\n'
+    assert server.requests[0] == 'host:transport:R58M12ABCDE'
+
+
+def test_adb_stream_async(client, server, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+
+    async def read():
+        process = await logview._adb_stream('emulator-5554', ['logcat', '-v', 'time', '-T', '01-19 17:54:16.170'])
+        assert isinstance(process, logview.AsyncAdbService)
+        data = await process.stdout.read()
+        process.terminate()
+        await process.wait()
+        return data
+    assert asyncio.run(read()) == b'01-19 17:54:16.171 I/App( 6192): hello\n'
+    assert server.requests[-1] == "emulator-5554 shell:logcat -v time -T '01-19 17:54:16.170'"
+
+
+def test_async_fail_falls_back(client, fallback_adb, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', client)
+    assert asyncio.run(logview._adb_output('ZZ', ['shell', 'true'])) == 'adb -s ZZ shell true\n'
+
+
+def test_async_fallback_without_adb_raises(monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', AdbClient(port=1, timeout=1))
+    monkeypatch.setattr(logview, 'ADB_PATH', None)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(logview._adb_stream('emulator-5554', ['logcat']))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(logview._adb_output('emulator-5554', ['shell', 'true']))
+
+
+def test_no_client_uses_the_adb_command(fallback_adb, monkeypatch):
+    monkeypatch.setattr(logview, 'ADB_CLIENT', None)
+    assert logview.run_adb(['shell', 'true'], capture_output=True, text=True).stdout == 'adb shell true\n'
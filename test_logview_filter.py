@@ -0,0 +1,233 @@
+"""Tests for the --filter expression parser and compiled predicates in logview.py."""
+
+import re
+
+import pytest
+
+from logview import FilterParser, LogFilter, LogLevel, LogRecord, compile_filter
+
+
+def record(message='hello', level='I', tag='App', pid=6192, tid=6192, timestamp='01-19 17:54:10.500'):
+    return LogRecord(timestamp, level, tag, pid, tid, message)
+
+
+def parse(text):
+    return FilterParser(text).parse()
+
+
+def parse_and_compile(text):
+    return compile_filter(parse(text))
+
+
+def matches(text, **fields):
+    return parse_and_compile(text)(record(**fields))
+
+
+# ============================================================================
+# Parsing
+# ============================================================================
+
+def test_comparison_node():
+    assert parse('tag == App') == ('cmp', 'tag', '==', 'App')
+
+
+def test_and_binds_tighter_than_or():
+    assert parse('tag == A or tag == B and pid == 1') == (
+        'or', [('cmp', 'tag', '==', 'A'), ('and', [('cmp', 'tag', '==', 'B'), ('cmp', 'pid', '==', 1)])]
+    )
+
+
+def test_not_binds_tighter_than_and():
+    assert parse('not tag == A and pid == 1') == (
+        'and', [('not', ('cmp', 'tag', '==', 'A')), ('cmp', 'pid', '==', 1)]
+    )
+
+
+def test_parentheses_override_precedence():
+    assert parse('(tag == A or tag == B) and pid == 1') == (
+        'and', [('or', [('cmp', 'tag', '==', 'A'), ('cmp', 'tag', '==', 'B')]), ('cmp', 'pid', '==', 1)]
+    )
+
+
+def test_keywords_and_fields_are_case_insensitive():
+    assert parse('TAG == A AND Level >= warn') == (
+        'and', [('cmp', 'tag', '==', 'A'), ('cmp', 'level', '>=', 'warn')]
+    )
+
+
+def test_values_are_typed():
+    assert parse('json.a == 12')[3] == 12
+    assert parse('json.a == 1.5')[3] == 1.5
+    assert parse('json.a == true')[3] is True
+    assert parse('json.a == null')[3] is None
+    assert parse('json.a == "12"')[3] == '12'
+
+
+def test_quoted_strings_and_escapes():
+    assert parse('message contains "two words"')[3] == 'two words'
+    assert parse("message contains 'single'")[3] == 'single'
+    assert parse(r'message contains "say \"hi\""')[3] == 'say "hi"'
+    assert parse(r'message contains "a\tb"')[3] == 'a\tb'
+    assert parse(r'message contains "é\n"')[3] == 'é\n'
+
+
+def test_regex_values():
+    value = parse('message ~ /time(out)?/')[3]
+    assert isinstance(value, re.Pattern) and value.flags & re.IGNORECASE == 0
+    assert parse('message ~ /TIMEOUT/i')[3].flags & re.IGNORECASE
+    assert parse(r'message ~ /a\/b/')[3].pattern == 'a/b'
+
+
+def test_sets_and_not_in():
+    assert parse('pid in {1, 2, "x"}') == ('cmp', 'pid', 'in', frozenset([1, 2, 'x']))
+    assert parse('tag not in {A}') == ('not', ('cmp', 'tag', 'in', frozenset(['A'])))
+    assert parse('message contains {a, b}') == ('cmp', 'message', 'contains', frozenset(['a', 'b']))
+
+
+def test_json_paths():
+    assert parse('json.user.id == 7') == ('cmp', ('json', ('user', 'id')), '==', 7)
+
+
+@pytest.mark.parametrize('text, error', [
+    ('tag == A &', "unexpected at position 9: '&'"),
+    ('tag == A = B', 'unexpected character at position 9'),
+    ('colour == red', "unknown field (expected one of level, tag, pid, tid, message, time or json.<path>) "
+                      "at position 0: 'colour'"),
+    ('tag = A', 'unexpected character at position 4'),
+    ('tag A', "expected an operator at position 4: 'A'"),
+    ('tag ==', 'expected a value at end of expression'),
+    ('(tag == A', 'expected ")" at end of expression'),
+    ('tag == A)', "unexpected at position 8: ')'"),
+    ('tag not == A', 'expected "in" after "not" at position 8'),
+    ('pid in 1', 'expected "{" at position 7'),
+    ('pid in {1, 2', 'expected "}" at end of expression'),
+    ('message ~ /(/', 'invalid regex'),
+    ('== A', "expected a field at position 0: '=='"),
+])
+def test_errors_name_the_position(text, error):
+    with pytest.raises(ValueError, match=re.escape(error)):
+        parse(text)
+
+
+# ============================================================================
+# Predicates
+# ============================================================================
+
+def test_level_comparisons():
+    assert matches('level >= WARN', level='E')
+    assert not matches('level >= WARN', level='I')
+    assert matches('level == e', level='E')
+    assert matches('level in {D, F}', level='F')
+    with pytest.raises(ValueError, match='unknown level'):
+        parse_and_compile('level >= LOUD')
+    with pytest.raises(ValueError, match='level does not support ~'):
+        parse_and_compile('level ~ /E/')
+
+
+def test_pid_and_tid_compare_as_numbers():
+    assert matches('pid == 6192')
+    assert matches('pid == "6192"')
+    assert matches('pid < 10000')
+    assert matches('pid in {1, 6192}')
+    assert not matches('pid in {1, 619}')
+    assert matches('tid != 1')
+
+
+def test_tag_and_message_operators():
+    assert matches('tag == App')
+    assert not matches('tag == app')
+    assert matches('message contains HELLO', message='say hello')
+    assert matches('message contains {nope, hell}', message='say hello')
+    assert matches('message ~ /^say/', message='say hello')
+    assert not matches('message !~ /^say/', message='say hello')
+    assert matches('message ~ /HELLO/i', message='say hello')
+    assert matches('message contains /h.llo/', message='say hello')
+
+
+def test_time_comparisons():
+    assert matches('time >= 17:54:10', timestamp='01-19 17:54:10.500')
+    assert not matches('time < 17:54:10', timestamp='01-19 17:54:10.500')
+    with pytest.raises(ValueError, match='time does not support in'):
+        parse_and_compile('time in {1}')
+
+
+def test_boolean_combinations():
+    assert matches('tag == App and not level >= WARN', level='I')
+    assert matches('tag == Other or pid == 6192')
+    assert not matches('not (tag == App or pid == 1)')
+
+
+def test_json_numbers_coerce_strings():
+    message = 'Response: {"status": "500", "ms": 12.5, "ok": false, "items": [{"id": 3}]}'
+    assert matches('json.status >= 500', message=message)
+    assert matches('json.status == 500', message=message)
+    assert matches('json.ms < 13', message=message)
+    assert matches('json.items.0.id == 3', message=message)
+
+
+def test_json_booleans_are_not_numbers():
+    message = '{"ok": false, "count": true}'
+    assert matches('json.ok == false', message=message)
+    assert not matches('json.count == 1', message=message)
+    assert not matches('json.count >= 0', message=message)
+
+
+def test_json_strings_compare_as_text():
+    message = '{"status": 500, "name": "catch"}'
+    assert matches('json.name == catch', message=message)
+    assert not matches('json.status == "500"', message=message)
+    assert matches('json.status in {500}', message=message)
+    assert matches('json.status ~ /^5/', message=message)
+
+
+def test_json_missing_or_unconvertible_never_matches():
+    assert not matches('json.status >= 500', message='no json here')
+    assert not matches('json.user.id == 1', message='{"user": null}')
+    assert not matches('json.items.5 == 1', message='{"items": [1]}')
+    assert not matches('json.status >= 500', message='{"status": "n/a"}')
+    assert matches('not json.status >= 500', message='{"status": "n/a"}')
+
+
+def test_tag_only_subtree_is_cached_per_tag():
+    check = compile_filter(parse('tag == App or tag ~ /^Ok/'))
+    assert check.__name__ == 'cached'
+    assert [check(record(tag=tag)) for tag in ('App', 'OkHttp', 'Other', 'OkHttp')] == [True, True, False, True]
+
+
+def test_mixed_subtrees_are_not_cached():
+    check = compile_filter(parse('tag == App and pid == 1'))
+    assert check.__name__ != 'cached'
+    assert not check(record(tag='App', pid=6192))
+    assert check(record(tag='App', pid=1))
+
+
+def test_tag_cache_inside_a_mixed_tree():
+    check = compile_filter(parse('(tag == App or tag == Ok) and message contains x'))
+    assert check(record(tag='Ok', message='x'))
+    assert not check(record(tag='Ok', message='y'))
+    assert not check(record(tag='Other', message='x'))
+
+
+# ============================================================================
+# LogFilter
+# ============================================================================
+
+def test_log_filter_combines_options_with_expression():
+    log_filter = LogFilter(min_level=LogLevel.WARNING, tags=['Ok'], pids=['6192'], expression='message contains boom')
+    assert log_filter.matches(record(level='E', tag='OkHttp', message='boom'))
+    assert not log_filter.matches(record(level='I', tag='OkHttp', message='boom'))
+    assert not log_filter.matches(record(level='E', tag='App', message='boom'))
+    assert not log_filter.matches(record(level='E', tag='OkHttp', message='boom', pid=1))
+
+
+def test_exact_tags_match_whole_names():
+    log_filter = LogFilter(tags=['Ok'], exact_tags=True)
+    assert not log_filter.matches(record(tag='OkHttp'))
+    assert log_filter.matches(record(tag='Ok'))
+
+
+def test_log_filter_pickles_by_recompiling():
+    import pickle
+    log_filter = pickle.loads(pickle.dumps(LogFilter(expression='tag == App')))
+    assert log_filter.matches(record())
+    assert not log_filter.matches(record(tag='Other'))
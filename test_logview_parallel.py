@@ -0,0 +1,37 @@
+"""Tests that --jobs renders a capture exactly as the single-process path does."""
+
+import sys
+
+import pytest
+
+import logview
+import logview_bench
+
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    """The bench corpus, which has repeated stack traces, gzipped so its chunk size can be changed."""
+    path = str(tmp_path_factory.mktemp('capture') / 'corpus.txt.gz')
+    logview_bench.write_corpus(path, 'threadtime', 20000)
+    return path
+
+
+def run(capfd, monkeypatch, *args):
+    # Small chunks, so traces and request/response pairs span chunk boundaries. Reassembly is
+    # off: which records pass a split message before it is joined depends on wall-clock time
+    monkeypatch.setattr(logview, 'FILE_CHUNK_SIZE', 64 * 1024)
+    monkeypatch.setattr(sys, 'argv', ['logview.py', '--no-color', '--reassemble', '0', *args])
+    with pytest.raises(SystemExit, match='0'):
+        logview.main()
+    return capfd.readouterr().out
+
+
+@pytest.mark.parametrize('args', [
+    (),
+    ('--full-traces',),
+])
+def test_jobs_output_matches_single_process(capture, capfd, monkeypatch, args):
+    single = run(capfd, monkeypatch, '--input', capture, '--jobs', '1', *args)
+    parallel = run(capfd, monkeypatch, '--input', capture, '--jobs', '2', *args)
+    assert ('↺' in single) == ('--full-traces' not in args)
+    assert parallel.splitlines() == single.splitlines()